@@ -0,0 +1,187 @@
+import json
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Union
+
+from detection_algo import DetectionAlgo
+from incremental_algo import IncrementalDetectionAlgo
+from invaders import Invader
+from loader import Loader
+from radar_map import RadarMap
+
+
+class FrameDetector:
+    """
+    Runs the search on single radar data files, the invader patterns
+    are compiled once for all the frames when the invaders are created.
+    With incremental every frame is searched as an update of the
+    previous one, see IncrementalDetectionAlgo.
+    """
+
+    def __init__(
+        self,
+        invaders: List[Invader],
+        threshold: float,
+        engine: str,
+        mapped: bool,
+        incremental: bool = False,
+    ) -> None:
+        self.incremental = incremental
+        if incremental:
+            self.algo = IncrementalDetectionAlgo(RadarMap(""), invaders, threshold, engine)
+        else:
+            self.algo = DetectionAlgo(RadarMap(""), invaders, threshold, engine)
+        self.loader = Loader("", mapped)
+
+    def detect(self, path: Union[str, Path]) -> Dict:
+        """
+        Searches a radar data file and returns the result as a JSON
+        serializable dict. Frames that can't be read are reported with
+        an error instead of stopping the batch.
+        """
+        start = time.perf_counter()
+        try:
+            radar_map = self.loader.load_radar_map(path)
+            if self.incremental:
+                matches = self.algo.update(radar_map)
+            else:
+                self.algo.set_radar_map(radar_map)
+                matches = self.algo.run_search()
+        except (OSError, ValueError, IndexError) as e:
+            return {"frame": str(path), "error": str(e) or type(e).__name__}
+        return {
+            "frame": str(path),
+            "matches": [match._asdict() for match in matches],
+            "elapsed": time.perf_counter() - start,
+        }
+
+    def detect_data(self, radar_data: str) -> Dict:
+        """
+        Searches radar data given as text, same as detect.
+        """
+        start = time.perf_counter()
+        try:
+            self.algo.set_radar_map(RadarMap(radar_data))
+            matches = self.algo.run_search()
+        except (ValueError, IndexError) as e:
+            return {"error": str(e) or type(e).__name__}
+        return {
+            "matches": [match._asdict() for match in matches],
+            "elapsed": time.perf_counter() - start,
+        }
+
+
+# detector of a pool worker, set up once by init_frame_worker
+frame_detector: Optional[FrameDetector] = None
+
+
+def init_frame_worker(
+    invaders: List[Invader], threshold: float, engine: str, mapped: bool
+) -> None:
+    """
+    Process pool initializer, prepares the worker's detector.
+    """
+    global frame_detector
+    frame_detector = FrameDetector(invaders, threshold, engine, mapped)
+
+
+def detect_frame(path: Union[str, Path]) -> Dict:
+    """
+    Process pool entry point, searches a single radar data file.
+    """
+    return frame_detector.detect(path)
+
+
+def detect_frames_data(frames: List[str]) -> List[Dict]:
+    """
+    Process pool entry point, searches a batch of radar data
+    given as text.
+    """
+    return [frame_detector.detect_data(radar_data) for radar_data in frames]
+
+
+class BatchDetectionAlgo:
+    """
+    Detection algorithm for many radar frames sharing the same invaders.
+    Frames are searched by a long lived pool of processes, each with the
+    invader patterns already prepared, so neither the interpreter start
+    up nor the pattern setup is paid per frame. Results are yielded in
+    the order of the frames as soon as they are ready, with a bounded
+    number of frames in flight.
+    With incremental the frames are consecutive ones of a single radar,
+    searched in order in this process, each one only where it differs
+    from the previous one.
+    Use it as a context manager, or call close, to shut down the pool.
+    """
+
+    def __init__(
+        self,
+        invaders: List[Invader],
+        threshold: float,
+        engine: str = "levenshtein",
+        workers: int = 1,
+        mapped: bool = False,
+        incremental: bool = False,
+    ) -> None:
+        if engine not in DetectionAlgo.engines:
+            raise ValueError(f"Unknown scoring engine {engine}!")
+        if workers < 1:
+            raise ValueError("At least one worker is required!")
+        if incremental and workers > 1:
+            raise ValueError("Incremental search needs a single worker!")
+        self.invaders = invaders
+        self.threshold = threshold
+        self.engine = engine
+        self.workers = workers
+        self.mapped = mapped
+        # frames submitted ahead of the one being waited on
+        self.max_in_flight = workers * 4
+        self.executor = None
+        self.detector = None
+        if workers > 1:
+            self.executor = ProcessPoolExecutor(
+                workers,
+                initializer=init_frame_worker,
+                initargs=(invaders, threshold, engine, mapped),
+            )
+        else:
+            self.detector = FrameDetector(invaders, threshold, engine, mapped, incremental)
+
+    def __enter__(self) -> "BatchDetectionAlgo":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Shuts down the process pool.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def search_frames(self, frames: Iterable[Union[str, Path]]) -> Iterator[Dict]:
+        """
+        Searches every frame, yielding one result dict per frame in order.
+        """
+        if self.executor is None:
+            for frame in frames:
+                yield self.detector.detect(frame)
+            return
+        in_flight: Deque[Future] = deque()
+        for frame in frames:
+            in_flight.append(self.executor.submit(detect_frame, frame))
+            if len(in_flight) >= self.max_in_flight:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    def search_frames_json(self, frames: Iterable[Union[str, Path]]) -> Iterator[str]:
+        """
+        Searches every frame, yielding one JSON line per frame.
+        """
+        for result in self.search_frames(frames):
+            yield json.dumps(result)
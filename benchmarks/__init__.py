@@ -0,0 +1,10 @@
+"""
+Benchmarks for the detection pipeline on synthetic radar data.
+
+Run with:
+
+    python -m benchmarks --sizes 100x100 200x200 --engines levenshtein numpy
+
+Add --pyramid 2 4 to measure the recall of the coarse to fine search
+against the exhaustive search.
+"""
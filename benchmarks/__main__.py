@@ -0,0 +1,145 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.pipeline import time_pipeline
+from benchmarks.pyramid import measure_pyramid
+from benchmarks.startup import measure_startup
+from benchmarks.synthetic import generate_radar_data
+from detection_algo import DetectionAlgo
+from loader import Loader
+from radar_map import RadarMap
+
+parser = argparse.ArgumentParser(description="Benchmark the detection pipeline")
+
+parser.add_argument(
+    "--invaders",
+    action="store",
+    type=str,
+    default=str(Path(__file__).parent.parent / "input_files"),
+    help="directory with the invader patterns",
+)
+parser.add_argument(
+    "--sizes",
+    action="store",
+    nargs="+",
+    default=["100x100"],
+    help="radar data sizes as WIDTHxHEIGHT",
+)
+parser.add_argument(
+    "--noise", action="store", nargs="+", type=float, default=[0.05], help="noise levels"
+)
+parser.add_argument(
+    "--density",
+    action="store",
+    nargs="+",
+    type=float,
+    default=[0.05],
+    help="fractions of the radar data covered by invaders",
+)
+parser.add_argument(
+    "--engines",
+    action="store",
+    nargs="+",
+    choices=DetectionAlgo.engines,
+    default=["levenshtein"],
+    help="scoring engines to compare",
+)
+parser.add_argument(
+    "--pyramid",
+    action="store",
+    nargs="*",
+    type=int,
+    default=[],
+    metavar="FACTOR",
+    help="also run the coarse to fine search with these downsampling factors"
+    " and measure its recall against the exhaustive search",
+)
+parser.add_argument(
+    "--startup",
+    action="store_true",
+    help="also measure the import time and time to first result of one shot runs of main.py",
+)
+parser.add_argument("--threshold", action="store", type=float, default=0.82, help="threshold value")
+parser.add_argument("--workers", action="store", type=int, default=1, help="scanning processes")
+parser.add_argument("--seed", action="store", type=int, default=0, help="random seed")
+parser.add_argument(
+    "--output", action="store", type=str, default=None, help="JSON file for the results"
+)
+
+args = parser.parse_args()
+
+invaders = Loader(args.invaders).load_invaders()
+results = []
+for size in args.sizes:
+    width, height = (int(v) for v in size.lower().split("x"))
+    for noise in args.noise:
+        for density in args.density:
+            radar_data, placed = generate_radar_data(
+                width, height, invaders, noise, density, args.seed
+            )
+            radar_map = RadarMap(radar_data)
+            for engine in args.engines:
+                timings = time_pipeline(
+                    radar_map, invaders, args.threshold, engine, args.workers
+                )
+                result = {
+                    "width": width,
+                    "height": height,
+                    "noise": noise,
+                    "density": density,
+                    "invaders_placed": len(placed),
+                    "engine": engine,
+                    "workers": args.workers,
+                    **timings,
+                }
+                results.append(result)
+                print(
+                    f"{size} noise {noise} density {density} {engine}: "
+                    f"run_search {timings['run_search']:.3f}s, "
+                    f"scan {timings['stages']['scan_radar_data']:.3f}s, "
+                    f"{timings['candidates']} candidates",
+                    file=sys.stderr,
+                )
+                pyramids = []
+                for factor in args.pyramid:
+                    pyramid = measure_pyramid(
+                        radar_map, invaders, args.threshold, engine, factor, None, args.workers
+                    )
+                    pyramids.append(pyramid)
+                    print(
+                        f"  pyramid x{factor}: {pyramid['pyramid']:.3f}s "
+                        f"(exhaustive {pyramid['exhaustive']:.3f}s), "
+                        f"recall {pyramid['recall']:.2f}",
+                        file=sys.stderr,
+                    )
+                if pyramids:
+                    result["pyramid"] = pyramids
+
+startup = []
+if args.startup:
+    startup = measure_startup(invaders, args.threshold, seed=args.seed)
+    for result in startup:
+        print(
+            f"startup{' with catalogue' if result['catalogue'] else ''}: "
+            f"imports {result['import_time']:.3f}s, "
+            f"first result {result['time_to_first_result']:.3f}s",
+            file=sys.stderr,
+        )
+
+report = {
+    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    "python": platform.python_version(),
+    "threshold": args.threshold,
+    "seed": args.seed,
+    "results": results,
+}
+if startup:
+    report["startup"] = startup
+if args.output:
+    Path(args.output).write_text(json.dumps(report, indent=2))
+else:
+    print(json.dumps(report, indent=2))
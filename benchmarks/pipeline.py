@@ -0,0 +1,59 @@
+import time
+from typing import Dict, List
+
+from detection_algo import DetectionAlgo
+from invaders import Invader, MatchArray
+from radar_map import RadarMap
+
+
+def time_pipeline(
+    radar_map: RadarMap,
+    invaders: List[Invader],
+    threshold: float,
+    engine: str = "levenshtein",
+    workers: int = 1,
+) -> Dict:
+    """
+    Times every stage of DetectionAlgo.run_search separately, summed over
+    the invaders, and then the whole run_search end to end.
+    Returns the timings in seconds along with the number of windows
+    scored and of candidates before and after overlap resolution.
+    """
+    algo = DetectionAlgo(radar_map, invaders, threshold, engine, workers)
+    stages = {
+        "get_enlarged_radar_data": 0.0,
+        "scan_radar_data": 0.0,
+        "find_peaks": 0.0,
+        "get_best_matching_data": 0.0,
+    }
+    windows = 0
+    matching_data = MatchArray()
+    for invader in invaders:
+        start = time.perf_counter()
+        enlarged_radar_data = radar_map.get_enlarged_radar_data(invader.pattern)
+        stages["get_enlarged_radar_data"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        scores = algo.scan_enlarged_radar_data(enlarged_radar_data, invader.compiled)
+        stages["scan_radar_data"] += time.perf_counter() - start
+        windows += sum(len(row) for row in scores)
+
+        start = time.perf_counter()
+        matching_data.extend(algo.get_targets_from_scores(invader, scores))
+        stages["find_peaks"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    algo.get_best_matching_data(matching_data)
+    stages["get_best_matching_data"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    candidates = algo.run_search()
+    run_search = time.perf_counter() - start
+
+    return {
+        "stages": stages,
+        "run_search": run_search,
+        "windows": windows,
+        "peaks": len(matching_data),
+        "candidates": len(candidates),
+    }
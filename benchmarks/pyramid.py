@@ -0,0 +1,52 @@
+import time
+from typing import Dict, List, Optional
+
+from detection_algo import DetectionAlgo
+from invaders import Invader
+from pyramid_algo import PyramidDetectionAlgo
+from radar_map import RadarMap
+
+
+def measure_pyramid(
+    radar_map: RadarMap,
+    invaders: List[Invader],
+    threshold: float,
+    engine: str = "levenshtein",
+    factor: int = 2,
+    coarse_threshold: Optional[float] = None,
+    workers: int = 1,
+) -> Dict:
+    """
+    Runs the exhaustive search and the coarse to fine search on the same
+    radar data and returns the time of both along with the recall of the
+    coarse to fine search, the share of the exhaustive matches it finds,
+    and the number of matches it finds that the exhaustive search doesn't.
+    """
+    start = time.perf_counter()
+    expected = DetectionAlgo(radar_map, invaders, threshold, engine, workers).run_search()
+    exhaustive = time.perf_counter() - start
+
+    algo = PyramidDetectionAlgo(
+        radar_map,
+        invaders,
+        threshold,
+        engine,
+        workers,
+        factor=factor,
+        coarse_threshold=coarse_threshold,
+    )
+    start = time.perf_counter()
+    found = algo.run_search()
+    pyramid = time.perf_counter() - start
+
+    expected_keys = {(m.name, m.x, m.y) for m in expected}
+    found_keys = {(m.name, m.x, m.y) for m in found}
+    return {
+        "factor": factor,
+        "coarse_threshold": algo.coarse_threshold,
+        "exhaustive": exhaustive,
+        "pyramid": pyramid,
+        "matches": len(expected_keys),
+        "recall": len(expected_keys & found_keys) / len(expected_keys) if expected_keys else 1.0,
+        "extra_matches": len(found_keys - expected_keys),
+    }
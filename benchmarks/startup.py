@@ -0,0 +1,107 @@
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from benchmarks.synthetic import generate_radar_data
+from invaders import Invader
+from loader import Loader
+
+MAIN = str(Path(__file__).parent.parent / "main.py")
+
+
+def parse_import_times(output: str) -> List[Tuple[str, int, int]]:
+    """
+    Name, nesting depth and cumulative import time in microseconds of
+    every module in the output of python -X importtime.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # nested imports are indented by two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), depth, int(cumulative)))
+    return imports
+
+
+def measure_import_time(args: List[str], python: str = sys.executable) -> Dict:
+    """
+    Runs python -X importtime with args in a fresh interpreter, returns
+    the total import time in seconds, the modules imported and the
+    slowest top level imports.
+    """
+    result = subprocess.run(
+        [python, "-X", "importtime", *args], capture_output=True, text=True, check=True
+    )
+    imports = parse_import_times(result.stderr)
+    top_level = sorted(
+        ((name, us) for name, depth, us in imports if depth == 0),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    return {
+        "import_time": sum(us for _, us in top_level) / 1e6,
+        "modules": [name for name, _, _ in imports],
+        "slowest": [{"module": name, "seconds": us / 1e6} for name, us in top_level[:10]],
+    }
+
+
+def time_to_first_result(args: List[str], python: str = sys.executable) -> float:
+    """
+    Seconds from starting main.py with args to its first line of output.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen([python, MAIN, *args], stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()
+    elapsed = time.perf_counter() - start
+    process.communicate()
+    return elapsed
+
+
+def measure_startup(
+    invaders: List[Invader],
+    threshold: float,
+    size: Tuple[int, int] = (24, 16),
+    repeat: int = 5,
+    seed: int = 0,
+) -> List[Dict]:
+    """
+    Startup of one shot runs of main.py on a small synthetic frame with
+    the given invaders, read from invader files and then from a
+    precompiled catalogue: the import time of the modules loaded and
+    the median time to the first result.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory)
+        for k, invader in enumerate(invaders):
+            (path / f"invader_{k}.txt").write_text("\n".join(invader.pattern))
+        radar_data, _ = generate_radar_data(*size, invaders, 0.05, 0.1, seed)
+        (path / "radar_data.txt").write_text(radar_data)
+        # not named invader*, which Loader would read as a pattern
+        catalogue = path / "catalogue.pickle"
+        Loader(directory).save_catalogue(catalogue, invaders)
+        for extra in ([], ["--catalogue", str(catalogue)]):
+            args = [directory, "--threshold", str(threshold), "--engine", "bitparallel"]
+            args += extra
+            imports = measure_import_time([MAIN, *args])
+            first_result = statistics.median(
+                time_to_first_result(args) for _ in range(repeat)
+            )
+            results.append(
+                {
+                    "catalogue": bool(extra),
+                    "import_time": imports["import_time"],
+                    "modules": len(imports["modules"]),
+                    "slowest_imports": imports["slowest"][:5],
+                    "time_to_first_result": first_result,
+                }
+            )
+    return results
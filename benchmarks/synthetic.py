@@ -0,0 +1,54 @@
+import random
+from typing import List, Optional, Tuple
+
+from invaders import Invader
+
+
+def generate_radar_data(
+    width: int,
+    height: int,
+    invaders: List[Invader],
+    noise: float = 0.05,
+    density: float = 0.05,
+    seed: Optional[int] = None,
+    empty_char: str = "-",
+    filled_char: str = "o",
+) -> Tuple[str, List[Tuple[str, int, int]]]:
+    """
+    Generates radar data of the given size with invaders placed at random
+    positions without overlapping, covering roughly density of the area,
+    then flips every cell with a probability of noise.
+    Returns the radar data and the name and position of every invader
+    placed, the ground truth of the detection.
+    """
+    rnd = random.Random(seed)
+    grid = [[empty_char] * width for _ in range(height)]
+    placed = []
+    target_area = density * width * height
+    covered = 0
+    # give up on placing invaders after too many collisions
+    attempts = 0
+    while invaders and covered < target_area and attempts < 1000:
+        invader = rnd.choice(invaders)
+        if invader.width > width or invader.height > height:
+            attempts += 1
+            continue
+        x = rnd.randint(0, width - invader.width)
+        y = rnd.randint(0, height - invader.height)
+        if any(
+            x <= p_x + p_w and p_x <= x + invader.width and y <= p_y + p_h and p_y <= y + invader.height
+            for _, p_x, p_y, p_w, p_h in placed
+        ):
+            attempts += 1
+            continue
+        for j, line in enumerate(invader.pattern):
+            grid[y + j][x : x + invader.width] = list(line)
+        placed.append((invader.name, x, y, invader.width, invader.height))
+        covered += invader.width * invader.height
+        attempts = 0
+    for row in grid:
+        for i, c in enumerate(row):
+            if rnd.random() < noise:
+                row[i] = empty_char if c == filled_char else filled_char
+    radar_data = "\n".join("".join(row) for row in grid)
+    return radar_data, [(name, x, y) for name, x, y, _, _ in placed]
@@ -1,10 +1,31 @@
+import math
 from abc import ABC, abstractmethod
-from typing import List
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-from generic_algos import GenericAlgos
-from invaders import Invader, InvaderMatch
+from generic_algos import CompiledPattern, GenericAlgos, compile_pattern
+from invaders import Invader, InvaderMatch, MatchArray
+from metrics import DetectionMetrics
 from radar_map import RadarMap
 
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+    from score_cache import ScoreCache
+
 
 class BaseDetectionAlgo(ABC):
     """
@@ -25,72 +46,623 @@ class DetectionAlgo(BaseDetectionAlgo, GenericAlgos):
     the values and leaving only matches greated than a specified
     threshold.
     Overlapping candidates are also filtered on the highest score.
+    Candidates are kept in a columnar MatchArray, which iterates as
+    InvaderMatch tuples.
+    The scores can be computed by one of several engines:
+    "levenshtein" - the reference pure Python implementation
+    "numpy" - vectorized scoring of all windows at once, requires NumPy
+    "incremental" - reuses row and column ratios between neighbouring windows
+    "bounded" - stops scoring windows that can't reach the threshold
+    "bitparallel" - bit-parallel Levenshtein on packed pattern lines
+    "hamming" - fraction of the cells of a window agreeing with the pattern
+    instead of Levenshtein ratios, all windows at once with FFT
+    cross-correlation, requires NumPy
+    With more than one worker the radar data is scanned in horizontal
+    tiles by a pool of processes.
+    The radar data is padded once for the largest invader, the enlarged
+    radar data of every invader being a view of it.
+    In joint mode the padded radar data is walked a single time, scoring
+    every invader at each position, invaders of the same size sharing
+    the window and its columns.
+    Peaks of the scores are found by find_peaks on rows and then columns
+    ("separable"), or with peaks="nms" by a vectorized 2D non-maximum
+    suppression over the invader's footprint, or the given neighbourhood,
+    which requires NumPy.
+    With prefilter the windows compared one at a time are first checked
+    against a cheap upper bound of their score, from the counts of non
+    empty cells of their rows and columns, and those that can't reach
+    the threshold are skipped and score 0.
+    sweep_thresholds searches for many thresholds with a single scan.
+    With a ScoreCache the matrices of match scores are looked up there
+    before scanning and stored after, so searching the same radar data
+    again, with another threshold for instance, skips the scan.
+    Passing a DetectionMetrics instance records timings and counters
+    of every stage of the search.
     """
 
+    engines = ("levenshtein", "numpy", "incremental", "bounded", "bitparallel", "hamming")
+    peak_finders = ("separable", "nms")
+    # number of windows skipped by the prefilter in the last search
+    windows_pruned = 0
+
     def __init__(
-        self, radar_map: RadarMap, invaders: List[Invader], threshold: float
+        self,
+        radar_map: RadarMap,
+        invaders: List[Invader],
+        threshold: float,
+        engine: str = "levenshtein",
+        workers: int = 1,
+        metrics: Optional[DetectionMetrics] = None,
+        prefilter: bool = False,
+        joint: bool = False,
+        peaks: str = "separable",
+        neighbourhood: Optional[Tuple[int, int]] = None,
+        cache: Optional["ScoreCache"] = None,
     ) -> None:
-        self.radar_map = radar_map
+        if engine not in self.engines:
+            raise ValueError(f"Unknown scoring engine {engine}!")
+        if peaks not in self.peak_finders:
+            raise ValueError(f"Unknown peak finder {peaks}!")
+        if workers < 1:
+            raise ValueError("At least one worker is required!")
         self.invaders = invaders
+        self.set_radar_map(radar_map)
         self.threshold = threshold
+        self.engine = engine
+        self.workers = workers
+        self.metrics = metrics
+        self.prefilter = prefilter
+        self.joint = joint
+        self.peaks = peaks
+        self.neighbourhood = neighbourhood
+        self.cache = cache
+        # radar map last hashed for the cache and its hash
+        self.radar_hash: Optional[Tuple[RadarMap, str]] = None
+        # pool of the tiled scans of the current search, see pool, and
+        # the tiles already submitted to it per compiled pattern
+        self.executor: Optional["ProcessPoolExecutor"] = None
+        self.scheduled_tiles: Dict[int, List["Future"]] = {}
+
+    def set_radar_map(self, radar_map: RadarMap) -> None:
+        """
+        Sets the radar data to search, padded once for all the invaders.
+        """
+        for invader in self.invaders:
+            radar_map.reserve_padding(invader.width, invader.height)
+        self.radar_map = radar_map
 
-    def scan_radar_data(self, pattern: List[str]):
+    def measure(self, stage: str, invader: Optional[str] = None) -> ContextManager:
+        """
+        Times a block as a stage of the search when metrics are enabled.
+        """
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.time(stage, invader)
+
+    def scan_radar_data(
+        self, pattern: Union[List[str], CompiledPattern]
+    ) -> List[List[float]]:
         """
         Given an invader pattern the method will get an enlarged radar_data
         base on the pattern and scan it by row and column on windows the
         size of the pattern and assigning each coordinate a match score.
         """
-        enlarged_radar_data = self.radar_map.get_enlarged_radar_data(pattern)
-        p_h = len(pattern)
-        p_w = len(pattern[0])
+        pattern = compile_pattern(pattern)
+        enlarged_radar_data = self.radar_map.get_enlarged_radar_data(pattern.rows)
+        return self.scan_enlarged_radar_data(enlarged_radar_data, pattern)
+
+    @contextmanager
+    def pool(self) -> Iterator[None]:
+        """
+        Keeps a single pool of processes for all the tiled scans of the
+        block, the pool already running if there is one.
+        """
+        if self.workers == 1 or self.executor is not None:
+            yield
+            return
+        # imported here so the pool machinery is only loaded with workers
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(self.workers) as executor:
+            self.executor = executor
+            try:
+                yield
+            finally:
+                self.executor = None
+                self.scheduled_tiles.clear()
+
+    def schedule_tiles(self, invaders: List[Invader]) -> None:
+        """
+        Submits the tiles of every invader to the running pool up front,
+        so the workers don't wait for the scores of one invader to be
+        stitched before scanning the next. Not done with a score cache,
+        whose hits skip the scan.
+        """
+        if self.executor is None or self.cache is not None:
+            return
+        for invader in invaders:
+            key = id(invader.compiled)
+            if key not in self.scheduled_tiles:
+                self.scheduled_tiles[key] = self.submit_tiles(
+                    self.radar_map.get_enlarged_radar_data(invader.pattern), invader.compiled
+                )
+
+    def submit_tiles(
+        self, enlarged_radar_data: List[str], pattern: CompiledPattern
+    ) -> List["Future"]:
+        """
+        Splits the enlarged radar data in horizontal tiles and submits
+        them to the running pool. Every tile has a halo of the pattern
+        height below it, so all the windows starting in the tile are
+        complete and the stitched scores are the same as for a single
+        process scan.
+        """
+        p_h = pattern.height
+        rows = len(enlarged_radar_data) - p_h
+        # a few tiles per worker to balance the load
+        tile_height = max(p_h, math.ceil(rows / (self.workers * 4)))
+        return [
+            self.executor.submit(
+                scan_tile,
+                enlarged_radar_data[j : j + tile_height + p_h],
+                pattern,
+                self.threshold,
+                self.engine,
+                self.prefilter,
+                self.radar_map.empty_char,
+            )
+            for j in range(0, rows, tile_height)
+        ]
+
+    def scan_tiles(
+        self, enlarged_radar_data: List[str], pattern: CompiledPattern
+    ) -> List[List[float]]:
+        """
+        Scores the enlarged radar data in tiles in a pool of processes,
+        the ones submitted by schedule_tiles if there are any.
+        """
+        with self.pool():
+            futures = self.scheduled_tiles.get(id(pattern))
+            if futures is None:
+                futures = self.submit_tiles(enlarged_radar_data, pattern)
+            scores = []
+            for future in futures:
+                tile_scores, levenshtein_calls, windows_pruned = future.result()
+                scores.extend(tile_scores)
+                self.levenshtein_calls += levenshtein_calls
+                self.windows_pruned += windows_pruned
+        return scores
+
+    def scan_enlarged_radar_data(
+        self,
+        enlarged_radar_data: List[str],
+        pattern: Union[List[str], CompiledPattern],
+    ) -> List[List[float]]:
+        """
+        Scores every window of an already enlarged radar data
+        with the selected engine, the pattern is compiled once
+        for all of them.
+        """
+        pattern = compile_pattern(pattern)
+        if self.workers > 1:
+            return self.scan_tiles(enlarged_radar_data, pattern)
+        scanners = {
+            "levenshtein": self.scan_levenshtein,
+            "numpy": self.scan_numpy,
+            "incremental": self.scan_incremental,
+            "bounded": self.scan_bounded,
+            "bitparallel": self.scan_bitparallel,
+            "hamming": self.scan_hamming,
+        }
+        return scanners[self.engine](enlarged_radar_data, pattern)
+
+    def scan_regions(
+        self,
+        scores: List[List[float]],
+        enlarged_radar_data: List[str],
+        pattern: CompiledPattern,
+        regions: List[Tuple[int, int, int, int]],
+    ) -> int:
+        """
+        Scores the windows of the regions, inclusive ranges (left, top,
+        right, bottom) of window coordinates, by scanning the part of the
+        enlarged radar data they cover, in place in the matrix of scores.
+        Returns the number of windows scored.
+        """
+        scored = 0
+        for left, top, right, bottom in regions:
+            # scan_enlarged_radar_data leaves out the last row and
+            # column of windows, so take one more of each
+            region = self.radar_map.get_size_window(
+                (right - left + pattern.width + 1, bottom - top + pattern.height + 1),
+                (left, top),
+                enlarged_radar_data,
+            )
+            region_scores = self.scan_enlarged_radar_data(region, pattern)
+            for j, row in enumerate(region_scores):
+                scores[top + j][left : left + len(row)] = row
+                scored += len(row)
+        return scored
+
+    def scan_levenshtein(
+        self, enlarged_radar_data: List[str], pattern: CompiledPattern
+    ) -> List[List[float]]:
+        """
+        Reference engine, compares every window to the pattern
+        with compare_input_data_to_pattern.
+        """
+        return self.scan_windows(
+            enlarged_radar_data, pattern, self.compare_input_data_to_pattern
+        )
+
+    def scan_bounded(
+        self, enlarged_radar_data: List[str], pattern: CompiledPattern
+    ) -> List[List[float]]:
+        """
+        Bounded engine, gives up on a window as soon as it can't score
+        above the threshold anymore, such windows score 0.
+        Peaks found in the scores are the same as for the reference engine.
+        """
+        return self.scan_windows(
+            enlarged_radar_data, pattern, self.compare_input_data_to_pattern_bounded
+        )
+
+    def scan_bitparallel(
+        self, enlarged_radar_data: List[str], pattern: CompiledPattern
+    ) -> List[List[float]]:
+        """
+        Bit-parallel engine, same scores as the reference engine
+        with a much cheaper comparison of rows and columns.
+        """
+        return self.scan_windows(
+            enlarged_radar_data, pattern, self.compare_input_data_to_pattern_bitparallel
+        )
+
+    def scan_windows(
+        self,
+        enlarged_radar_data: List[str],
+        pattern: CompiledPattern,
+        compare: Callable[[List[str], CompiledPattern], float],
+    ) -> List[List[float]]:
+        """
+        Scores every window of the enlarged radar data the
+        size of the pattern with the given compare method.
+        With the prefilter enabled windows whose score can't
+        reach the threshold aren't compared and score 0.
+        """
+        p_h = pattern.height
+        p_w = pattern.width
+        empty_char = self.radar_map.empty_char
+        table = None
+        if self.prefilter:
+            table = self.summed_area_table(enlarged_radar_data, empty_char)
+            max_total = self.max_total_distance(pattern)
         scores = []
         for j in range(len(enlarged_radar_data) - p_h):
             row_scores = []
             for i in range(len(enlarged_radar_data[0]) - p_w):
+                if (
+                    table is not None
+                    and self.distance_lower_bound(table, (i, j), pattern, empty_char)
+                    > max_total
+                ):
+                    self.windows_pruned += 1
+                    row_scores.append(0)
+                    continue
                 window = self.radar_map.get_size_window(
                     (p_w, p_h), (i, j), enlarged_radar_data
                 )
-                row_scores.append(self.compare_input_data_to_pattern(window, pattern))
+                row_scores.append(compare(window, pattern))
             scores.append(row_scores)
         return scores
 
-    def get_targets_from_scan_data(self, invader: Invader) -> List[InvaderMatch]:
+    def scan_numpy(
+        self, enlarged_radar_data: List[str], pattern: CompiledPattern
+    ) -> List[List[float]]:
+        """
+        Vectorized engine, scores all windows in batches on
+        NumPy arrays of the radar data and pattern.
+        """
+        # imported here so NumPy is only required when the engine is used
+        from numpy_algos import NumpyAlgos
+
+        na = NumpyAlgos()
+        # virtual enlarged radar data can build its array without
+        # going through strings
+        to_array = getattr(enlarged_radar_data, "to_array", None)
+        if to_array is not None:
+            radar_array = to_array()
+        else:
+            radar_array = na.to_array(enlarged_radar_data)
+        scores = na.score_matrix(radar_array, na.to_array(pattern.rows))
+        # one vectorized comparison per row and column of every window
+        self.levenshtein_calls += scores.size * (pattern.height + pattern.width)
+        return scores.tolist()
+
+    def scan_hamming(
+        self, enlarged_radar_data: List[str], pattern: CompiledPattern
+    ) -> List[List[float]]:
+        """
+        Hamming engine, scores every window by the fraction of its cells
+        agreeing with the pattern on being empty or not. Cheaper and less
+        tolerant to shifted cells than the Levenshtein ratios, so the
+        same threshold doesn't select the same candidates.
+        """
+        from numpy_algos import NumpyAlgos
+
+        na = NumpyAlgos()
+        to_array = getattr(enlarged_radar_data, "to_array", None)
+        if to_array is not None:
+            radar_array = to_array()
+        else:
+            radar_array = na.to_array(enlarged_radar_data)
+        empty_code = ord(self.radar_map.empty_char)
+        scores = na.hamming_matrix(
+            radar_array != empty_code, na.to_array(pattern.rows) != empty_code
+        )
+        return scores.tolist()
+
+    def scan_incremental(
+        self, enlarged_radar_data: List[str], pattern: CompiledPattern
+    ) -> List[List[float]]:
+        """
+        Incremental engine, the ratios of the rows and columns of the
+        windows are memoized on the compared strings, which repeat a lot
+        in mostly empty radar data, so each distinct pair is only
+        computed once for all the windows.
+        """
+        return self.scan_windows(
+            enlarged_radar_data,
+            pattern,
+            partial(self.compare_input_data_to_pattern_cached, cache={}),
+        )
+
+    def get_compare(self) -> Optional[Callable[..., float]]:
+        """
+        Returns the compare method of the engines scoring one
+        window at a time, None for the other engines.
+        """
+        comparers = {
+            "levenshtein": self.compare_input_data_to_pattern,
+            "bounded": self.compare_input_data_to_pattern_bounded,
+            "bitparallel": self.compare_input_data_to_pattern_bitparallel,
+            "incremental": partial(self.compare_input_data_to_pattern_cached, cache={}),
+        }
+        return comparers.get(self.engine)
+
+    def scan_joint(self) -> List[List[List[float]]]:
+        """
+        Scores every invader on the radar data padded once for the
+        largest of them, returns the matrices of match scores in the
+        order of self.invaders, the same as scan_radar_data for each.
+        Engines scoring one window at a time walk the radar data a single
+        time, the others and tiled scans score each invader on its
+        enlarged radar data, a view of the shared padded radar data.
+        """
+        if not self.invaders:
+            return []
+        width = max(invader.width for invader in self.invaders)
+        height = max(invader.height for invader in self.invaders)
+        with self.measure("get_enlarged_radar_data"):
+            padded_radar_data = self.radar_map.get_padded_view(width, height)
+        margins = (int(width / 2), int(height / 2))
+        compare = self.get_compare()
+        if compare is None or self.workers > 1:
+            with self.pool():
+                self.schedule_tiles(self.invaders)
+                return [
+                    self.scan_enlarged_radar_data(
+                        self.radar_map.get_enlarged_radar_data(invader.pattern),
+                        invader.compiled,
+                    )
+                    for invader in self.invaders
+                ]
+        return self.scan_windows_joint(padded_radar_data, margins, compare)
+
+    def scan_windows_joint(
+        self,
+        padded_radar_data: List[str],
+        margins: Tuple[int, int],
+        compare: Callable[..., float],
+    ) -> List[List[List[float]]]:
+        """
+        Single pass of scan_windows for all the invaders over the
+        padded radar data. At every position the window and its columns
+        are extracted once per invader size and compared to all the
+        invaders of that size.
+        """
+        left, top = margins
+        width = len(self.radar_map.radar_data[0])
+        height = len(self.radar_map.radar_data)
+        empty_char = self.radar_map.empty_char
+        groups = defaultdict(list)
+        for index, invader in enumerate(self.invaders):
+            groups[(invader.width, invader.height)].append(index)
+        table = None
+        if self.prefilter:
+            table = self.summed_area_table(padded_radar_data, empty_char)
+        # per size, the rows of windows of the enlarged radar data of
+        # that size, its offset in the padded radar data and the highest
+        # total distance still reaching the threshold
+        sizes = []
+        for (p_w, p_h), indices in groups.items():
+            rows = height + 2 * int(p_h / 2) - p_h
+            offset = (left - int(p_w / 2), top - int(p_h / 2))
+            max_total = self.max_total_distance(self.invaders[indices[0]].compiled)
+            sizes.append(((p_w, p_h), indices, rows, offset, max_total))
+        scores = [[] for _ in self.invaders]
+        for j in range(max(size[2] for size in sizes)):
+            active = [size for size in sizes if j < size[2]]
+            row_scores = {index: [] for size in active for index in size[1]}
+            for i in range(width):
+                for size, indices, _, (x_offset, y_offset), max_total in active:
+                    offset = (i + x_offset, j + y_offset)
+                    window = self.radar_map.get_size_window(size, offset, padded_radar_data)
+                    t_window = None
+                    for index in indices:
+                        pattern = self.invaders[index].compiled
+                        if (
+                            table is not None
+                            and self.distance_lower_bound(table, offset, pattern, empty_char)
+                            > max_total
+                        ):
+                            self.windows_pruned += 1
+                            row_scores[index].append(0)
+                            continue
+                        if t_window is None:
+                            t_window = ["".join(l) for l in zip(*window)]
+                        row_scores[index].append(compare(window, pattern, t_window))
+            for index, index_scores in row_scores.items():
+                scores[index].append(index_scores)
+        return scores
+
+    def get_targets_from_joint_scan(self) -> MatchArray:
+        """
+        Same as get_targets_from_scan_data for every invader,
+        scoring all of them with scan_joint.
+        """
+        levenshtein_calls = self.levenshtein_calls
+        windows_pruned = self.windows_pruned
+        all_scores = [self.get_cached_scores(invader) for invader in self.invaders]
+        scanned = None in all_scores
+        if scanned:
+            with self.measure("scan_radar_data"):
+                all_scores = self.scan_joint()
+            for invader, rs in zip(self.invaders, all_scores):
+                self.cache_scores(invader, rs)
+        targets = MatchArray()
+        for invader, rs in zip(self.invaders, all_scores):
+            with self.measure("find_peaks", invader.name):
+                targets.extend(self.get_targets_from_scores(invader, rs))
+            if self.metrics is not None and scanned:
+                self.metrics.count("windows_scored", sum(len(row) for row in rs))
+        if self.metrics is not None:
+            self.metrics.count("levenshtein_calls", self.levenshtein_calls - levenshtein_calls)
+            self.metrics.count("windows_pruned", self.windows_pruned - windows_pruned)
+            self.metrics.count("candidates", len(targets))
+        return targets
+
+    def get_cache_key(self, invader: Invader) -> str:
+        """
+        Key of the scores of an invader on the current radar data
+        in the score cache, the radar data is hashed once.
+        """
+        if self.radar_hash is None or self.radar_hash[0] is not self.radar_map:
+            self.radar_hash = (self.radar_map, self.cache.hash_radar(self.radar_map))
+        # the bounded engine and the prefilter zero the windows
+        # that can't reach the threshold
+        threshold = self.threshold if self.engine == "bounded" or self.prefilter else None
+        return self.cache.get_key(self.radar_hash[1], invader.pattern, self.engine, threshold)
+
+    def get_cached_scores(self, invader: Invader) -> Optional[List[List[float]]]:
+        """
+        Returns the matrix of match scores of an invader from the
+        score cache, None without a cache or if it isn't there.
+        """
+        if self.cache is None:
+            return None
+        with self.measure("score_cache", invader.name):
+            rs = self.cache.get(self.get_cache_key(invader))
+        if self.metrics is not None:
+            self.metrics.count("score_cache_hits" if rs is not None else "score_cache_misses")
+        return rs
+
+    def cache_scores(self, invader: Invader, rs: List[List[float]]) -> None:
+        """
+        Stores the matrix of match scores of an invader in the score cache.
+        """
+        if self.cache is not None:
+            with self.measure("score_cache", invader.name):
+                self.cache.put(self.get_cache_key(invader), rs)
+
+    def get_targets_from_scan_data(self, invader: Invader) -> MatchArray:
         """
         Run the invader patter on the radar data, filter and keep
         the peaks with the best matching scores and return a
         list of all matching invaders.
         """
-        pattern = invader.pattern
-        # scan radar data to obtain a matrix of match scores
-        rs = self.scan_radar_data(pattern)
-        # filter peaks for rows
-        sp = self.find_peaks(rs)
-        # transpose matrix and filter peaks for columns
-        sp = self.find_peaks(zip(*sp))
-        # transpose the matrix back
-        sp = list(zip(*sp))
-        x_half = int(len(pattern[0]) / 2)
-        y_half = int(len(pattern) / 2)
-        matching_invaders = []
-        for j, row in enumerate(sp):
-            for i, cel in enumerate(row):
-                if cel > 0:
-                    # account for enlarged radar map coordinates
-                    real_x_coord = max(0, i - x_half)
-                    real_y_coord = max(0, j - y_half)
-                    m = InvaderMatch(
-                        invader.name,
-                        i,
-                        j,
-                        real_x_coord,
-                        real_y_coord,
-                        invader.width,
-                        invader.height,
-                        cel,
-                    )
-                    matching_invaders.append(m)
+        levenshtein_calls = self.levenshtein_calls
+        windows_pruned = self.windows_pruned
+        windows_scored = 0
+        rs = self.get_cached_scores(invader)
+        if rs is None:
+            with self.measure("get_enlarged_radar_data", invader.name):
+                enlarged_radar_data = self.radar_map.get_enlarged_radar_data(invader.pattern)
+            with self.measure("scan_radar_data", invader.name):
+                # scan radar data to obtain a matrix of match scores
+                rs = self.scan_enlarged_radar_data(enlarged_radar_data, invader.compiled)
+            self.cache_scores(invader, rs)
+            windows_scored = sum(len(row) for row in rs)
+        with self.measure("find_peaks", invader.name):
+            targets = self.get_targets_from_scores(invader, rs)
+        if self.metrics is not None:
+            self.metrics.count("windows_scored", windows_scored)
+            self.metrics.count("levenshtein_calls", self.levenshtein_calls - levenshtein_calls)
+            self.metrics.count("windows_pruned", self.windows_pruned - windows_pruned)
+            self.metrics.count("candidates", len(targets))
+        return targets
+
+    def get_targets_from_scores(
+        self, invader: Invader, rs: List[List[float]]
+    ) -> MatchArray:
+        """
+        Filter and keep the peaks of the matrix of match scores of an
+        invader and return all matching invaders.
+        """
+        if self.peaks == "nms":
+            peaks = self.find_peaks_nms(invader, rs)
+        else:
+            # filter peaks for rows
+            sp = self.find_peaks(rs)
+            # transpose matrix and filter peaks for columns
+            sp = self.find_peaks(zip(*sp))
+            # transpose the matrix back
+            sp = list(zip(*sp))
+            peaks = [
+                (j, i, cel)
+                for j, row in enumerate(sp)
+                for i, cel in enumerate(row)
+                if cel > 0
+            ]
+        x_half = int(invader.width / 2)
+        y_half = int(invader.height / 2)
+        matching_invaders = MatchArray()
+        for j, i, cel in peaks:
+            # account for enlarged radar map coordinates
+            real_x_coord = max(0, i - x_half)
+            real_y_coord = max(0, j - y_half)
+            matching_invaders.append(
+                invader.name,
+                i,
+                j,
+                real_x_coord,
+                real_y_coord,
+                invader.width,
+                invader.height,
+                cel,
+            )
         return matching_invaders
 
+    def find_peaks_nms(
+        self, invader: Invader, rs: List[List[float]]
+    ) -> List[Tuple[int, int, float]]:
+        """
+        Vectorized 2D non-maximum suppression of the matrix of match
+        scores of an invader, returns the (row, column, score) of the
+        scores above the threshold that are the highest of the
+        neighbourhood around them, the invader's footprint by default.
+        """
+        import numpy as np
+
+        from numpy_algos import NumpyAlgos
+
+        scores = np.asarray(rs, dtype=np.float64)
+        if scores.ndim != 2:
+            return []
+        size = self.neighbourhood or (invader.width, invader.height)
+        rows, cols = NumpyAlgos().find_peaks_2d(scores, size, self.threshold)
+        return list(zip(rows.tolist(), cols.tolist(), scores[rows, cols].tolist()))
+
     def overlap(self, m1: InvaderMatch, m2: InvaderMatch) -> bool:
         """
         Checks over two invaders overlap, basically checks for
@@ -116,35 +688,184 @@ class DetectionAlgo(BaseDetectionAlgo, GenericAlgos):
         return overlaps
 
     def get_best_matching_data(
-        self, invader_coord_scores: List[InvaderMatch]
-    ) -> List[InvaderMatch]:
+        self, invader_coord_scores: Union[List[InvaderMatch], MatchArray]
+    ) -> Union[List[InvaderMatch], MatchArray]:
         """
         Given a list of invaders, their coordinates and match scores
         in case of invader overlaps the method will select the invader
         with the highest score, otherwise will just insert the invader
         in the final list.
+        Returns a MatchArray when given one, and a list of the
+        accepted invaders otherwise.
         """
-        final_matches = set()
-        excluded = set()
-        for match in invader_coord_scores:
-            if match in excluded:
-                continue
-            overlaps = self.get_overlaps(match, invader_coord_scores)
+        if isinstance(invader_coord_scores, MatchArray):
+            return invader_coord_scores.take(
+                self.get_best_matching_indices(invader_coord_scores)
+            )
+        matches = MatchArray(invader_coord_scores)
+        return [invader_coord_scores[i] for i in self.get_best_matching_indices(matches)]
+
+    def get_best_matching_indices(self, matches: MatchArray) -> List[int]:
+        """
+        Returns the indices of the matches kept by get_best_matching_data.
+        Invaders are accepted from the highest score down, skipping those
+        overlapping an already accepted one. The accepted invaders are kept
+        in a uniform grid, so only the ones in nearby cells are checked.
+        Works on the columns of the matches, no InvaderMatch is built.
+        """
+        if not matches:
+            return []
+        xs, ys, widths, heights = matches.x, matches.y, matches.width, matches.height
+        # an invader overlapping another starts at most one cell away from it
+        cell_size = max(max(widths), max(heights)) + 1
+        grid = defaultdict(list)
+        accepted = []
+        # sorting is stable, ties keep their order
+        for index in matches.argsort_by_score():
+            x, y, width, height = xs[index], ys[index], widths[index], heights[index]
+            overlaps = any(
+                # same rectangle collision test as overlap
+                not (
+                    x > xs[k] + widths[k]
+                    or x + width < xs[k]
+                    or y > ys[k] + heights[k]
+                    or y + height < ys[k]
+                )
+                for cell_x in range((x - cell_size) // cell_size, (x + width) // cell_size + 1)
+                for cell_y in range((y - cell_size) // cell_size, (y + height) // cell_size + 1)
+                for k in grid.get((cell_x, cell_y), [])
+            )
             if overlaps:
-                best_score_match = max(overlaps, key=lambda m: m.score)
-                final_matches.add(best_score_match)
-                overlaps.remove(best_score_match)
-                (excluded.add(o) for o in overlaps)
-            else:
-                final_matches.add(match)
-        return list(final_matches)
+                continue
+            grid[(x // cell_size, y // cell_size)].append(index)
+            accepted.append(index)
+        return accepted
+
+    def get_targets(self) -> MatchArray:
+        """
+        Returns the candidates of every invader, before resolving the
+        overlaps, with a single pool for all the tiled scans.
+        """
+        with self.pool():
+            if self.joint:
+                return self.get_targets_from_joint_scan()
+            self.schedule_tiles(self.invaders)
+            matching_data = MatchArray()
+            for invader in self.invaders:
+                md = self.get_targets_from_scan_data(invader)
+                matching_data.extend(md)
+        return matching_data
 
-    def run_search(self) -> List[InvaderMatch]:
+    def run_search(self) -> MatchArray:
         """
         Main entry function to search for invader patterns.
+        The number of windows skipped by the prefilter is left
+        in windows_pruned.
         """
-        matching_data = []
-        for invader in self.invaders:
-            md = self.get_targets_from_scan_data(invader)
-            matching_data += md
-        return self.get_best_matching_data(matching_data)
+        self.windows_pruned = 0
+        matching_data = self.get_targets()
+        with self.measure("get_best_matching_data"):
+            best_matching_data = self.get_best_matching_data(matching_data)
+        if self.metrics is not None:
+            self.metrics.count("matches", len(best_matching_data))
+            self.metrics.record_peak_memory()
+        return best_matching_data
+
+    def sweep_thresholds(
+        self,
+        thresholds: Sequence[float],
+        ground_truth: Optional[List[Dict]] = None,
+        tolerance: int = 1,
+    ) -> List[Dict]:
+        """
+        Searches the radar data for every threshold with a single scan.
+        The peaks found at the lowest threshold are the peaks at any
+        higher one once those not above it are dropped, so the scores
+        are computed and their peaks found once, and only the overlaps
+        are resolved per threshold.
+        Returns, per threshold, the number of candidates and matches
+        of every invader, with the precision and recall of the matches
+        against ground_truth if given, see evaluate.
+        """
+        if not thresholds:
+            raise ValueError("No thresholds to sweep!")
+        threshold = self.threshold
+        # the bounded engine and the prefilter zero the scores below the
+        # threshold, which doesn't change the peaks above it
+        self.threshold = min(thresholds)
+        self.windows_pruned = 0
+        try:
+            candidates = self.get_targets()
+        finally:
+            self.threshold = threshold
+        results = []
+        for threshold in thresholds:
+            above = candidates.above(threshold)
+            with self.measure("get_best_matching_data"):
+                matches = self.get_best_matching_data(above)
+            result = {
+                "threshold": threshold,
+                "candidates": self.count_by_invader(above),
+                "matches": self.count_by_invader(matches),
+            }
+            if ground_truth is not None:
+                result.update(self.evaluate(matches, ground_truth, tolerance))
+            results.append(result)
+        return results
+
+    def count_by_invader(self, matches: MatchArray) -> Dict[str, int]:
+        """
+        Number of matches of every invader.
+        """
+        counts = {invader.name: 0 for invader in self.invaders}
+        for name_id in matches.ids:
+            counts[matches.names[name_id]] += 1
+        return counts
+
+    def evaluate(
+        self, matches: MatchArray, ground_truth: List[Dict], tolerance: int = 1
+    ) -> Dict:
+        """
+        Compares matches to the invaders known to be in the radar data,
+        dicts with their name, real_x and real_y. A match is a true
+        positive if it is at most tolerance cells away from a known
+        invader of the same name not claimed by a higher scoring match.
+        Precision and recall are None when undefined.
+        """
+        unclaimed = list(ground_truth)
+        true_positives = 0
+        for match in matches.sorted_by_score():
+            for known in unclaimed:
+                if (
+                    known["name"] == match.name
+                    and abs(known["real_x"] - match.real_x) <= tolerance
+                    and abs(known["real_y"] - match.real_y) <= tolerance
+                ):
+                    unclaimed.remove(known)
+                    true_positives += 1
+                    break
+        return {
+            "true_positives": true_positives,
+            "false_positives": len(matches) - true_positives,
+            "false_negatives": len(unclaimed),
+            "precision": true_positives / len(matches) if len(matches) else None,
+            "recall": true_positives / len(ground_truth) if ground_truth else None,
+        }
+
+
+def scan_tile(
+    tile: List[str],
+    pattern: CompiledPattern,
+    threshold: float,
+    engine: str,
+    prefilter: bool = False,
+    empty_char: str = "-",
+) -> Tuple[List[List[float]], int, int]:
+    """
+    Process pool entry point, scores the windows starting in a tile
+    of an enlarged radar data, returns the scores, the number of
+    string comparisons made and of windows pruned.
+    """
+    algo = DetectionAlgo(RadarMap("", empty_char), [], threshold, engine, prefilter=prefilter)
+    scores = algo.scan_enlarged_radar_data(tile, pattern)
+    return scores, algo.levenshtein_calls, algo.windows_pruned
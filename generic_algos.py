@@ -1,7 +1,94 @@
-from typing import List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+
+class FrozenDict(dict):
+    """
+    Read only dict, lookups are as fast as a dict's and it pickles
+    like one, but every method changing it raises a TypeError.
+    """
+
+    def readonly(self, *args, **kwargs):
+        raise TypeError("FrozenDict can't be changed!")
+
+    __setitem__ = __delitem__ = __ior__ = readonly
+    clear = pop = popitem = setdefault = update = readonly
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+class PackedLine(NamedTuple):
+    """
+    A string prepared for GenericAlgos.levenshtein_packed.
+    """
+
+    length: int
+    # per character, bit j is set if line[j] is that character
+    masks: Mapping[str, int]
+
+
+@lru_cache(maxsize=1024)
+def pack_line(line: str) -> PackedLine:
+    """
+    Packs a string for levenshtein_packed. Packed lines are cached
+    and shared, so their masks are read only.
+    """
+    masks = {}
+    for j, c in enumerate(line):
+        masks[c] = masks.get(c, 0) | (1 << j)
+    return PackedLine(len(line), FrozenDict(masks))
+
+
+class CompiledPattern(NamedTuple):
+    """
+    Immutable representation of an invader pattern prepared once for
+    all the windows compared to it, cheap to pickle to pool workers.
+    """
+
+    width: int
+    height: int
+    rows: Tuple[str, ...]
+    columns: Tuple[str, ...]
+    packed_rows: Tuple[PackedLine, ...]
+    packed_columns: Tuple[PackedLine, ...]
+    # per line, the number of cells holding each character
+    row_counts: Tuple[Mapping[str, int], ...]
+    column_counts: Tuple[Mapping[str, int], ...]
+
+
+def count_symbols(line: str) -> Mapping[str, int]:
+    counts = {}
+    for c in line:
+        counts[c] = counts.get(c, 0) + 1
+    return FrozenDict(counts)
+
+
+def compile_pattern(pattern: Union[Sequence[str], CompiledPattern]) -> CompiledPattern:
+    """
+    Returns the compiled form of a pattern, patterns already
+    compiled are returned as they are.
+    """
+    if isinstance(pattern, CompiledPattern):
+        return pattern
+    rows = tuple(pattern)
+    columns = tuple("".join(l) for l in zip(*rows))
+    return CompiledPattern(
+        len(rows[0]) if rows else 0,
+        len(rows),
+        rows,
+        columns,
+        tuple(pack_line(line) for line in rows),
+        tuple(pack_line(line) for line in columns),
+        tuple(count_symbols(line) for line in rows),
+        tuple(count_symbols(line) for line in columns),
+    )
 
 
 class GenericAlgos:
+    # number of string comparisons made, for instrumentation
+    levenshtein_calls = 0
+
     def __init__(self) -> None:
         self.threshold = 0
 
@@ -15,6 +102,7 @@ class GenericAlgos:
         if len(s1) < len(s2):
             return self.levenshtein(s2, s1)
 
+        self.levenshtein_calls += 1
         if len(s2) == 0:
             return len(s1)
 
@@ -44,6 +132,163 @@ class GenericAlgos:
 
         return lev, ratio
 
+    def levenshtein_bitparallel(self, s1: str, s2: str) -> Tuple[int, float]:
+        """
+        Bit-parallel version of levenshtein returning the same distance
+        and ratio, see levenshtein_packed.
+        """
+        if len(s1) < len(s2):
+            return self.levenshtein_bitparallel(s2, s1)
+
+        self.levenshtein_calls += 1
+        if len(s2) == 0:
+            return len(s1), 0.0
+
+        lev, r = self.levenshtein_packed(s1, pack_line(s2))
+        return lev, ((len(s1) + len(s2)) - r) / (len(s1) + len(s2))
+
+    def packed_ratio(self, s1: str, packed: PackedLine, s2: str) -> float:
+        """
+        Levenshtein ratio of s1 against s2 packed, see levenshtein_packed.
+        When s1 is shorter levenshtein swaps the strings, so s2 is packed
+        again the other way round.
+        """
+        if len(s1) < packed.length:
+            return self.levenshtein_bitparallel(s1, s2)[1]
+        self.levenshtein_calls += 1
+        length = len(s1) + packed.length
+        if packed.length == 0:
+            return 0.0
+        return (length - self.levenshtein_packed(s1, packed)[1]) / length
+
+    def levenshtein_packed(self, s1: str, packed: PackedLine) -> Tuple[int, int]:
+        """
+        Computes the Levenshtein distance and the distance used for the
+        ratio (see levenshtein) of s1 against a packed string, s1 should
+        not be shorter than the packed string to match levenshtein, which
+        swaps the strings otherwise.
+        The Levenshtein distance uses the bit-parallel algorithm of Myers
+        as formulated by Hyyro, every DP row is kept as bit vectors of the
+        +1/-1 differences between adjacent cells (vp, vn) and is advanced
+        by a character of s1 with a few int operations.
+        In every cell the ratio distance is either equal to the Levenshtein
+        distance or one more, so the ratio row is kept as one more bit
+        vector e of the cells where it's one more. A cell has e set unless
+        one of its three candidates reaches the Levenshtein value, that is
+        the cell above has a +1 horizontal difference and no e bit, the cell
+        to the left has a +1 vertical difference, or the characters match
+        and the diagonal cell has no e bit.
+        """
+        m = packed.length
+        mask = (1 << m) - 1
+        last = 1 << (m - 1)
+        vp = mask
+        vn = 0
+        e = 0
+        lev = m
+        for c1 in s1:
+            eq = packed.masks.get(c1, 0)
+            xv = eq | vn
+            xh = (((eq & vp) + vp) ^ vp) | eq
+            hp = vn | (~(xh | vp) & mask)
+            hn = vp & xh
+            if hp & last:
+                lev += 1
+            elif hn & last:
+                lev -= 1
+            # the first column always grows by one
+            shifted_hp = ((hp << 1) | 1) & mask
+            shifted_hn = (hn << 1) & mask
+            e_not_set = (hp & ~e) | (eq & ~(e << 1))
+            vp = shifted_hn | (~(xv | shifted_hp) & mask)
+            vn = shifted_hp & xv
+            e = ~(e_not_set | vp) & mask
+        return lev, lev + (1 if e & last else 0)
+
+    def bounded_ratio(
+        self, s1: str, s2: str, max_distance: int
+    ) -> Optional[Tuple[int, float]]:
+        """
+        Bounded variant of levenshtein, returns the distance used for the
+        ratio (substitutions cost 2) and the ratio, or None as soon as it's
+        known that the distance will exceed max_distance.
+        Uses a DP restricted to the band of cells within max_distance of
+        the diagonal (Ukkonen), cells outside of it can't lead to a
+        distance within the bound.
+        """
+        if len(s1) < len(s2):
+            return self.bounded_ratio(s2, s1, max_distance)
+
+        self.levenshtein_calls += 1
+        length = len(s1) + len(s2)
+        # the distance is at least the difference in length
+        if len(s1) - len(s2) > max_distance:
+            return None
+        if len(s2) == 0:
+            return len(s1), 0.0
+
+        # value for cells outside of the band, any path going
+        # through them ends up above max_distance anyway
+        out_of_band = max_distance + 1
+        previous_row = [min(j, out_of_band) for j in range(len(s2) + 1)]
+        previous_ratio_row = previous_row
+        for i, c1 in enumerate(s1):
+            current_row = [out_of_band] * (len(s2) + 1)
+            ratio_row = [out_of_band] * (len(s2) + 1)
+            current_row[0] = ratio_row[0] = min(i + 1, out_of_band)
+            start = max(1, i + 1 - max_distance)
+            end = min(len(s2), i + 1 + max_distance)
+            # the final distance is at least the value of a cell plus the
+            # difference in length of the remaining suffixes, keep the
+            # lowest such bound over the row to stop early
+            remaining = len(s1) - i - 1 - len(s2)
+            lowest = current_row[0] + abs(remaining) if start == 1 else out_of_band
+            # this is the hot path, so the minimums are computed
+            # with comparisons instead of calls to min
+            for j in range(start, end + 1):
+                deletions = current_row[j - 1] + 1
+                insertions = previous_row[j] + 1
+                ratio_insertions = previous_ratio_row[j] + 1
+                if c1 == s2[j - 1]:
+                    substitutions = previous_row[j - 1]
+                    ratio_substitutions = previous_ratio_row[j - 1]
+                else:
+                    substitutions = previous_row[j - 1] + 1
+                    ratio_substitutions = previous_ratio_row[j - 1] + 2
+                lev = insertions if insertions < deletions else deletions
+                if substitutions < lev:
+                    lev = substitutions
+                ratio = ratio_insertions if ratio_insertions < deletions else deletions
+                if ratio_substitutions < ratio:
+                    ratio = ratio_substitutions
+                current_row[j] = lev
+                ratio_row[j] = ratio
+                bound = lev + abs(remaining + j)
+                if bound < lowest:
+                    lowest = bound
+            # the ratio distance is never lower than the Levenshtein distance
+            if lowest > max_distance:
+                return None
+            previous_row = current_row
+            previous_ratio_row = ratio_row
+
+        r = previous_ratio_row[-1]
+        if r > max_distance:
+            return None
+        return r, (length - r) / length
+
+    def cached_ratio(
+        self, s1: str, s2: str, cache: Dict[Tuple[str, str], float]
+    ) -> float:
+        """
+        Returns the Levenshtein ratio of two strings, memoized in
+        the given cache so repeated pairs are only computed once.
+        """
+        key = (s1, s2)
+        if key not in cache:
+            cache[key] = self.levenshtein(s1, s2)[1]
+        return cache[key]
+
     def run_leven(
         self, str_list_1: List[str], str_list_2: List[str]
     ) -> List[Tuple[int, float]]:
@@ -58,21 +303,177 @@ class GenericAlgos:
         return leven
 
     def compare_input_data_to_pattern(
-        self, input_data: List[str], pattern: List[str]
+        self,
+        input_data: List[str],
+        pattern: Union[List[str], CompiledPattern],
+        t_input_data: Optional[List[str]] = None,
     ) -> float:
         """
         Given an input pattern and a pattern to compare it with
         the method will run a Levenshtein ratio comparison for
         each row and column, returning the average of the values.
+        The columns of the input data can be passed as t_input_data
+        when they are shared by several comparisons.
         """
-        row_leven = self.run_leven(input_data, pattern)
-        t_input_data = list(map(lambda l: "".join(l), zip(*input_data)))
-        t_pattern = list(map(lambda l: "".join(l), zip(*pattern)))
-        col_leven = self.run_leven(t_input_data, t_pattern)
+        pattern = compile_pattern(pattern)
+        row_leven = self.run_leven(input_data, pattern.rows)
+        if t_input_data is None:
+            t_input_data = list(map(lambda l: "".join(l), zip(*input_data)))
+        col_leven = self.run_leven(t_input_data, pattern.columns)
         row_score = sum([i[1] for i in row_leven]) / len(row_leven)
         col_score = sum([i[1] for i in col_leven]) / len(col_leven)
         return (row_score + col_score) / 2
 
+    def compare_input_data_to_pattern_cached(
+        self,
+        input_data: List[str],
+        pattern: Union[List[str], CompiledPattern],
+        t_input_data: Optional[List[str]] = None,
+        cache: Optional[Dict[Tuple[str, str], float]] = None,
+    ) -> float:
+        """
+        Same as compare_input_data_to_pattern with the ratios memoized
+        in cache, shared by the comparisons, see cached_ratio.
+        """
+        pattern = compile_pattern(pattern)
+        if cache is None:
+            cache = {}
+        if t_input_data is None:
+            t_input_data = ["".join(l) for l in zip(*input_data)]
+        row_ratios = [
+            self.cached_ratio(line, row, cache) for line, row in zip(input_data, pattern.rows)
+        ]
+        col_ratios = [
+            self.cached_ratio(line, column, cache)
+            for line, column in zip(t_input_data, pattern.columns)
+        ]
+        row_score = sum(row_ratios) / len(row_ratios)
+        col_score = sum(col_ratios) / len(col_ratios)
+        return (row_score + col_score) / 2
+
+    def max_total_distance(self, pattern: CompiledPattern) -> int:
+        """
+        Highest total ratio distance over the rows and columns of a
+        window the size of the pattern that still scores self.threshold.
+        Since every row and column of the window is as long as the
+        pattern's, the score is 1 - total_distance / (4 * width * height).
+        """
+        area = 4 * pattern.height * pattern.width
+        # keep a small margin so windows scoring right at the threshold
+        # aren't pruned due to floating point rounding
+        return int((1 - self.threshold) * area * (1 + 1e-9) + 1e-9)
+
+    def summed_area_table(self, lines: Sequence[str], empty_char: str) -> List[List[int]]:
+        """
+        Returns the summed area table of the non empty cells of lines,
+        table[y][x] is the number of such cells above and left of (x, y),
+        so the count in any rectangle takes four lookups.
+        """
+        width = len(lines[0]) if len(lines) else 0
+        table = [[0] * (width + 1)]
+        for line in lines:
+            previous = table[-1]
+            row = [0]
+            count = 0
+            for x, c in enumerate(line):
+                if c != empty_char:
+                    count += 1
+                row.append(previous[x + 1] + count)
+            table.append(row)
+        return table
+
+    def distance_lower_bound(
+        self,
+        table: List[List[int]],
+        offset: Tuple[int, int],
+        pattern: CompiledPattern,
+        empty_char: str,
+    ) -> int:
+        """
+        Lower bound of the total ratio distance over the rows and columns
+        of the window at offset, from the summed area table of the data.
+        Every edit changes the number of non empty cells of a line by at
+        most one, so lines differing by d in that number are at least d
+        apart, and the ratio distance is never below the Levenshtein one.
+        """
+        x, y = offset
+        x_end = x + pattern.width
+        y_end = y + pattern.height
+        total = 0
+        top = table[y]
+        for k, counts in enumerate(pattern.row_counts):
+            bottom = table[y + k + 1]
+            count = bottom[x_end] - top[x_end] - bottom[x] + top[x]
+            total += abs(count - pattern.width + counts.get(empty_char, 0))
+            top = bottom
+        top = table[y]
+        bottom = table[y_end]
+        for k, counts in enumerate(pattern.column_counts):
+            count = bottom[x + k + 1] - top[x + k + 1] - bottom[x + k] + top[x + k]
+            total += abs(count - pattern.height + counts.get(empty_char, 0))
+        return total
+
+    def compare_input_data_to_pattern_bounded(
+        self,
+        input_data: List[str],
+        pattern: Union[List[str], CompiledPattern],
+        t_input_data: Optional[List[str]] = None,
+    ) -> float:
+        """
+        Same as compare_input_data_to_pattern, but stops and returns 0
+        as soon as the average can't exceed self.threshold anymore,
+        max_total_distance bounds the total distance allowed for the
+        remaining rows and columns.
+        """
+        pattern = compile_pattern(pattern)
+        max_total = self.max_total_distance(pattern)
+        total = 0
+        ratios = []
+        if t_input_data is None:
+            t_input_data = list(map(lambda l: "".join(l), zip(*input_data)))
+        pairs = list(zip(input_data, pattern.rows)) + list(
+            zip(t_input_data, pattern.columns)
+        )
+        for str_1, str_2 in pairs:
+            result = self.bounded_ratio(str_1, str_2, max_total - total)
+            if result is None:
+                return 0
+            total += result[0]
+            ratios.append(result[1])
+        row_ratios = ratios[: len(input_data)]
+        col_ratios = ratios[len(input_data) :]
+        row_score = sum(row_ratios) / len(row_ratios)
+        col_score = sum(col_ratios) / len(col_ratios)
+        return (row_score + col_score) / 2
+
+    def compare_input_data_to_pattern_bitparallel(
+        self,
+        input_data: List[str],
+        pattern: Union[List[str], CompiledPattern],
+        t_input_data: Optional[List[str]] = None,
+    ) -> float:
+        """
+        Same as compare_input_data_to_pattern using the bit-parallel
+        Levenshtein, the rows and columns of a compiled pattern are
+        already packed.
+        """
+        pattern = compile_pattern(pattern)
+        if t_input_data is None:
+            t_input_data = list(map(lambda l: "".join(l), zip(*input_data)))
+        row_ratios = [
+            self.packed_ratio(line, packed, row)
+            for line, packed, row in zip(input_data, pattern.packed_rows, pattern.rows)
+        ]
+        col_ratios = [
+            self.packed_ratio(line, packed, column)
+            for line, packed, column in zip(
+                t_input_data, pattern.packed_columns, pattern.columns
+            )
+        ]
+        row_score = sum(row_ratios) / len(row_ratios)
+        col_score = sum(col_ratios) / len(col_ratios)
+        return (row_score + col_score) / 2
+
     def find_peaks(self, score_data: List[List[float]]) -> List[List[float]]:
         """
         Given a list of list of floats the method will keep only the peaks
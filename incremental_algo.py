@@ -0,0 +1,417 @@
+import heapq
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from detection_algo import DetectionAlgo
+from invaders import Invader, InvaderMatch, MatchArray
+from metrics import DetectionMetrics
+from radar_map import RadarMap
+
+# inclusive (left, top, right, bottom) range of cells or windows
+Rectangle = Tuple[int, int, int, int]
+# candidates are identified by invader index and window coordinates
+CandidateKey = Tuple[int, int, int]
+
+
+class IncrementalDetectionAlgo(DetectionAlgo):
+    """
+    Detection algorithm for consecutive radar frames that differ little
+    from one another.
+    The first frame is searched like DetectionAlgo does, keeping every
+    invader's enlarged radar data, matrix of scores and candidates.
+    Every following frame given to update is diffed row by row against
+    the previous one: only the windows covering changed cells, the dirty
+    rectangles grown by the invader's size, are scored again, and the
+    peaks are found again only where those scores can change them.
+    The overlaps are then resolved again only for the candidates that
+    changed and those their change can cascade to, so the cost of a
+    frame follows the amount of change rather than the map size.
+    The matches are the same as a full search of every frame.
+    """
+
+    def __init__(
+        self,
+        radar_map: RadarMap,
+        invaders: List[Invader],
+        threshold: float,
+        engine: str = "levenshtein",
+        workers: int = 1,
+        metrics: Optional[DetectionMetrics] = None,
+        prefilter: bool = False,
+        peaks: str = "separable",
+        neighbourhood: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        super().__init__(
+            radar_map,
+            invaders,
+            threshold,
+            engine,
+            workers,
+            metrics,
+            prefilter,
+            peaks=peaks,
+            neighbourhood=neighbourhood,
+        )
+        # state of the last searched frame, per invader
+        self.enlarged_radar_data: List[List[str]] = []
+        self.scores: List[List[List[float]]] = []
+        # candidates of every invader, in a uniform grid of their window
+        # coordinates, and the ones accepted by the overlap resolution
+        self.candidates: Dict[CandidateKey, InvaderMatch] = {}
+        self.grid: Dict[Tuple[int, int], Set[CandidateKey]] = defaultdict(set)
+        self.accepted: Set[CandidateKey] = set()
+        # an invader overlapping another starts at most one cell away from it
+        self.cell_size = max([max(i.width, i.height) for i in invaders], default=0) + 1
+        # number of windows scored again by the last update
+        self.windows_rescored = 0
+
+    def get_dirty_rectangles(
+        self, previous: List[str], current: List[str]
+    ) -> List[Rectangle]:
+        """
+        Diffs two frames of the same size row by row and returns the
+        rectangles of cells that changed, consecutive changed rows being
+        merged into a single rectangle spanning all of their changes.
+        """
+        rectangles = []
+        band = None
+        for y, (old_row, new_row) in enumerate(zip(previous, current)):
+            if old_row == new_row:
+                band = None
+                continue
+            changed = [x for x, (a, b) in enumerate(zip(old_row, new_row)) if a != b]
+            left, right = changed[0], changed[-1]
+            if band is None:
+                band = [left, y, right, y]
+                rectangles.append(band)
+            else:
+                band[0] = min(band[0], left)
+                band[2] = max(band[2], right)
+                band[3] = y
+        return [tuple(band) for band in rectangles]
+
+    def get_dirty_windows(
+        self,
+        invader: Invader,
+        rectangles: List[Rectangle],
+        size: Tuple[int, int],
+        margin: Tuple[int, int] = (0, 0),
+    ) -> List[Rectangle]:
+        """
+        Returns the windows of the matrix of scores of the given size
+        covering any of the changed cells of the rectangles, grown by
+        margin, as non overlapping rectangles of window coordinates.
+        """
+        cols, rows = size
+        half_width = int(invader.width / 2)
+        half_height = int(invader.height / 2)
+        grown = []
+        for left, top, right, bottom in rectangles:
+            # the window at (i, j) covers the cells of the radar data from
+            # i - half_width to i - half_width + width - 1, same for rows
+            window = [
+                max(0, left + half_width - invader.width + 1 - margin[0]),
+                max(0, top + half_height - invader.height + 1 - margin[1]),
+                min(cols - 1, right + half_width + margin[0]),
+                min(rows - 1, bottom + half_height + margin[1]),
+            ]
+            if window[0] <= window[2] and window[1] <= window[3]:
+                grown.append(window)
+        # merge overlapping windows so no window is scored, or no
+        # peak found, twice
+        merged = []
+        for window in grown:
+            overlapping = True
+            while overlapping:
+                overlapping = False
+                for k, other in enumerate(merged):
+                    if not (
+                        window[0] > other[2]
+                        or window[2] < other[0]
+                        or window[1] > other[3]
+                        or window[3] < other[1]
+                    ):
+                        window = [
+                            min(window[0], other[0]),
+                            min(window[1], other[1]),
+                            max(window[2], other[2]),
+                            max(window[3], other[3]),
+                        ]
+                        del merged[k]
+                        overlapping = True
+                        break
+            merged.append(window)
+        return [tuple(window) for window in merged]
+
+    def get_peak_margin(self, invader: Invader) -> Tuple[int, int]:
+        """
+        How far, in windows, a score changes whether the windows around
+        it are peaks: the direct neighbours for find_peaks and half of
+        the neighbourhood for non-maximum suppression.
+        """
+        if self.peaks == "nms":
+            width, height = self.neighbourhood or (invader.width, invader.height)
+            return width // 2, height // 2
+        return 1, 1
+
+    def rescore_windows(self, index: int, windows: List[Rectangle]) -> None:
+        """
+        Scores the windows again from the updated enlarged radar data
+        of an invader, in place in its matrix of scores.
+        """
+        self.windows_rescored += self.scan_regions(
+            self.scores[index],
+            self.enlarged_radar_data[index],
+            self.invaders[index].compiled,
+            windows,
+        )
+
+    def refind_peaks(
+        self, index: int, windows: List[Rectangle]
+    ) -> Tuple[List[CandidateKey], List[InvaderMatch]]:
+        """
+        Finds the peaks again in the windows whose peak status could have
+        changed and returns the keys of the invader's candidates found
+        there before, and the candidates found there now. Peaks are found
+        on the windows plus a margin around them, so the ones inside see
+        the same neighbours as in the whole matrix of scores.
+        """
+        invader = self.invaders[index]
+        scores = self.scores[index]
+        x_margin, y_margin = self.get_peak_margin(invader)
+        rows = len(scores)
+        cols = len(scores[0])
+        x_half = int(invader.width / 2)
+        y_half = int(invader.height / 2)
+        removed = []
+        added = []
+        for left, top, right, bottom in windows:
+            removed.extend(
+                key
+                for key in self.get_nearby_keys((left, top, right, bottom))
+                if key[0] == index
+                and left <= key[1] <= right
+                and top <= key[2] <= bottom
+            )
+            region_left = max(0, left - x_margin)
+            region_top = max(0, top - y_margin)
+            region = [
+                row[region_left : min(cols, right + x_margin + 1)]
+                for row in scores[region_top : min(rows, bottom + y_margin + 1)]
+            ]
+            for target in self.get_targets_from_scores(invader, region):
+                i = target.x + region_left
+                j = target.y + region_top
+                if left <= i <= right and top <= j <= bottom:
+                    added.append(
+                        target._replace(
+                            x=i, y=j, real_x=max(0, i - x_half), real_y=max(0, j - y_half)
+                        )
+                    )
+        return removed, added
+
+    def get_key(self, index: int, match: InvaderMatch) -> CandidateKey:
+        return index, match.x, match.y
+
+    def get_priority(self, key: CandidateKey) -> tuple:
+        """
+        Order in which get_best_matching_data accepts the candidates:
+        highest score first, then by invader and in row major order.
+        """
+        index, x, y = key
+        return -self.candidates[key].score, index, y, x
+
+    def get_nearby_keys(self, rectangle: Rectangle) -> Iterator[CandidateKey]:
+        """
+        Keys of the candidates in the grid cells a rectangle of window
+        coordinates could overlap.
+        """
+        left, top, right, bottom = rectangle
+        cell_size = self.cell_size
+        for cell_x in range((left - cell_size) // cell_size, right // cell_size + 1):
+            for cell_y in range((top - cell_size) // cell_size, bottom // cell_size + 1):
+                yield from self.grid.get((cell_x, cell_y), ())
+
+    def get_overlapping_keys(self, key: CandidateKey) -> List[CandidateKey]:
+        """
+        Keys of the other candidates overlapping a candidate.
+        """
+        match = self.candidates[key]
+        return [
+            other
+            for other in self.get_nearby_keys(
+                (match.x, match.y, match.x + match.width, match.y + match.height)
+            )
+            if other != key and self.overlap(match, self.candidates[other])
+        ]
+
+    def add_candidate(self, key: CandidateKey, match: InvaderMatch) -> None:
+        self.candidates[key] = match
+        self.grid[(match.x // self.cell_size, match.y // self.cell_size)].add(key)
+
+    def remove_candidate(self, key: CandidateKey) -> None:
+        match = self.candidates.pop(key)
+        self.grid[(match.x // self.cell_size, match.y // self.cell_size)].discard(key)
+        self.accepted.discard(key)
+
+    def resolve_changes(
+        self,
+        removed: List[CandidateKey],
+        added: List[Tuple[CandidateKey, InvaderMatch]],
+    ) -> None:
+        """
+        Removes and adds candidates and updates the accepted ones,
+        with the same result as get_best_matching_data on all of them.
+        A candidate is accepted if no accepted candidate of a higher
+        priority overlaps it, so it only needs to be checked again when
+        one of those changed. The changed candidates are checked from the
+        highest priority down, each change queuing the lower priority
+        candidates overlapping it.
+        """
+        queue = []
+
+        def push_lower(key: CandidateKey) -> None:
+            priority = self.get_priority(key)
+            for other in self.get_overlapping_keys(key):
+                other_priority = self.get_priority(other)
+                if other_priority > priority:
+                    heapq.heappush(queue, (other_priority, other))
+
+        for key in removed:
+            if key in self.accepted:
+                push_lower(key)
+            self.remove_candidate(key)
+        for key, match in added:
+            self.add_candidate(key, match)
+            heapq.heappush(queue, (self.get_priority(key), key))
+        checked = set()
+        while queue:
+            priority, key = heapq.heappop(queue)
+            # skip candidates removed, or added again with another score,
+            # since they were queued
+            if (
+                key in checked
+                or key not in self.candidates
+                or priority != self.get_priority(key)
+            ):
+                continue
+            checked.add(key)
+            accepted = not any(
+                other in self.accepted and self.get_priority(other) < priority
+                for other in self.get_overlapping_keys(key)
+            )
+            if accepted != (key in self.accepted):
+                if accepted:
+                    self.accepted.add(key)
+                else:
+                    self.accepted.discard(key)
+                push_lower(key)
+
+    def get_matches(self) -> MatchArray:
+        """
+        The accepted candidates, in the order get_best_matching_data
+        returns them.
+        """
+        matches = MatchArray(
+            self.candidates[key] for key in sorted(self.accepted, key=self.get_priority)
+        )
+        if self.metrics is not None:
+            self.metrics.count("matches", len(matches))
+            self.metrics.record_peak_memory()
+        return matches
+
+    def run_search(self) -> MatchArray:
+        """
+        Searches the whole radar data and keeps the state needed
+        to update the matches for the next frames.
+        """
+        self.windows_pruned = 0
+        self.enlarged_radar_data = []
+        self.scores = []
+        self.candidates = {}
+        self.grid = defaultdict(set)
+        keys = []
+        matching_data = MatchArray()
+        with self.pool():
+            self.schedule_tiles(self.invaders)
+            for index, invader in enumerate(self.invaders):
+                with self.measure("get_enlarged_radar_data", invader.name):
+                    # a copy, its rows are replaced when frames change
+                    enlarged_radar_data = list(
+                        self.radar_map.get_enlarged_radar_data(invader.pattern)
+                    )
+                with self.measure("scan_radar_data", invader.name):
+                    rs = self.scan_enlarged_radar_data(enlarged_radar_data, invader.compiled)
+                with self.measure("find_peaks", invader.name):
+                    targets = self.get_targets_from_scores(invader, rs)
+                if self.metrics is not None:
+                    self.metrics.count("windows_scored", sum(len(row) for row in rs))
+                    self.metrics.count("candidates", len(targets))
+                self.enlarged_radar_data.append(enlarged_radar_data)
+                self.scores.append(rs)
+                for match in targets:
+                    key = self.get_key(index, match)
+                    self.add_candidate(key, match)
+                    keys.append(key)
+                matching_data.extend(targets)
+        self.windows_rescored = sum(len(row) for rs in self.scores for row in rs)
+        with self.measure("get_best_matching_data"):
+            indices = self.get_best_matching_indices(matching_data)
+        self.accepted = {keys[i] for i in indices}
+        return self.get_matches()
+
+    def update(self, radar_map: RadarMap) -> MatchArray:
+        """
+        Searches the next frame, scoring again only the windows covering
+        the cells that changed since the previous one. Frames of another
+        size, or the first one, are searched whole.
+        """
+        previous = self.radar_map
+        self.set_radar_map(radar_map)
+        if (
+            not self.scores
+            or previous.empty_char != radar_map.empty_char
+            or len(previous.radar_data) != len(radar_map.radar_data)
+            or any(
+                len(old_row) != len(new_row)
+                for old_row, new_row in zip(previous.radar_data, radar_map.radar_data)
+            )
+        ):
+            return self.run_search()
+        self.windows_pruned = 0
+        self.windows_rescored = 0
+        with self.measure("diff_frames"):
+            rectangles = self.get_dirty_rectangles(previous.radar_data, radar_map.radar_data)
+        changed_rows = {y for _, top, _, bottom in rectangles for y in range(top, bottom + 1)}
+        removed = []
+        added = []
+        # one pool for the rescans of every invader
+        with self.pool():
+            for index, invader in enumerate(self.invaders):
+                scores = self.scores[index]
+                if not scores or not scores[0]:
+                    continue
+                size = (len(scores[0]), len(scores))
+                with self.measure("get_enlarged_radar_data", invader.name):
+                    half_height = int(invader.height / 2)
+                    enlarged_radar_data = self.enlarged_radar_data[index]
+                    for y in changed_rows:
+                        enlarged_radar_data[y + half_height] = radar_map.get_enlarged_row(
+                            radar_map.radar_data[y], invader.width
+                        )
+                windows_rescored = self.windows_rescored
+                with self.measure("scan_radar_data", invader.name):
+                    self.rescore_windows(index, self.get_dirty_windows(invader, rectangles, size))
+                with self.measure("find_peaks", invader.name):
+                    peak_windows = self.get_dirty_windows(
+                        invader, rectangles, size, self.get_peak_margin(invader)
+                    )
+                    invader_removed, invader_added = self.refind_peaks(index, peak_windows)
+                if self.metrics is not None:
+                    self.metrics.count("windows_scored", self.windows_rescored - windows_rescored)
+                    self.metrics.count("candidates", len(invader_added))
+                removed.extend(invader_removed)
+                added.extend((self.get_key(index, match), match) for match in invader_added)
+        with self.measure("get_best_matching_data"):
+            self.resolve_changes(removed, added)
+        return self.get_matches()
@@ -1,6 +1,12 @@
+from array import array
 from collections import namedtuple
 from dataclasses import dataclass
-from typing import List
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List
+
+from generic_algos import compile_pattern
+
+if TYPE_CHECKING:
+    import numpy as np
 
 
 @dataclass
@@ -12,9 +18,160 @@ class Invader:
         self.pattern = self.str_pattern.split()
         self.width = len(self.pattern[0])
         self.height = len(self.pattern)
+        # rows, columns and bit masks of the pattern, prepared once
+        # for all the windows compared to it
+        self.compiled = compile_pattern(self.pattern)
 
     def __repr__(self) -> str:
         return f"Invader {self.name}, width: {self.width}, height: {self.height}"
 
 
 InvaderMatch = namedtuple("InvaderMatch", "name x y real_x real_y width height score")
+
+
+class MatchArray:
+    """
+    Columnar container of invader matches, one compact array per field
+    of InvaderMatch instead of one object per match, with the invader
+    names stored once and referenced by id. Iterating or indexing it
+    still gives InvaderMatch tuples.
+    """
+
+    __slots__ = (
+        "names",
+        "name_ids",
+        "ids",
+        "x",
+        "y",
+        "real_x",
+        "real_y",
+        "width",
+        "height",
+        "score",
+    )
+
+    def __init__(self, matches: Iterable[InvaderMatch] = ()) -> None:
+        self.names: List[str] = []
+        self.name_ids: Dict[str, int] = {}
+        self.ids = array("l")
+        self.x = array("l")
+        self.y = array("l")
+        self.real_x = array("l")
+        self.real_y = array("l")
+        self.width = array("l")
+        self.height = array("l")
+        self.score = array("d")
+        for match in matches:
+            self.append(*match)
+
+    def get_name_id(self, name: str) -> int:
+        """
+        Returns the id of an invader name, adding it if it's new.
+        """
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def append(
+        self,
+        name: str,
+        x: int,
+        y: int,
+        real_x: int,
+        real_y: int,
+        width: int,
+        height: int,
+        score: float,
+    ) -> None:
+        self.ids.append(self.get_name_id(name))
+        self.x.append(x)
+        self.y.append(y)
+        self.real_x.append(real_x)
+        self.real_y.append(real_y)
+        self.width.append(width)
+        self.height.append(height)
+        self.score.append(score)
+
+    def extend(self, other: "MatchArray") -> None:
+        """
+        Appends all the matches of another MatchArray.
+        """
+        id_map = [self.get_name_id(name) for name in other.names]
+        self.ids.extend(array("l", [id_map[i] for i in other.ids]))
+        for column in ("x", "y", "real_x", "real_y", "width", "height", "score"):
+            getattr(self, column).extend(getattr(other, column))
+
+    def take(self, indices: Iterable[int]) -> "MatchArray":
+        """
+        Returns a MatchArray with the matches at the given indices,
+        in that order.
+        """
+        indices = list(indices)
+        result = MatchArray()
+        result.names = list(self.names)
+        result.name_ids = dict(self.name_ids)
+        for column in ("ids", "x", "y", "real_x", "real_y", "width", "height", "score"):
+            values = getattr(self, column)
+            setattr(result, column, array(values.typecode, [values[i] for i in indices]))
+        return result
+
+    def above(self, threshold: float) -> "MatchArray":
+        """
+        Returns the matches scoring more than threshold.
+        """
+        return self.take(i for i, score in enumerate(self.score) if score > threshold)
+
+    def argsort_by_score(self) -> List[int]:
+        """
+        Returns the indices of the matches from the highest score
+        down, matches with the same score keep their order.
+        """
+        return sorted(range(len(self)), key=self.score.__getitem__, reverse=True)
+
+    def sorted_by_score(self) -> "MatchArray":
+        return self.take(self.argsort_by_score())
+
+    def to_numpy(self) -> "np.ndarray":
+        """
+        Returns the matches as a NumPy structured array, for vectorized
+        filtering and sorting on its fields.
+        """
+        import numpy as np
+
+        dtype = [("id", np.int64)] + [
+            (column, np.int64) for column in ("x", "y", "real_x", "real_y", "width", "height")
+        ] + [("score", np.float64)]
+        result = np.empty(len(self), dtype=dtype)
+        result["id"] = self.ids
+        for column in ("x", "y", "real_x", "real_y", "width", "height", "score"):
+            result[column] = getattr(self, column)
+        return result
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> InvaderMatch:
+        return InvaderMatch(
+            self.names[self.ids[index]],
+            self.x[index],
+            self.y[index],
+            self.real_x[index],
+            self.real_y[index],
+            self.width[index],
+            self.height[index],
+            self.score[index],
+        )
+
+    def __iter__(self) -> Iterator[InvaderMatch]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, (MatchArray, list)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"MatchArray({list(self)!r})"
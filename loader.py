@@ -1,14 +1,29 @@
+import glob
+import json
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from radar_map import RadarMap
+from mapped_radar_map import MappedRadarMap
+from packed_radar_map import PackedRadarMap
 from invaders import Invader
 
+# bump when Invader or the compiled patterns change, so older
+# catalogues are compiled again instead of loaded
+CATALOGUE_VERSION = 1
+
 
 class Loader:
-    def __init__(self, path: str) -> None:
+    def __init__(
+        self, path: str, mapped: bool = False, catalogue: Optional[str] = None
+    ) -> None:
         self.path = Path(path)
         self.radar_pattern = "radar_data"
         self.invader_pattern = "invader"
+        # memory map the radar data instead of reading it
+        self.mapped = mapped
+        # invaders precompiled with save_catalogue, used instead
+        # of the invader files in self.path
+        self.catalogue = catalogue
 
     def load_data(self) -> Tuple[RadarMap, List[Invader]]:
         """
@@ -17,7 +32,108 @@ class Loader:
         invaders = []
         for file in self.path.iterdir():
             if file.name.startswith(self.invader_pattern):
-                invaders.append(Invader(file.stem, file.read_text()))
+                if self.catalogue is None:
+                    invaders.append(Invader(file.stem, file.read_text()))
             elif file.name.startswith(self.radar_pattern):
-                radar_map = RadarMap(file.read_text())
+                radar_map = self.load_radar_map(file)
+        if self.catalogue is not None:
+            invaders = self.load_catalogue(self.catalogue)
         return radar_map, invaders
+
+    def load_radar_map(self, file: Union[str, Path]) -> RadarMap:
+        """
+        Loads a single radar data file, text or packed frame.
+        """
+        if PackedRadarMap.is_packed_file(file):
+            return PackedRadarMap.load(file)
+        if self.mapped:
+            return MappedRadarMap(file)
+        return RadarMap(Path(file).read_text())
+
+    def load_invaders(self) -> List[Invader]:
+        """
+        Loads only the invader patterns from files in self.path,
+        or from the catalogue if there is one.
+        """
+        if self.catalogue is not None:
+            return self.load_catalogue(self.catalogue)
+        invaders = []
+        for file in self.path.iterdir():
+            if file.name.startswith(self.invader_pattern):
+                invaders.append(Invader(file.stem, file.read_text()))
+        return invaders
+
+    def save_catalogue(self, file: Union[str, Path], invaders: List[Invader]) -> None:
+        """
+        Writes invaders, with their compiled patterns, to a catalogue
+        file that load_catalogue reads without compiling them again.
+        """
+        # imported here, only catalogues need it
+        import pickle
+
+        data = {"version": CATALOGUE_VERSION, "invaders": invaders}
+        Path(file).write_bytes(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+    def load_catalogue(self, file: Union[str, Path]) -> List[Invader]:
+        """
+        Loads the invaders of a catalogue written by save_catalogue.
+        Catalogues are pickles, only load the ones you wrote.
+        """
+        import pickle
+
+        try:
+            data = pickle.loads(Path(file).read_bytes())
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            raise ValueError("Not an invader catalogue!")
+        if not isinstance(data, dict) or "invaders" not in data:
+            raise ValueError("Not an invader catalogue!")
+        if data.get("version") != CATALOGUE_VERSION:
+            raise ValueError("Invader catalogue of another version, compile it again!")
+        return data["invaders"]
+
+    def iter_radar_rows(self) -> Iterator[str]:
+        """
+        Yields the rows of the radar_data file in self.path one at a time,
+        without reading the whole file in memory.
+        """
+        for file in self.path.iterdir():
+            if file.name.startswith(self.radar_pattern):
+                if PackedRadarMap.is_packed_file(file):
+                    for row in PackedRadarMap.load(file).radar_data:
+                        yield row + "\n"
+                    return
+                with file.open() as f:
+                    yield from f
+                return
+
+    def find_radar_frames(self, source: str) -> List[Path]:
+        """
+        Returns the radar data files of a batch, sorted by name: the
+        radar_data files in source if it is a directory, otherwise the
+        files matching source as a glob pattern.
+        """
+        source_path = Path(source)
+        if source_path.is_dir():
+            files = [
+                file
+                for file in source_path.iterdir()
+                if file.name.startswith(self.radar_pattern)
+            ]
+        else:
+            files = [Path(file) for file in glob.glob(source, recursive=True)]
+        return sorted(file for file in files if file.is_file())
+
+    def load_ground_truth(self, file: Union[str, Path]) -> List[Dict]:
+        """
+        Loads the invaders known to be in the radar data from a JSON file,
+        a list of matches with at least their name, real_x and real_y, or
+        an object with such a list under "matches", like the results
+        printed with --batch.
+        """
+        data = json.loads(Path(file).read_text())
+        if isinstance(data, dict):
+            data = data.get("matches", [])
+        for known in data:
+            if not {"name", "real_x", "real_y"} <= set(known):
+                raise ValueError("Ground truth matches need a name, real_x and real_y!")
+        return data
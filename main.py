@@ -1,33 +1,346 @@
 import argparse
-
+import json
 import os
 import sys
+from typing import List, Optional
 
-from loader import Loader
-from detection_algo import DetectionAlgo
+# kept in sync with DetectionAlgo.engines and peak_finders, so parsing
+# the arguments doesn't import the detection modules
+ENGINES = ("levenshtein", "numpy", "incremental", "bounded", "bitparallel", "hamming")
+PEAK_FINDERS = ("separable", "nms")
 
-parser = argparse.ArgumentParser(description="List the content of a folder")
 
-# Add the arguments
-parser.add_argument("Path", metavar="path", type=str, help="the path to list")
+def parse_threshold_range(value: str) -> List[float]:
+    """
+    Thresholds from START to STOP, both included, by STEP.
+    """
+    try:
+        start, stop, step = (float(part) for part in value.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected START:STOP:STEP")
+    if step <= 0 or stop < start:
+        raise argparse.ArgumentTypeError("expected START <= STOP and a positive STEP")
+    count = int(round((stop - start) / step)) + 1
+    return [round(start + k * step, 10) for k in range(count)]
 
-parser.add_argument(
-    "--threshold", action="store", type=float, required=True, help="threshold value"
-)
 
-args = parser.parse_args()
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="List the content of a folder")
 
-input_path = args.Path
+    # Add the arguments
+    parser.add_argument("Path", metavar="path", type=str, help="the path to list")
 
-if __name__ == "__main__":
-    if not os.path.isdir(input_path):
+    parser.add_argument("--threshold", action="store", type=float, help="threshold value")
+
+    parser.add_argument(
+        "--threshold-sweep",
+        action="store",
+        type=parse_threshold_range,
+        metavar="START:STOP:STEP",
+        help="scan once and print the candidates and matches per invader for every threshold",
+    )
+
+    parser.add_argument(
+        "--ground-truth",
+        action="store",
+        metavar="FILE",
+        help="JSON matches known to be in the radar data, adds precision and recall to a sweep",
+    )
+
+    parser.add_argument(
+        "--engine",
+        action="store",
+        choices=ENGINES,
+        default="levenshtein",
+        help="scoring engine",
+    )
+
+    parser.add_argument(
+        "--metric",
+        action="store",
+        choices=("levenshtein", "hamming"),
+        default="levenshtein",
+        help="match score, hamming scores the share of agreeing cells with"
+        " FFT cross-correlation and overrides --engine",
+    )
+
+    parser.add_argument(
+        "--peaks",
+        action="store",
+        choices=PEAK_FINDERS,
+        default="separable",
+        help="peak finding, nms is a 2D non-maximum suppression over the invader footprint",
+    )
+
+    parser.add_argument(
+        "--workers",
+        action="store",
+        type=int,
+        default=1,
+        help="number of processes scanning the radar data",
+    )
+
+    parser.add_argument(
+        "--prefilter",
+        action="store_true",
+        help="skip windows whose score can't reach the threshold without comparing them",
+    )
+
+    parser.add_argument(
+        "--joint",
+        action="store_true",
+        help="pad the radar data once and score every invader in a single pass",
+    )
+
+    parser.add_argument(
+        "--cache",
+        action="store",
+        metavar="DIR",
+        help="reuse the score matrices stored in DIR by earlier runs on the same radar data",
+    )
+
+    parser.add_argument(
+        "--pyramid",
+        action="store",
+        type=int,
+        metavar="FACTOR",
+        help="search the radar data downsampled by FACTOR first and rescan"
+        " only around the coarse candidates",
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="read the radar data row by row and print candidates as they are found",
+    )
+
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="memory map the radar data file, which must have fixed width rows",
+    )
+
+    parser.add_argument(
+        "--batch",
+        action="store",
+        metavar="FRAMES",
+        help="search every radar data file in a directory or matching a glob"
+        " with the invaders in path, printing one JSON line per file",
+    )
+
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="with --batch, search every frame only where it differs from the previous one",
+    )
+
+    parser.add_argument(
+        "--serve",
+        action="store",
+        metavar="ADDRESS",
+        help="serve detections over HTTP on HOST:PORT or unix:PATH with the invaders in path",
+    )
+
+    parser.add_argument(
+        "--pack",
+        action="store",
+        default=None,
+        metavar="FILE",
+        help="write the radar data as a packed binary frame to FILE and exit",
+    )
+    parser.add_argument(
+        "--catalogue",
+        action="store",
+        metavar="FILE",
+        help="load the invaders precompiled in FILE instead of the invader files in path",
+    )
+    parser.add_argument(
+        "--compile-catalogue",
+        action="store",
+        metavar="FILE",
+        help="precompile the invaders in path to FILE for --catalogue and exit",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store",
+        nargs="?",
+        const="-",
+        default=None,
+        help="print the time of every stage of the search, or write it as JSON to a file",
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Command line entry point. The detection modules, and the pools,
+    asyncio or NumPy behind them, are only imported when selected.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.pyramid is not None and args.pyramid < 2:
+        parser.error("--pyramid must be at least 2")
+    modes = [f"--{mode}" for mode in ("serve", "batch", "stream") if getattr(args, mode)]
+    if len(modes) > 1:
+        parser.error(f"{modes[0]} can't be combined with {modes[1]}")
+    # options of the search of a single radar data file
+    single_search = {
+        "--threshold-sweep": args.threshold_sweep,
+        "--pyramid": args.pyramid is not None,
+        "--profile": args.profile,
+        "--prefilter": args.prefilter,
+        "--joint": args.joint,
+        "--peaks": args.peaks != parser.get_default("peaks"),
+        "--cache": args.cache,
+    }
+    # options each mode would ignore
+    ignored = {
+        "--serve": {**single_search, "--mmap": args.mmap},
+        "--batch": single_search,
+        "--stream": {
+            **single_search,
+            "--mmap": args.mmap,
+            "--workers": args.workers != parser.get_default("workers"),
+        },
+        "--pyramid": {
+            "--threshold-sweep": args.threshold_sweep,
+            "--joint": args.joint,
+            "--cache": args.cache,
+        },
+    }
+    if args.pyramid is not None:
+        modes.append("--pyramid")
+    for mode in modes:
+        for option, value in ignored[mode].items():
+            if value:
+                parser.error(f"{option} can't be combined with {mode}")
+    if args.incremental and not args.batch:
+        parser.error("--incremental requires --batch")
+    if args.incremental and args.workers > 1:
+        parser.error("--incremental requires a single worker")
+    if args.ground_truth and not args.threshold_sweep:
+        parser.error("--ground-truth requires --threshold-sweep")
+    only_compile = args.pack or args.compile_catalogue
+    if args.threshold is None and not args.threshold_sweep and not only_compile:
+        parser.error("the following arguments are required: --threshold")
+
+    if args.metric == "hamming":
+        args.engine = "hamming"
+
+    if not os.path.isdir(args.Path):
         print("The path specified does not exist")
-        sys.exit()
-    loader = Loader(input_path)
+        return
+
+    from loader import Loader
+
+    loader = Loader(args.Path, args.mmap, args.catalogue)
+    if args.compile_catalogue:
+        loader.save_catalogue(args.compile_catalogue, loader.load_invaders())
+        return
+    if args.pack:
+        from packed_radar_map import PackedRadarMap
+
+        radar_map, _ = loader.load_data()
+        PackedRadarMap.from_lines(radar_map.radar_data, radar_map.empty_char).save(args.pack)
+        return
+    if args.serve:
+        import asyncio
+
+        from service import serve
+
+        try:
+            asyncio.run(
+                serve(
+                    loader.load_invaders(), args.threshold, args.engine, args.workers, args.serve
+                )
+            )
+        except KeyboardInterrupt:
+            pass
+        return
+    if args.batch:
+        from batch_algo import BatchDetectionAlgo
+
+        frames = loader.find_radar_frames(args.batch)
+        with BatchDetectionAlgo(
+            loader.load_invaders(),
+            args.threshold,
+            args.engine,
+            args.workers,
+            args.mmap,
+            args.incremental,
+        ) as batch:
+            for line in batch.search_frames_json(frames):
+                print(line, flush=True)
+        return
+    if args.stream:
+        from streaming_algo import StreamingDetectionAlgo
+
+        algo = StreamingDetectionAlgo(
+            loader.iter_radar_rows(), loader.load_invaders(), args.threshold, args.engine
+        )
+        for i in algo.search_stream():
+            print(
+                f"Candidate: {i.name} at {i.real_x}, {i.real_y} with score {i.score: .2f}"
+            )
+        return
+
+    from detection_algo import DetectionAlgo
+    from metrics import DetectionMetrics
+
     radar_map, invaders = loader.load_data()
-    algo = DetectionAlgo(radar_map, invaders, 0.82)
+    metrics = DetectionMetrics() if args.profile else None
+    if args.pyramid is not None:
+        from pyramid_algo import PyramidDetectionAlgo
+
+        algo = PyramidDetectionAlgo(
+            radar_map,
+            invaders,
+            args.threshold,
+            args.engine,
+            args.workers,
+            metrics,
+            args.prefilter,
+            args.pyramid,
+            peaks=args.peaks,
+        )
+    else:
+        cache = None
+        if args.cache:
+            from score_cache import ScoreCache
 
-    results = algo.run_search()
+            cache = ScoreCache(args.cache)
+        algo = DetectionAlgo(
+            radar_map,
+            invaders,
+            args.threshold,
+            args.engine,
+            args.workers,
+            metrics,
+            args.prefilter,
+            args.joint,
+            args.peaks,
+            cache=cache,
+        )
+
+    if args.threshold_sweep:
+        ground_truth = None
+        if args.ground_truth:
+            ground_truth = loader.load_ground_truth(args.ground_truth)
+        for result in algo.sweep_thresholds(args.threshold_sweep, ground_truth):
+            print(json.dumps(result), flush=True)
+    else:
+        results = algo.run_search()
+    if metrics is not None:
+        if args.profile == "-":
+            print(metrics.report(), file=sys.stderr)
+        else:
+            with open(args.profile, "w") as f:
+                f.write(metrics.to_json())
+    if args.threshold_sweep:
+        return
 
     print(f"Found {len(results)} candidates:")
     for i in results:
@@ -39,3 +352,7 @@ if __name__ == "__main__":
                 radar_map.get_size_window((i.width, i.height), (i.real_x, i.real_y))
             )
         )
+
+
+if __name__ == "__main__":
+    main()
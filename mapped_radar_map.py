@@ -0,0 +1,215 @@
+import mmap
+from collections.abc import Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+
+from radar_map import RadarMap
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class MappedRows(Sequence):
+    """
+    Read only sequence of the rows of a radar data file with fixed width
+    rows, rows are read from a memory map of the file when accessed.
+    """
+
+    def __init__(self, data: mmap.mmap, width: int, stride: int, height: int) -> None:
+        self.data = data
+        self.width = width
+        self.stride = stride
+        self.height = height
+
+    def __len__(self) -> int:
+        return self.height
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.height))]
+        if index < 0:
+            index += self.height
+        if not 0 <= index < self.height:
+            raise IndexError("Row index out of range!")
+        return self.get_row_slice(index, 0, self.width)
+
+    def get_row_slice(self, row: int, start: int, end: int) -> str:
+        """
+        Returns the characters from start to end of a row, clamped
+        to the row width, reading only those from the file.
+        """
+        start = min(max(start, 0), self.width)
+        end = min(max(end, start), self.width)
+        offset = row * self.stride
+        return self.data[offset + start : offset + end].decode("latin-1")
+
+
+class PaddedRows(Sequence):
+    """
+    Virtual enlarged radar data, the margins are never materialized:
+    indices falling in the margins are clamped and filled with the
+    empty character when a row is accessed.
+    """
+
+    def __init__(self, rows: MappedRows, empty_char: str, left: int, right: int, top: int) -> None:
+        self.rows = rows
+        self.empty_char = empty_char
+        self.left = left
+        self.right = right
+        self.top = top
+        self.width = left + rows.width + right
+        self.height = rows.height + 2 * top
+
+    def __len__(self) -> int:
+        return self.height
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.height))]
+        if index < 0:
+            index += self.height
+        if not 0 <= index < self.height:
+            raise IndexError("Row index out of range!")
+        return self.get_row_slice(index, 0, self.width)
+
+    def get_row_slice(self, row: int, start: int, end: int) -> str:
+        """
+        Returns the characters from start to end of an enlarged row,
+        only the part overlapping the radar data is read from the file.
+        """
+        start = min(max(start, 0), self.width)
+        end = min(max(end, start), self.width)
+        data_row = row - self.top
+        if not 0 <= data_row < self.rows.height:
+            return self.empty_char * (end - start)
+        data = self.rows.get_row_slice(data_row, start - self.left, end - self.left)
+        left_padding = max(0, min(end, self.left) - start)
+        right_padding = end - start - left_padding - len(data)
+        return self.empty_char * left_padding + data + self.empty_char * right_padding
+
+    def to_array(self) -> "np.ndarray":
+        """
+        Returns the enlarged radar data as a 2D NumPy uint8 array,
+        the only copy made is the padded array itself.
+        """
+        import numpy as np
+
+        # view of the rows without their line breaks straight on the map
+        data = np.lib.stride_tricks.as_strided(
+            np.frombuffer(self.rows.data, dtype=np.uint8),
+            shape=(self.rows.height, self.rows.width),
+            strides=(self.rows.stride, 1),
+            writeable=False,
+        )
+        return np.pad(
+            data,
+            ((self.top, self.top), (self.left, self.right)),
+            constant_values=ord(self.empty_char),
+        )
+
+
+class MappedRadarMap(RadarMap):
+    """
+    RadarMap backed by a memory map of a radar data file with fixed width
+    rows, for radar data larger than what can be comfortably held in
+    memory as strings. Neither the rows nor the enlarged radar data are
+    copied, windows are read straight from the file.
+    Files whose rows don't all have the width and line break of the
+    first one raise a ValueError.
+    """
+
+    def __init__(self, path: Union[str, Path], empty_char: str = "-") -> None:
+        with open(path, "rb") as f:
+            if f.seek(0, 2) == 0:
+                raise ValueError("Empty radar data file!")
+            # the map stays valid after the file is closed
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        line_end = data.find(b"\n")
+        if line_end == -1:
+            line_end = len(data)
+        stride = line_end + 1
+        width = line_end
+        if width and data[width - 1 : width] == b"\r":
+            width -= 1
+        line_break = data[width:stride] or b"\n"
+        # the last row may be missing its line break
+        if len(data) % stride == 0:
+            height = len(data) // stride
+        else:
+            height = (len(data) + len(line_break)) // stride
+        rows_end = height * stride - len(line_break)
+        # rows after which a line break is expected
+        broken_rows = height if len(data) == rows_end + len(line_break) else height - 1
+        if (
+            width == 0
+            or len(data) not in (rows_end, rows_end + len(line_break))
+            or any(
+                data[row * stride + width : (row + 1) * stride] != line_break
+                for row in range(broken_rows)
+            )
+            or data.find(b"\n", rows_end - width, rows_end) != -1
+        ):
+            data.close()
+            raise ValueError("Radar data file rows must all have the same width!")
+        self.radar_data = MappedRows(data, width, stride, height)
+        self.empty_char = empty_char
+
+    def get_enlarged_radar_data(self, pattern: List[str]) -> PaddedRows:
+        """
+        Given a pattern the method will return a virtual enlarged map
+        with the same margins as RadarMap.get_enlarged_radar_data.
+        """
+        return self.get_padded_radar_data(len(pattern[0]), len(pattern))
+
+    def get_padded_view(self, width: int, height: int) -> PaddedRows:
+        """
+        The enlarged radar data is already virtual, no buffer is shared.
+        """
+        return self.get_padded_radar_data(width, height)
+
+    def get_padded_radar_data(self, width: int, height: int) -> PaddedRows:
+        """
+        Returns the virtual enlarged map for a pattern of the given size.
+        """
+        half_width = int(width / 2)
+        half_height = int(height / 2)
+        return PaddedRows(
+            self.radar_data,
+            self.empty_char,
+            half_width,
+            width - half_width,
+            half_height,
+        )
+
+    def get_size_window(
+        self,
+        size: Tuple[int, int],
+        offset: Tuple[int, int],
+        radar_data: Optional[Sequence] = None,
+    ) -> List[str]:
+        """
+        Returns a window of a given size from a specific offset
+        from radar_data, reading only the window from the file.
+        Optionally it can take another radar_data map (like an enlarged one)
+        and process that.
+        """
+        if radar_data is None:
+            radar_data = self.radar_data
+        # rows of strings, or virtual rows read a slice at a time
+        if not hasattr(radar_data, "get_row_slice"):
+            return super().get_size_window(size, offset, radar_data)
+
+        width = size[0]
+        height = size[1]
+        x_offset = offset[0]
+        y_offset = offset[1]
+        # do not allow negative offsets
+        if x_offset < 0 or y_offset < 0:
+            raise ValueError("Negative offsets provided!")
+        # do not allow windows larger than radar_data
+        if width > radar_data.width or height > len(radar_data):
+            raise ValueError("Window size larger than radar data!")
+        return [
+            radar_data.get_row_slice(row, x_offset, x_offset + width)
+            for row in range(y_offset, min(y_offset + height, len(radar_data)))
+        ]
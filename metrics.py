@@ -0,0 +1,89 @@
+import json
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class DetectionMetrics:
+    """
+    Opt-in instrumentation of DetectionAlgo, pass an instance to its
+    constructor to record the wall time of every stage, overall and per
+    invader, along with counters of the work done and the peak memory.
+    """
+
+    def __init__(self) -> None:
+        self.stages = defaultdict(float)
+        self.invaders = defaultdict(lambda: defaultdict(float))
+        self.counters = defaultdict(int)
+        self.peak_memory = 0
+
+    @contextmanager
+    def time(self, stage: str, invader: Optional[str] = None) -> Iterator[None]:
+        """
+        Context manager adding the wall time of its block to a stage,
+        and to the invader's stage if one is given.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[stage] += elapsed
+            if invader is not None:
+                self.invaders[invader][stage] += elapsed
+
+    def count(self, counter: str, value: int = 1) -> None:
+        """
+        Adds value to a counter.
+        """
+        self.counters[counter] += value
+
+    def record_peak_memory(self) -> None:
+        """
+        Records the peak resident memory of the process in bytes.
+        """
+        if resource is None:
+            return
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # reported in kilobytes everywhere but on macOS
+        if sys.platform != "darwin":
+            peak *= 1024
+        self.peak_memory = max(self.peak_memory, peak)
+
+    def as_dict(self) -> Dict:
+        """
+        Returns the metrics as a JSON serializable dict.
+        """
+        return {
+            "stages": dict(self.stages),
+            "invaders": {name: dict(stages) for name, stages in self.invaders.items()},
+            "counters": dict(self.counters),
+            "peak_memory": self.peak_memory,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), indent=2)
+
+    def report(self) -> str:
+        """
+        Returns a human readable summary of the metrics.
+        """
+        lines = ["Stages:"]
+        for stage, elapsed in self.stages.items():
+            lines.append(f"  {stage}: {elapsed:.4f}s")
+        for name, stages in self.invaders.items():
+            lines.append(f"Invader {name}:")
+            for stage, elapsed in stages.items():
+                lines.append(f"  {stage}: {elapsed:.4f}s")
+        lines.append("Counters:")
+        for counter, value in self.counters.items():
+            lines.append(f"  {counter}: {value}")
+        lines.append(f"Peak memory: {self.peak_memory / 2 ** 20:.1f} MiB")
+        return "\n".join(lines)
@@ -0,0 +1,199 @@
+from typing import List, Tuple
+
+import numpy as np
+
+
+class NumpyAlgos:
+    """
+    Vectorized counterparts of the GenericAlgos scoring methods.
+    Radar data and patterns are handled as 2D NumPy uint8 arrays of
+    character codes and every window of the radar data is scored at once,
+    giving the same values as GenericAlgos.compare_input_data_to_pattern.
+    """
+
+    # maximum number of windows scored in a single batch, bounds the memory
+    # used by the DP rows on large radar maps
+    chunk_size = 1 << 16
+
+    def to_array(self, lines: List[str]) -> np.ndarray:
+        """
+        Converts a list of equally sized strings to a 2D uint8 array.
+        """
+        if not lines:
+            return np.zeros((0, 0), dtype=np.uint8)
+        data = "".join(lines).encode("latin-1")
+        return np.frombuffer(data, dtype=np.uint8).reshape(len(lines), -1)
+
+    def ratio_distances(self, lines: np.ndarray, pattern_line: np.ndarray) -> np.ndarray:
+        """
+        Computes the distance used for the Levenshtein ratio by
+        GenericAlgos.levenshtein (substitutions cost 2) between every
+        line in lines, an array of shape (..., n), and pattern_line.
+        Lines play the role of s1, so they should not be shorter than
+        the pattern line, which always holds for scanned windows.
+        """
+        shape = lines.shape[:-1]
+        previous_row = [np.full(shape, j, dtype=np.int16) for j in range(len(pattern_line) + 1)]
+        previous_ratio_row = previous_row
+        for i in range(lines.shape[-1]):
+            c1 = lines[..., i]
+            current_row = [np.full(shape, i + 1, dtype=np.int16)]
+            ratio_row = [current_row[0]]
+            for j, c2 in enumerate(pattern_line):
+                lev_cost = (c1 != c2).astype(np.int16)
+                deletions = current_row[j] + 1
+                current_row.append(
+                    np.minimum(
+                        np.minimum(previous_row[j + 1] + 1, deletions),
+                        previous_row[j] + lev_cost,
+                    )
+                )
+                ratio_row.append(
+                    np.minimum(
+                        np.minimum(previous_ratio_row[j + 1] + 1, deletions),
+                        previous_ratio_row[j] + 2 * lev_cost,
+                    )
+                )
+            previous_row = current_row
+            previous_ratio_row = ratio_row
+        return previous_ratio_row[-1]
+
+    def ratios(self, lines: np.ndarray, pattern_line: np.ndarray) -> np.ndarray:
+        """
+        Levenshtein ratio of every line in lines against pattern_line.
+        """
+        length = lines.shape[-1] + len(pattern_line)
+        return (length - self.ratio_distances(lines, pattern_line)) / length
+
+    def score_matrix(self, radar_data: np.ndarray, pattern: np.ndarray) -> np.ndarray:
+        """
+        Given an (enlarged) radar data array and a pattern array returns
+        the matrix of match scores for every window, the vectorized
+        equivalent of DetectionAlgo.scan_radar_data.
+        """
+        p_h, p_w = pattern.shape
+        rows = max(0, radar_data.shape[0] - p_h)
+        cols = max(0, radar_data.shape[1] - p_w)
+        scores = np.zeros((rows, cols))
+        if rows == 0 or cols == 0:
+            return scores
+        # row_windows[j, i] is the row of width p_w starting at (i, j) and
+        # col_windows[j, i] the column of height p_h starting at (i, j)
+        row_windows = np.lib.stride_tricks.sliding_window_view(radar_data, p_w, axis=1)
+        col_windows = np.lib.stride_tricks.sliding_window_view(radar_data, p_h, axis=0)
+        t_pattern = pattern.T
+        band = max(1, self.chunk_size // cols)
+        for j in range(0, rows, band):
+            end = min(rows, j + band)
+            # accumulate in the same order as the builtin sum
+            # so the results match compare_input_data_to_pattern
+            row_score = self.ratios(row_windows[j:end, :cols], pattern[0])
+            for k in range(1, p_h):
+                row_score += self.ratios(
+                    row_windows[j + k : end + k, :cols], pattern[k]
+                )
+            col_score = self.ratios(col_windows[j:end, :cols], t_pattern[0])
+            for k in range(1, p_w):
+                col_score += self.ratios(
+                    col_windows[j:end, k : cols + k], t_pattern[k]
+                )
+            scores[j:end] = (row_score / p_h + col_score / p_w) / 2
+        return scores
+
+    def correlate(self, data: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+        """
+        Cross-correlation of a 2D array with a smaller kernel over every
+        offset at which the kernel fits entirely, computed with FFTs.
+        Values are rounded, both arrays hold integer counts.
+        """
+        k_h, k_w = kernel.shape
+        rows = data.shape[0] - k_h + 1
+        cols = data.shape[1] - k_w + 1
+        # correlating is convolving with the flipped kernel, the
+        # valid part of the circular convolution isn't wrapped
+        shape = data.shape
+        product = np.fft.rfft2(data, shape) * np.fft.rfft2(kernel[::-1, ::-1], shape)
+        full = np.fft.irfft2(product, shape)
+        return np.rint(full[k_h - 1 : k_h - 1 + rows, k_w - 1 : k_w - 1 + cols])
+
+    def hamming_matrix(self, radar_data: np.ndarray, pattern: np.ndarray) -> np.ndarray:
+        """
+        Given binarized (enlarged) radar data and pattern arrays, True for
+        the non empty cells, returns for every window the fraction of its
+        cells agreeing with the pattern, in the same shape as score_matrix.
+        The agreeing non empty cells of all the windows come from a single
+        FFT cross-correlation, the agreeing empty ones follow from the
+        number of non empty cells of every window, from a summed area table.
+        """
+        p_h, p_w = pattern.shape
+        rows = max(0, radar_data.shape[0] - p_h)
+        cols = max(0, radar_data.shape[1] - p_w)
+        if rows == 0 or cols == 0:
+            return np.zeros((rows, cols))
+        # scan_radar_data leaves out the last row and column of windows
+        data = radar_data[: rows + p_h - 1, : cols + p_w - 1].astype(np.float64)
+        kernel = pattern.astype(np.float64)
+        both_filled = self.correlate(data, kernel)
+        table = np.zeros((data.shape[0] + 1, data.shape[1] + 1))
+        table[1:, 1:] = data.cumsum(axis=0).cumsum(axis=1)
+        window_filled = (
+            table[p_h:, p_w:] - table[:-p_h, p_w:] - table[p_h:, :-p_w] + table[:-p_h, :-p_w]
+        )
+        area = p_h * p_w
+        both_empty = area - window_filled - kernel.sum() + both_filled
+        return (both_filled + both_empty) / area
+
+    def max_filter(
+        self, data: np.ndarray, rows: Tuple[int, int], cols: Tuple[int, int]
+    ) -> np.ndarray:
+        """
+        Maximum of every cell's neighbourhood, the cells from rows[0] above
+        to rows[1] below it and from cols[0] left to cols[1] right of it,
+        computed separably. Cells outside of data are ignored.
+        """
+        height, width = data.shape
+        padded = np.pad(
+            data.astype(np.float64),
+            ((rows[0], rows[1]), (cols[0], cols[1])),
+            constant_values=-np.inf,
+        )
+        # one whole array maximum per shift is faster than reducing
+        # a sliding window view
+        row_max = padded[:height].copy()
+        for k in range(1, rows[0] + rows[1] + 1):
+            np.maximum(row_max, padded[k : k + height], out=row_max)
+        result = row_max[:, :width].copy()
+        for k in range(1, cols[0] + cols[1] + 1):
+            np.maximum(result, row_max[:, k : k + width], out=result)
+        return result
+
+    def find_peaks_2d(
+        self, scores: np.ndarray, size: Tuple[int, int], threshold: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Non-maximum suppression of a matrix of scores, returns the row and
+        column indices of the scores above threshold that are the maximum
+        of the size (width, height) neighbourhood centred on them.
+        Of equal scores in a neighbourhood, a plateau, only the first one
+        in row major order is kept.
+        """
+        if scores.size == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        x_radius = size[0] // 2
+        y_radius = size[1] // 2
+        neighbourhood = self.max_filter(scores, (y_radius, y_radius), (x_radius, x_radius))
+        # neighbours before a cell in row major order: the rows above it
+        # and the cells left of it in its row, shifted down and right by one
+        above = np.full(scores.shape, -np.inf)
+        if y_radius:
+            above[1:] = self.max_filter(scores, (y_radius - 1, 0), (x_radius, x_radius))[:-1]
+        left = np.full(scores.shape, -np.inf)
+        if x_radius:
+            left[:, 1:] = self.max_filter(scores, (0, 0), (x_radius - 1, 0))[:, :-1]
+        peaks = (
+            (scores > threshold)
+            & (scores >= neighbourhood)
+            & (scores > above)
+            & (scores > left)
+        )
+        return np.nonzero(peaks)
@@ -0,0 +1,224 @@
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Union
+
+from mapped_radar_map import MappedRadarMap, PaddedRows
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# magic, width, height, empty and filled characters of a packed frame,
+# followed by the rows, each in its own little endian 64 bit words
+HEADER = struct.Struct("<4sIIcc")
+MAGIC = b"RDR1"
+WORD_BITS = 64
+
+
+class PackedRows(Sequence):
+    """
+    Read only sequence of the rows of two symbol radar data packed one
+    bit per cell, set for the filled cells. Every row starts on a new
+    64 bit word, bit k of a row being cell k. Rows are decoded to
+    strings only when accessed.
+    """
+
+    def __init__(
+        self, words: array, width: int, height: int, empty_char: str, filled_char: str
+    ) -> None:
+        self.words = words
+        self.width = width
+        self.height = height
+        self.empty_char = empty_char
+        self.filled_char = filled_char
+        self.row_words = (width + WORD_BITS - 1) // WORD_BITS
+        self.decode_table = str.maketrans("01", empty_char + filled_char)
+
+    @classmethod
+    def from_lines(
+        cls, lines: List[str], empty_char: str = "-", filled_char: str = "o"
+    ) -> "PackedRows":
+        """
+        Packs rows of text with only the empty and filled characters.
+        """
+        width = len(lines[0]) if lines else 0
+        row_words = (width + WORD_BITS - 1) // WORD_BITS
+        encode_table = str.maketrans(empty_char + filled_char, "01")
+        words = array("Q")
+        for line in lines:
+            if len(line) != width:
+                raise ValueError("Rows of different widths can't be packed!")
+            bits = line.translate(encode_table)
+            if bits.strip("01"):
+                raise ValueError("Radar data with more than two symbols can't be packed!")
+            # reversed, so cell k is bit k
+            value = int(bits[::-1], 2) if bits else 0
+            words.frombytes(value.to_bytes(row_words * 8, sys.byteorder))
+        return cls(words, width, len(lines), empty_char, filled_char)
+
+    @property
+    def nbytes(self) -> int:
+        return self.words.itemsize * len(self.words)
+
+    def __len__(self) -> int:
+        return self.height
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.height))]
+        if index < 0:
+            index += self.height
+        if not 0 <= index < self.height:
+            raise IndexError("Row index out of range!")
+        return self.get_row_slice(index, 0, self.width)
+
+    def get_row_bits(self, row: int) -> int:
+        """
+        Returns a row as an integer, bit k set if cell k is filled.
+        """
+        start = row * self.row_words
+        return int.from_bytes(
+            self.words[start : start + self.row_words].tobytes(), sys.byteorder
+        )
+
+    def get_row_slice(self, row: int, start: int, end: int) -> str:
+        """
+        Returns the characters from start to end of a row, clamped
+        to the row width, decoding only those.
+        """
+        start = min(max(start, 0), self.width)
+        end = min(max(end, start), self.width)
+        if start == end:
+            return ""
+        # only the words holding the slice
+        first = row * self.row_words + start // WORD_BITS
+        last = row * self.row_words + (end - 1) // WORD_BITS
+        bits = int.from_bytes(self.words[first : last + 1].tobytes(), sys.byteorder)
+        bits = (bits >> (start % WORD_BITS)) & ((1 << (end - start)) - 1)
+        return format(bits, f"0{end - start}b")[::-1].translate(self.decode_table)
+
+    def to_array(self) -> "np.ndarray":
+        """
+        Returns the rows as a 2D NumPy uint8 array of characters.
+        """
+        import numpy as np
+
+        # bit k of a row is bit k % 8 of its byte k // 8 in little endian
+        words = np.frombuffer(self.words, dtype=np.uint64).astype("<u8")
+        bits = np.unpackbits(
+            words.view(np.uint8).reshape(self.height, -1),
+            axis=1,
+            bitorder="little",
+        )[:, : self.width]
+        return np.where(bits, ord(self.filled_char), ord(self.empty_char)).astype(np.uint8)
+
+
+class PackedPaddedRows(PaddedRows):
+    """
+    Virtual enlarged radar data of packed rows.
+    """
+
+    def to_array(self) -> "np.ndarray":
+        import numpy as np
+
+        return np.pad(
+            self.rows.to_array(),
+            ((self.top, self.top), (self.left, self.right)),
+            constant_values=ord(self.empty_char),
+        )
+
+
+class PackedRadarMap(MappedRadarMap):
+    """
+    RadarMap of radar data with only empty and filled cells, held one
+    bit per cell instead of one string per row, about 8 times smaller.
+    Like MappedRadarMap the enlarged radar data is virtual and windows
+    are decoded from the packed rows when read.
+    It can be saved to and loaded from a binary frame file, a small
+    header with the width, height, empty and filled characters followed
+    by the packed rows, which Loader recognises as radar data.
+    """
+
+    def __init__(
+        self, radar_data: str = "", empty_char: str = "-", filled_char: str = "o"
+    ) -> None:
+        self.radar_data = PackedRows.from_lines(radar_data.split(), empty_char, filled_char)
+        self.empty_char = empty_char
+
+    @classmethod
+    def from_lines(
+        cls, lines: Sequence, empty_char: str = "-", filled_char: str = "o"
+    ) -> "PackedRadarMap":
+        """
+        Packs rows of radar data, of a RadarMap for instance.
+        """
+        return cls.from_rows(PackedRows.from_lines(list(lines), empty_char, filled_char))
+
+    @classmethod
+    def from_rows(cls, rows: PackedRows) -> "PackedRadarMap":
+        radar_map = cls.__new__(cls)
+        radar_map.radar_data = rows
+        radar_map.empty_char = rows.empty_char
+        return radar_map
+
+    @staticmethod
+    def is_packed_file(path: Union[str, Path]) -> bool:
+        """
+        Checks whether a file is a packed frame.
+        """
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "PackedRadarMap":
+        """
+        Loads a packed frame file.
+        """
+        data = Path(path).read_bytes()
+        if len(data) < HEADER.size or data[: len(MAGIC)] != MAGIC:
+            raise ValueError("Not a packed radar data file!")
+        _, width, height, empty_char, filled_char = HEADER.unpack_from(data)
+        words = array("Q")
+        words.frombytes(data[HEADER.size :])
+        if sys.byteorder != "little":
+            words.byteswap()
+        rows = PackedRows(
+            words, width, height, empty_char.decode("latin-1"), filled_char.decode("latin-1")
+        )
+        if len(words) != rows.row_words * height:
+            raise ValueError("Truncated packed radar data file!")
+        return cls.from_rows(rows)
+
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        Writes the radar data as a packed frame file.
+        """
+        rows = self.radar_data
+        words = rows.words
+        if sys.byteorder != "little":
+            words = array("Q", words)
+            words.byteswap()
+        header = HEADER.pack(
+            MAGIC,
+            rows.width,
+            rows.height,
+            rows.empty_char.encode("latin-1"),
+            rows.filled_char.encode("latin-1"),
+        )
+        Path(path).write_bytes(header + words.tobytes())
+
+    def get_padded_radar_data(self, width: int, height: int) -> PackedPaddedRows:
+        """
+        Returns the virtual enlarged map for a pattern of the given size.
+        """
+        half_width = int(width / 2)
+        half_height = int(height / 2)
+        return PackedPaddedRows(
+            self.radar_data,
+            self.empty_char,
+            half_width,
+            width - half_width,
+            half_height,
+        )
@@ -0,0 +1,176 @@
+from typing import List, Optional, Sequence, Tuple
+
+from detection_algo import DetectionAlgo
+from invaders import Invader, MatchArray
+from metrics import DetectionMetrics
+from radar_map import RadarMap
+
+
+def downsample(
+    lines: Sequence[str], factor: int, empty_char: str = "-", filled_char: str = "o"
+) -> List[str]:
+    """
+    Majority pooling of lines of cells, every block of factor x factor
+    cells becomes a single cell, filled if more than half of the block
+    is not empty. Blocks cut by the right and bottom edges are
+    completed with empty cells.
+    """
+    width = len(lines[0]) if len(lines) else 0
+    majority = factor * factor // 2
+    pooled = []
+    for y in range(0, len(lines), factor):
+        block_rows = [lines[j] for j in range(y, min(y + factor, len(lines)))]
+        row = []
+        for x in range(0, width, factor):
+            count = sum(
+                1 for line in block_rows for c in line[x : x + factor] if c != empty_char
+            )
+            row.append(filled_char if count > majority else empty_char)
+        pooled.append("".join(row))
+    return pooled
+
+
+class PyramidDetectionAlgo(DetectionAlgo):
+    """
+    Coarse to fine detection algorithm for large and sparse radar data.
+    The radar data and the invader patterns are downsampled by factor
+    with majority pooling and searched at that coarse level with the
+    relaxed coarse_threshold. Only the neighbourhoods of the coarse
+    candidates, radius cells around them, are then scanned at full
+    resolution and filtered like DetectionAlgo does, every other window
+    scores 0.
+    Matches are the ones DetectionAlgo finds as long as every one of
+    them has a coarse candidate nearby, which isn't guaranteed: the
+    recall against the exhaustive search is measured by the benchmarks.
+    """
+
+    def __init__(
+        self,
+        radar_map: RadarMap,
+        invaders: List[Invader],
+        threshold: float,
+        engine: str = "levenshtein",
+        workers: int = 1,
+        metrics: Optional[DetectionMetrics] = None,
+        prefilter: bool = False,
+        factor: int = 2,
+        coarse_threshold: Optional[float] = None,
+        radius: Optional[int] = None,
+        peaks: str = "separable",
+    ) -> None:
+        super().__init__(
+            radar_map, invaders, threshold, engine, workers, metrics, prefilter, peaks=peaks
+        )
+        if factor < 2:
+            raise ValueError("The downsampling factor must be at least 2!")
+        self.factor = factor
+        if coarse_threshold is None:
+            coarse_threshold = threshold - 0.1 * factor
+        self.coarse_threshold = coarse_threshold
+        if radius is None:
+            radius = factor
+        self.radius = radius
+
+    def get_coarse_algo(self) -> DetectionAlgo:
+        """
+        Returns the detection algorithm searching the downsampled
+        radar data for the downsampled invaders.
+        """
+        empty_char = self.radar_map.empty_char
+        coarse_map = RadarMap(
+            "\n".join(downsample(self.radar_map.radar_data, self.factor, empty_char)),
+            empty_char,
+        )
+        coarse_invaders = [
+            Invader(
+                invader.name,
+                "\n".join(downsample(invader.pattern, self.factor, empty_char)),
+            )
+            for invader in self.invaders
+        ]
+        return DetectionAlgo(
+            coarse_map,
+            coarse_invaders,
+            self.coarse_threshold,
+            self.engine,
+            self.workers,
+            prefilter=self.prefilter,
+        )
+
+    def get_neighbourhoods(
+        self,
+        invader: Invader,
+        coarse_targets: MatchArray,
+        size: Tuple[int, int],
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        Returns the windows of the full resolution score matrix of the
+        given size around every coarse candidate, as inclusive ranges
+        (left, top, right, bottom) of window coordinates.
+        """
+        cols, rows = size
+        neighbourhoods = []
+        for target in coarse_targets:
+            # top left corner of the coarse window in radar data cells,
+            # scaled back to full resolution and moved to the
+            # coordinates of the enlarged radar data
+            x = (target.x - int(target.width / 2)) * self.factor + int(invader.width / 2)
+            y = (target.y - int(target.height / 2)) * self.factor + int(invader.height / 2)
+            left = max(0, x - self.radius)
+            top = max(0, y - self.radius)
+            right = min(cols - 1, x + self.radius)
+            bottom = min(rows - 1, y + self.radius)
+            if left <= right and top <= bottom:
+                neighbourhoods.append((left, top, right, bottom))
+        return neighbourhoods
+
+    def scan_neighbourhoods(
+        self,
+        enlarged_radar_data: List[str],
+        invader: Invader,
+        neighbourhoods: List[Tuple[int, int, int, int]],
+    ) -> List[List[float]]:
+        """
+        Returns the full resolution matrix of match scores with only the
+        windows in the neighbourhoods scored, by scanning the part of the
+        enlarged radar data they cover with the selected engine.
+        """
+        rows = max(0, len(enlarged_radar_data) - invader.height)
+        cols = max(0, len(enlarged_radar_data[0]) - invader.width) if rows else 0
+        scores = [[0] * cols for _ in range(rows)]
+        # neighbourhoods of nearby candidates are often the same
+        unique = list(dict.fromkeys(neighbourhoods))
+        self.scan_regions(scores, enlarged_radar_data, invader.compiled, unique)
+        return scores
+
+    def run_search(self) -> MatchArray:
+        """
+        Main entry function to search for invader patterns.
+        """
+        coarse = self.get_coarse_algo()
+        matching_data = MatchArray()
+        with self.pool():
+            # the coarse search scans its tiles in the same pool
+            coarse.executor = self.executor
+            for invader, coarse_invader in zip(self.invaders, coarse.invaders):
+                with self.measure("coarse_search", invader.name):
+                    coarse_targets = coarse.get_targets_from_scan_data(coarse_invader)
+                with self.measure("get_enlarged_radar_data", invader.name):
+                    enlarged_radar_data = self.radar_map.get_enlarged_radar_data(invader.pattern)
+                rows = len(enlarged_radar_data) - invader.height
+                cols = len(self.radar_map.radar_data[0])
+                neighbourhoods = self.get_neighbourhoods(invader, coarse_targets, (cols, rows))
+                with self.measure("scan_radar_data", invader.name):
+                    rs = self.scan_neighbourhoods(enlarged_radar_data, invader, neighbourhoods)
+                with self.measure("find_peaks", invader.name):
+                    targets = self.get_targets_from_scores(invader, rs)
+                if self.metrics is not None:
+                    self.metrics.count("coarse_candidates", len(coarse_targets))
+                    self.metrics.count("candidates", len(targets))
+                matching_data.extend(targets)
+        with self.measure("get_best_matching_data"):
+            best_matching_data = self.get_best_matching_data(matching_data)
+        if self.metrics is not None:
+            self.metrics.count("matches", len(best_matching_data))
+            self.metrics.record_peak_memory()
+        return best_matching_data
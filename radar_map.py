@@ -1,37 +1,179 @@
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple, Union
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class PaddedBuffer:
+    """
+    Radar data padded once for patterns up to the given size, shared
+    by the enlarged radar data of every smaller pattern.
+    """
+
+    def __init__(self, lines: List[str], width: int, height: int) -> None:
+        self.lines = lines
+        self.width = width
+        self.height = height
+        self.array = None
+
+    def to_array(self) -> "np.ndarray":
+        """
+        Returns the padded lines as a 2D NumPy uint8 array,
+        converted on the first call only.
+        """
+        if self.array is None:
+            from numpy_algos import NumpyAlgos
+
+            self.array = NumpyAlgos().to_array(self.lines)
+        return self.array
+
+
+class PaddedView(Sequence):
+    """
+    Read only enlarged radar data of a pattern, a window of the rows of
+    a PaddedBuffer with wider margins. Rows are sliced from the buffer
+    when accessed and windows straight from its rows, so no copy of
+    the radar data is made per pattern.
+    """
+
+    def __init__(
+        self, buffer: PaddedBuffer, x: int, y: int, width: int, height: int
+    ) -> None:
+        self.buffer = buffer
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def __len__(self) -> int:
+        return self.height
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.height))]
+        if index < 0:
+            index += self.height
+        if not 0 <= index < self.height:
+            raise IndexError("Row index out of range!")
+        return self.buffer.lines[self.y + index][self.x : self.x + self.width]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (PaddedView, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def get_window(self, size: Tuple[int, int], offset: Tuple[int, int]) -> List[str]:
+        """
+        Same as RadarMap.get_size_window on the rows of the view.
+        """
+        width, height = size
+        x_offset, y_offset = offset
+        if x_offset < 0 or y_offset < 0:
+            raise ValueError("Negative offsets provided!")
+        if width > self.width or height > self.height:
+            raise ValueError("Window size larger than radar data!")
+        lines = self.buffer.lines
+        start = self.x + x_offset
+        # clipped to the view like slicing its rows would
+        end = self.x + min(x_offset + width, self.width)
+        first = self.y + y_offset
+        last = self.y + min(y_offset + height, self.height)
+        return [lines[j][start:end] for j in range(first, last)]
+
+    def to_array(self) -> "np.ndarray":
+        """
+        Returns the view of the array of the buffer covered by the
+        rows of the view, without copying it.
+        """
+        return self.buffer.to_array()[
+            self.y : self.y + self.height, self.x : self.x + self.width
+        ]
 
 
 class RadarMap:
     """
     Class that represents the radar data and the operations
     that can be performed on it.
+    The radar data is padded lazily, once for the largest pattern
+    reserved with reserve_padding or requested so far, and the
+    enlarged radar data of every pattern is a view of that buffer.
+    The radar data isn't expected to change once padded.
     """
 
+    # largest pattern size reserved and the padded radar data
+    padding = (0, 0)
+    padded: Optional[PaddedBuffer] = None
+
     def __init__(self, radar_data: List[str], empty_char: str = "-") -> None:
         self.radar_data = radar_data.split()
         self.empty_char = empty_char
 
-    def get_enlarged_radar_data(self, pattern: List[str]) -> List[str]:
+    def get_enlarged_radar_data(self, pattern: List[str]) -> Sequence[str]:
         """
         Given a pattern the method will return an enlarged map
         with each margin having extra padding of half the size
-        of the pattern with the empty character.
+        of the pattern with the empty character. The map is a read
+        only view of the rows, see PaddedView.
+        """
+        return self.get_padded_view(len(pattern[0]), len(pattern))
+
+    def reserve_padding(self, width: int, height: int) -> None:
         """
-        half_width = int(len(pattern[0]) / 2)
-        half_height = int(len(pattern) / 2)
+        Makes the next padding of the radar data cover patterns up to
+        the given size, so it is done once for all of them.
+        """
+        self.padding = (max(self.padding[0], width), max(self.padding[1], height))
+
+    def get_padded_view(self, width: int, height: int) -> PaddedView:
+        """
+        Returns the enlarged map for a pattern of the given size as a
+        view of the shared padded radar data, padding it again only if
+        its margins are too narrow.
+        """
+        self.reserve_padding(width, height)
+        padded = self.padded
+        if padded is None or padded.width < width or padded.height < height:
+            padded = PaddedBuffer(self.get_padded_radar_data(*self.padding), *self.padding)
+            self.padded = padded
+        return PaddedView(
+            padded,
+            int(padded.width / 2) - int(width / 2),
+            int(padded.height / 2) - int(height / 2),
+            len(self.radar_data[0]) + width,
+            len(self.radar_data) + 2 * int(height / 2),
+        )
+
+    def get_padded_radar_data(self, width: int, height: int) -> List[str]:
+        """
+        Returns the enlarged map for a pattern of the given size.
+        The margins only grow with the size of the pattern, so the map
+        padded for the largest invaders covers the enlarged map of every
+        smaller one.
+        """
+        half_height = int(height / 2)
         top_bottom = [
-            self.empty_char * (len(self.radar_data[0]) + len(pattern[0]))
+            self.empty_char * (len(self.radar_data[0]) + width)
             for _ in range(half_height)
         ]
         enlarged_radar_data = []
         enlarged_radar_data.extend(top_bottom)
         for row in self.radar_data:
-            enlarged_radar_data.append(
-                self.empty_char * half_width + row + self.empty_char * half_width
-            )
+            enlarged_radar_data.append(self.get_enlarged_row(row, width))
         enlarged_radar_data.extend(top_bottom)
         return enlarged_radar_data
 
+    def get_enlarged_row(self, row: str, width: int) -> str:
+        """
+        A radar row with the left and right margins of the enlarged
+        map for a pattern of the given width.
+        """
+        half_width = int(width / 2)
+        # the right margin gets the extra column for odd pattern widths
+        # so all the rows are as wide as the top and bottom margins
+        return self.empty_char * half_width + row + self.empty_char * (width - half_width)
+
     def get_size_window(
         self,
         size: Tuple[int, int],
@@ -46,6 +188,8 @@ class RadarMap:
         """
         if radar_data is None:
             radar_data = self.radar_data
+        if isinstance(radar_data, PaddedView):
+            return radar_data.get_window(size, offset)
 
         width = size[0]
         height = size[1]
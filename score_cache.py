@@ -0,0 +1,178 @@
+import hashlib
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+from radar_map import RadarMap
+
+# bump when the scores of any engine change, so older entries are ignored
+SCORES_VERSION = 1
+
+# rows and columns of a stored score matrix
+HEADER = struct.Struct("<II")
+
+
+class ScoreCache:
+    """
+    LRU cache of the raw matrices of match scores, keyed by a hash of
+    the radar data, the invader pattern and the scoring engine, so
+    searching the same radar data again, with another threshold for
+    instance, skips scanning it.
+    Matrices are kept in memory as compact arrays of doubles, up to
+    max_bytes, and if a directory is given also stored there as zlib
+    compressed files, up to max_disk_bytes, the least recently used
+    ones being evicted first.
+    """
+
+    suffix = ".scores"
+
+    def __init__(
+        self,
+        directory: Optional[Union[str, Path]] = None,
+        max_bytes: int = 256 * 2**20,
+        max_disk_bytes: int = 2**30,
+    ) -> None:
+        self.directory = Path(directory) if directory is not None else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.entries: "OrderedDict[str, Tuple[int, int, array]]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def hash_radar(self, radar_map: RadarMap) -> str:
+        """
+        Content hash of the radar data and its empty character.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(radar_map.empty_char.encode("latin-1"))
+        for row in radar_map.radar_data:
+            digest.update(b"\n")
+            digest.update(row.encode("latin-1"))
+        return digest.hexdigest()
+
+    def get_key(
+        self,
+        radar_hash: str,
+        pattern: Iterable[str],
+        engine: str,
+        threshold: Optional[float] = None,
+    ) -> str:
+        """
+        Key of the scores of a pattern on the radar data with the given
+        hash. The threshold is only part of the key for the scores that
+        depend on it, the ones zeroed when they can't reach it.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{SCORES_VERSION}:{engine}:{threshold!r}:{radar_hash}".encode())
+        for line in pattern:
+            digest.update(b"\n")
+            digest.update(line.encode("latin-1"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List[List[float]]]:
+        """
+        Returns the matrix of scores stored under key, from memory or
+        from disk, or None if there isn't one.
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        elif self.directory is not None:
+            entry = self.load(key)
+            if entry is not None:
+                self.remember(key, entry)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        rows, cols, values = entry
+        return [values[j * cols : (j + 1) * cols].tolist() for j in range(rows)]
+
+    def put(self, key: str, scores: List[List[float]]) -> None:
+        """
+        Stores a matrix of scores under key.
+        """
+        rows = len(scores)
+        cols = len(scores[0]) if rows else 0
+        values = array("d")
+        for row in scores:
+            values.extend(row)
+        entry = (rows, cols, values)
+        self.remember(key, entry)
+        if self.directory is not None:
+            self.store(key, entry)
+
+    def remember(self, key: str, entry: Tuple[int, int, array]) -> None:
+        """
+        Keeps an entry in memory, evicting the least recently used
+        ones over max_bytes.
+        """
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= previous[2].itemsize * len(previous[2])
+        self.entries[key] = entry
+        self.size += entry[2].itemsize * len(entry[2])
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, (_, _, values) = self.entries.popitem(last=False)
+            self.size -= values.itemsize * len(values)
+
+    def get_path(self, key: str) -> Path:
+        return self.directory / (key + self.suffix)
+
+    def load(self, key: str) -> Optional[Tuple[int, int, array]]:
+        """
+        Reads an entry from disk, None if it is missing or unreadable.
+        """
+        path = self.get_path(key)
+        try:
+            data = zlib.decompress(path.read_bytes())
+            rows, cols = HEADER.unpack_from(data)
+            # mark it as recently used for the eviction
+            os.utime(path)
+        except (OSError, zlib.error, struct.error):
+            return None
+        values = array("d")
+        values.frombytes(data[HEADER.size :])
+        if sys.byteorder != "little":
+            values.byteswap()
+        if len(values) != rows * cols:
+            return None
+        return rows, cols, values
+
+    def store(self, key: str, entry: Tuple[int, int, array]) -> None:
+        """
+        Writes an entry to disk, evicting the least recently used
+        files over max_disk_bytes.
+        """
+        rows, cols, values = entry
+        if sys.byteorder != "little":
+            values = array("d", values)
+            values.byteswap()
+        path = self.get_path(key)
+        # written aside and renamed, so readers never see partial files
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(zlib.compress(HEADER.pack(rows, cols) + values.tobytes()))
+        os.replace(tmp_path, path)
+        files = []
+        for file in self.directory.glob("*" + self.suffix):
+            try:
+                stat = file.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, file))
+        total = sum(size for _, size, _ in files)
+        for _, size, file in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            if file == path:
+                continue
+            file.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+from batch_algo import detect_frames_data, init_frame_worker
+from detection_algo import DetectionAlgo
+from invaders import Invader
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+class DetectionService:
+    """
+    Local asyncio detection service over HTTP, on a TCP port or a Unix
+    socket, with the invader patterns and the detection engine kept warm
+    in a pool of processes.
+    POST /detect with radar data as the body returns the matches as JSON.
+    Concurrent requests are queued and micro-batched: a batch is sent to
+    the pool as soon as it holds max_batch frames, or batch_delay seconds
+    after its first frame arrived, with at most one batch per worker in
+    flight.
+    GET /stats returns the queue depth and the latency percentiles of
+    the last requests.
+    Use it as an async context manager, or call start and close.
+    """
+
+    def __init__(
+        self,
+        invaders: List[Invader],
+        threshold: float,
+        engine: str = "levenshtein",
+        workers: int = 1,
+        max_batch: int = 16,
+        batch_delay: float = 0.005,
+    ) -> None:
+        if engine not in DetectionAlgo.engines:
+            raise ValueError(f"Unknown scoring engine {engine}!")
+        if workers < 1:
+            raise ValueError("At least one worker is required!")
+        self.invaders = invaders
+        self.threshold = threshold
+        self.engine = engine
+        self.workers = workers
+        self.max_batch = max_batch
+        self.batch_delay = batch_delay
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.batcher: Optional[asyncio.Task] = None
+        self.batches = set()
+        # seconds from the arrival of the last requests to their response
+        self.latencies: Deque[float] = deque(maxlen=1000)
+        self.requests = 0
+        self.frames_in_flight = 0
+
+    async def __aenter__(self) -> "DetectionService":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def start(
+        self, host: str = "127.0.0.1", port: int = 0, path: Optional[str] = None
+    ) -> None:
+        """
+        Starts the pool and listens on host and port, or on the Unix
+        socket at path if one is given. Port 0 picks a free port,
+        see address.
+        """
+        self.executor = ProcessPoolExecutor(
+            self.workers,
+            initializer=init_frame_worker,
+            initargs=(self.invaders, self.threshold, self.engine, False),
+        )
+        # start the workers before listening, forked later they would
+        # inherit the sockets of the open connections and keep them open
+        await asyncio.get_running_loop().run_in_executor(
+            self.executor, detect_frames_data, []
+        )
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.create_task(self.run_batcher())
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port)
+
+    @property
+    def address(self):
+        """
+        The address the service listens on.
+        """
+        return self.server.sockets[0].getsockname()
+
+    async def close(self) -> None:
+        """
+        Stops listening, cancels the batches and shuts down the pool.
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if self.batcher is not None:
+            self.batcher.cancel()
+            self.batcher = None
+        for batch in list(self.batches):
+            batch.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    async def detect(self, radar_data: str) -> Dict:
+        """
+        Queues radar data for the next batch and waits for its result.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((radar_data, future))
+        return await future
+
+    async def run_batcher(self) -> None:
+        """
+        Collects queued frames in batches and sends them to the pool.
+        """
+        slots = asyncio.Semaphore(self.workers)
+        loop = asyncio.get_running_loop()
+        while True:
+            await slots.acquire()
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self.run_batch(batch, slots))
+            self.batches.add(task)
+            task.add_done_callback(self.batches.discard)
+
+    async def run_batch(
+        self, batch: List[Tuple[str, asyncio.Future]], slots: asyncio.Semaphore
+    ) -> None:
+        """
+        Searches a batch of frames in the pool and resolves their futures.
+        """
+        self.frames_in_flight += len(batch)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, detect_frames_data, [radar_data for radar_data, _ in batch]
+            )
+        except Exception as e:
+            results = [{"error": str(e) or type(e).__name__}] * len(batch)
+        finally:
+            self.frames_in_flight -= len(batch)
+            slots.release()
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def get_stats(self) -> Dict:
+        """
+        Returns the queue depth, the frames being searched and the
+        latency percentiles, in seconds, of the last requests.
+        """
+        latencies = sorted(self.latencies)
+        percentiles = {}
+        for percentile in (50, 90, 99):
+            if latencies:
+                rank = max(1, math.ceil(percentile / 100 * len(latencies)))
+                percentiles[f"p{percentile}"] = latencies[rank - 1]
+            else:
+                percentiles[f"p{percentile}"] = None
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "in_flight": self.frames_in_flight,
+            "requests": self.requests,
+            "latency": percentiles,
+        }
+
+    async def handle_request(self, method: str, target: str, body: bytes) -> Tuple[int, Dict]:
+        """
+        Routes a request, returns the status and the JSON response.
+        """
+        if target == "/detect":
+            if method != "POST":
+                return 405, {"error": "Use POST"}
+            start = time.perf_counter()
+            self.requests += 1
+            result = await self.detect(body.decode("latin-1"))
+            self.latencies.append(time.perf_counter() - start)
+            return (400 if "error" in result else 200), result
+        if target == "/stats":
+            return 200, self.get_stats()
+        return 404, {"error": f"Unknown path {target}"}
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Serves a single HTTP/1.1 request per connection.
+        """
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            content_length = headers.get("content-length", "0")
+            if len(request_line) != 3 or not content_length.isdigit():
+                status, response = 400, {"error": "Malformed request"}
+            else:
+                method, target, _ = request_line
+                body = await reader.readexactly(int(content_length))
+                status, response = await self.handle_request(method, target, body)
+            payload = json.dumps(response).encode()
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                "Connection: close\r\n\r\n".encode()
+                + payload
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(
+    invaders: List[Invader],
+    threshold: float,
+    engine: str,
+    workers: int,
+    address: str,
+) -> None:
+    """
+    Runs the service until cancelled on address, HOST:PORT or
+    unix:PATH for a Unix socket.
+    """
+    async with DetectionService(invaders, threshold, engine, workers) as service:
+        if address.startswith("unix:"):
+            await service.start(path=address[len("unix:") :])
+        else:
+            host, _, port = address.rpartition(":")
+            await service.start(host or "127.0.0.1", int(port))
+        print(f"Serving on {service.address}", flush=True)
+        await service.server.serve_forever()
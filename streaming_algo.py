@@ -0,0 +1,193 @@
+import math
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Iterable, Iterator, List, Tuple
+
+from detection_algo import DetectionAlgo
+from invaders import Invader, InvaderMatch
+from radar_map import RadarMap
+
+
+@dataclass
+class InvaderStream:
+    """
+    State of the scan of a single invader over streamed radar rows,
+    only the last rows needed to score and filter the next window row
+    are kept.
+    """
+
+    invader: Invader
+    index: int
+    enlarged_rows: Deque[str] = field(init=False)
+    peak_rows: Deque[List[float]] = field(init=False)
+    # next row of window scores to be finalized
+    next_row: int = 0
+
+    def __post_init__(self):
+        # a row of windows is scored once the row below it has arrived,
+        # as scan_radar_data leaves out the last row of windows
+        self.enlarged_rows = deque(maxlen=self.invader.height + 1)
+        # peaks in a row are final once the next row is known
+        self.peak_rows = deque(maxlen=3)
+
+
+class StreamingDetectionAlgo(DetectionAlgo):
+    """
+    Detection algorithm for radar data arriving row by row.
+    It keeps only a rolling buffer of rows per invader, scores a row of
+    windows as soon as all of its rows have arrived and yields matches
+    as soon as no later row can change them, so the memory used doesn't
+    depend on the length of the radar data.
+    The matches are the same as the ones found by DetectionAlgo on the
+    whole radar data.
+    """
+
+    def __init__(
+        self,
+        radar_rows: Iterable[str],
+        invaders: List[Invader],
+        threshold: float,
+        engine: str = "levenshtein",
+        empty_char: str = "-",
+    ) -> None:
+        super().__init__(RadarMap("", empty_char), invaders, threshold, engine)
+        self.radar_rows = radar_rows
+
+    def get_padding_rows(self, invader: Invader, width: int) -> List[str]:
+        """
+        Rows added above and below the radar data for an invader,
+        same as in RadarMap.get_enlarged_radar_data.
+        """
+        empty_char = self.radar_map.empty_char
+        return [empty_char * (width + invader.width) for _ in range(invader.height // 2)]
+
+    def get_row_targets(
+        self, stream: InvaderStream, peak_rows: List[List[float]], position: int
+    ) -> List[Tuple[tuple, InvaderMatch]]:
+        """
+        Filters the column peaks of the row at the given position in
+        peak_rows, which holds it and its neighbouring rows, and returns
+        the matches found along with their priority for overlap resolution.
+        """
+        invader = stream.invader
+        j = stream.next_row
+        stream.next_row += 1
+        x_half = int(invader.width / 2)
+        y_half = int(invader.height / 2)
+        targets = []
+        for i, column in enumerate(self.find_peaks(zip(*peak_rows))):
+            cel = column[position]
+            if cel > 0:
+                m = InvaderMatch(
+                    invader.name,
+                    i,
+                    j,
+                    max(0, i - x_half),
+                    max(0, j - y_half),
+                    invader.width,
+                    invader.height,
+                    cel,
+                )
+                # same order as get_best_matching_data on the whole data:
+                # highest score first, then by invader and position
+                targets.append(((-cel, stream.index, j, i), m))
+        return targets
+
+    def push_row(
+        self, stream: InvaderStream, enlarged_row: str
+    ) -> List[Tuple[tuple, InvaderMatch]]:
+        """
+        Adds a row of enlarged radar data to an invader's stream,
+        returns the matches of the row of windows finalized by it.
+        """
+        stream.enlarged_rows.append(enlarged_row)
+        if len(stream.enlarged_rows) < stream.enlarged_rows.maxlen:
+            return []
+        scores = self.scan_enlarged_radar_data(
+            list(stream.enlarged_rows), stream.invader.compiled
+        )
+        stream.peak_rows.append(self.find_peaks(scores)[0])
+        if len(stream.peak_rows) < 2:
+            return []
+        # the first row has no row above it
+        position = 0 if stream.next_row == 0 else 1
+        return self.get_row_targets(stream, list(stream.peak_rows)[-3:], position)
+
+    def finish_stream(self, stream: InvaderStream) -> List[Tuple[tuple, InvaderMatch]]:
+        """
+        Finalizes the last row of windows of an invader's stream.
+        """
+        if len(stream.peak_rows) == 0:
+            return []
+        if stream.next_row == 0:
+            return self.get_row_targets(stream, list(stream.peak_rows), 0)
+        return self.get_row_targets(stream, list(stream.peak_rows)[-2:], 1)
+
+    def resolve_overlaps(
+        self,
+        pending: List[Tuple[tuple, InvaderMatch]],
+        accepted: List[InvaderMatch],
+        frontier: float,
+    ) -> List[InvaderMatch]:
+        """
+        Incremental version of get_best_matching_data. Matches starting
+        above the frontier row are all known. A pending match is rejected
+        if it overlaps an accepted one, and accepted once every match that
+        could overlap it is known and none of the higher priority ones
+        overlapping it is still pending. Updates pending and accepted and
+        returns the newly accepted matches.
+        """
+        pending.sort(key=lambda p: p[0])
+        still_pending = []
+        newly_accepted = []
+        for priority, match in pending:
+            if self.get_overlaps(match, accepted):
+                continue
+            if match.y + match.height < frontier and not self.get_overlaps(
+                match, [m for _, m in still_pending]
+            ):
+                accepted.append(match)
+                newly_accepted.append(match)
+            else:
+                still_pending.append((priority, match))
+        pending[:] = still_pending
+        # accepted matches can't overlap any match starting below them
+        lowest = min([frontier] + [m.y for _, m in pending])
+        accepted[:] = [m for m in accepted if m.y + m.height >= lowest]
+        return newly_accepted
+
+    def search_stream(self) -> Iterator[InvaderMatch]:
+        """
+        Consumes the radar rows yielding matches as soon as they are final.
+        """
+        streams = [InvaderStream(invader, index) for index, invader in enumerate(self.invaders)]
+        pending = []
+        accepted = []
+        width = None
+        for row in self.radar_rows:
+            row = row.strip()
+            if not row:
+                continue
+            if width is None:
+                width = len(row)
+                for stream in streams:
+                    for padding in self.get_padding_rows(stream.invader, width):
+                        pending += self.push_row(stream, padding)
+            for stream in streams:
+                enlarged_row = self.radar_map.get_enlarged_row(row, stream.invader.width)
+                pending += self.push_row(stream, enlarged_row)
+            frontier = min(stream.next_row for stream in streams)
+            yield from self.resolve_overlaps(pending, accepted, frontier)
+        if width is None:
+            return
+        for stream in streams:
+            for padding in self.get_padding_rows(stream.invader, width):
+                pending += self.push_row(stream, padding)
+            pending += self.finish_stream(stream)
+        yield from self.resolve_overlaps(pending, accepted, math.inf)
+
+    def run_search(self) -> List[InvaderMatch]:
+        """
+        Main entry function to search for invader patterns.
+        """
+        return list(self.search_stream())
@@ -1,9 +1,38 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import json
+import pickle
+import random
+import tempfile
 import unittest
+import unittest.mock
+from pathlib import Path
 
-from generic_algos import GenericAlgos
-from invaders import Invader
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from batch_algo import BatchDetectionAlgo
+from benchmarks.pipeline import time_pipeline
+from benchmarks.startup import measure_import_time
+from benchmarks.synthetic import generate_radar_data
+from generic_algos import GenericAlgos, compile_pattern, pack_line
+from incremental_algo import IncrementalDetectionAlgo
+from mapped_radar_map import MappedRadarMap
+from packed_radar_map import PackedRadarMap
+from metrics import DetectionMetrics
+from pyramid_algo import PyramidDetectionAlgo, downsample
+from invaders import Invader, InvaderMatch, MatchArray
+from loader import Loader
+from main import ENGINES, PEAK_FINDERS, main
 from detection_algo import DetectionAlgo
 from radar_map import RadarMap
+from score_cache import ScoreCache
+from service import DetectionService
+from streaming_algo import StreamingDetectionAlgo
 
 
 def get_mock_radar_map(width, height, character):
@@ -11,6 +40,36 @@ def get_mock_radar_map(width, height, character):
     return RadarMap(mock_radar_data)
 
 
+def get_mock_radar_data():
+    return """
+    ---oo----------------------
+    --oooo---o------o----o-----
+    ---oo---o--------o--o------
+    --o--o--o--------o--o------
+    ------oo----------oo-------
+    ---------------------------
+    """
+
+
+def get_odd_invader():
+    return Invader("odd", "-o-o-\no-o-o\n-ooo-")
+
+
+def assert_scores_equal(test_case, result, expected):
+    test_case.assertEqual(len(result), len(expected))
+    for row, expected_row in zip(result, expected):
+        test_case.assertEqual(len(row), len(expected_row))
+        for score, expected_score in zip(row, expected_row):
+            test_case.assertAlmostEqual(score, expected_score)
+
+
+def get_random_radar_data(width, height, seed=0):
+    rnd = random.Random(seed)
+    return "\n".join(
+        "".join(rnd.choice("o--") for _ in range(width)) for _ in range(height)
+    )
+
+
 def get_invaders():
     i1 = """
     --oo--
@@ -30,6 +89,56 @@ def get_invaders():
     return [invader_1, invader_2]
 
 
+class TestMatchArray(unittest.TestCase):
+    def setUp(self):
+        self.matches = [
+            InvaderMatch("a", 0, 0, 0, 0, 4, 4, 0.85),
+            InvaderMatch("b", 2, 2, 0, 0, 4, 4, 0.95),
+            InvaderMatch("a", 20, 20, 17, 17, 4, 4, 0.85),
+        ]
+
+    def test_iterates_as_invader_matches(self):
+        """
+        Tests that the columns give back the matches they hold.
+        """
+        ma = MatchArray(self.matches)
+        self.assertEqual(len(ma), 3)
+        self.assertEqual(list(ma), self.matches)
+        self.assertEqual(ma[1], self.matches[1])
+        self.assertEqual(ma.names, ["a", "b"])
+        self.assertEqual(ma, self.matches)
+
+    def test_filter_and_sort(self):
+        """
+        Tests filtering on the score and sorting by score,
+        ties keeping their order.
+        """
+        ma = MatchArray(self.matches)
+        self.assertEqual(list(ma.above(0.9)), [self.matches[1]])
+        self.assertEqual(
+            list(ma.sorted_by_score()), [self.matches[1], self.matches[0], self.matches[2]]
+        )
+
+    def test_extend_maps_invader_names(self):
+        """
+        Tests that extending with matches of other invaders
+        keeps their names.
+        """
+        ma = MatchArray(self.matches[:1])
+        ma.extend(MatchArray(self.matches[1:]))
+        self.assertEqual(list(ma), self.matches)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_to_numpy(self):
+        """
+        Tests the structured array of the matches.
+        """
+        result = MatchArray(self.matches).to_numpy()
+        self.assertEqual(result["score"].tolist(), [0.85, 0.95, 0.85])
+        self.assertEqual(result["id"].tolist(), [0, 1, 0])
+        self.assertEqual(result[result["x"] > 1]["real_x"].tolist(), [0, 17])
+
+
 class TestRadarMap(unittest.TestCase):
     def test_enlarged_radar_data(self):
         """
@@ -46,6 +155,43 @@ class TestRadarMap(unittest.TestCase):
         self.assertEqual(len(erd[0]), 9)
         self.assertEqual(len(erd), 9)
 
+    def test_enlarged_radar_data_rows_have_the_same_width(self):
+        """
+        Tests that all rows of the enlarged radar data have
+        the same width for odd pattern widths.
+        """
+        rm = get_mock_radar_map(5, 5, "-")
+        pattern = ["-" * 3 for _ in range(3)]
+        erd = rm.get_enlarged_radar_data(pattern)
+        self.assertEqual({len(row) for row in erd}, {8})
+
+    def test_enlarged_radar_data_views(self):
+        """
+        Tests that the enlarged radar data of every pattern is a view
+        of the radar data padded once for the largest pattern, with the
+        same rows and windows as a padded copy.
+        """
+        rm = RadarMap(get_random_radar_data(20, 15))
+        patterns = [["-" * 3] * 3, ["-" * 4] * 4, ["-" * 5] * 2]
+        rm.reserve_padding(5, 4)
+        views = [rm.get_enlarged_radar_data(pattern) for pattern in patterns]
+        self.assertEqual({id(view.buffer) for view in views}, {id(rm.padded)})
+        for pattern, view in zip(patterns, views):
+            width, height = len(pattern[0]), len(pattern)
+            expected = rm.get_padded_radar_data(width, height)
+            self.assertEqual(list(view), expected)
+            self.assertEqual(view[2:5], expected[2:5])
+            for x in range(0, 25, 4):
+                for y in range(0, 18, 3):
+                    self.assertEqual(
+                        rm.get_size_window((width, height), (x, y), view),
+                        rm.get_size_window((width, height), (x, y), expected),
+                    )
+        # a larger pattern pads the radar data again
+        view = rm.get_enlarged_radar_data(["-" * 7] * 6)
+        self.assertEqual(list(view), rm.get_padded_radar_data(7, 6))
+        self.assertEqual((rm.padded.width, rm.padded.height), (7, 6))
+
     def test_get_size_window_on_no_enlarged_radar_data(self):
         """
         Tests get_size_window when no extra radar_data argument
@@ -119,6 +265,155 @@ class TestRadarMap(unittest.TestCase):
         with self.assertRaises(ValueError):
             rm.get_size_window((6, 6), (0, 0))
 
+class TestMappedRadarMap(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.radar_data = get_random_radar_data(20, 15)
+        self.path = Path(self.tmp_dir.name) / "radar_data.txt"
+        # no line break after the last row
+        self.path.write_text(self.radar_data)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_rows_and_enlarged_radar_data(self):
+        """
+        Tests that the mapped rows and the virtual enlarged radar
+        data are the same as the ones of a RadarMap.
+        """
+        rm = RadarMap(self.radar_data)
+        mrm = MappedRadarMap(self.path)
+        self.assertEqual(list(mrm.radar_data), rm.radar_data)
+        for pattern in [["-" * 4] * 4, ["-" * 5] * 3]:
+            self.assertEqual(
+                list(mrm.get_enlarged_radar_data(pattern)),
+                rm.get_enlarged_radar_data(pattern),
+            )
+
+    def test_get_size_window(self):
+        """
+        Tests that windows read from the file, with or without margins,
+        are the same as the ones of a RadarMap, including near bounds.
+        """
+        rm = RadarMap(self.radar_data)
+        mrm = MappedRadarMap(self.path)
+        pattern = ["-" * 5] * 3
+        erd = rm.get_enlarged_radar_data(pattern)
+        merd = mrm.get_enlarged_radar_data(pattern)
+        for x in range(0, 25, 3):
+            for y in range(0, 17, 2):
+                self.assertEqual(
+                    mrm.get_size_window((5, 3), (x, y), merd),
+                    rm.get_size_window((5, 3), (x, y), erd),
+                )
+                self.assertEqual(
+                    mrm.get_size_window((4, 4), (x, y)),
+                    rm.get_size_window((4, 4), (x, y)),
+                )
+        with self.assertRaises(ValueError):
+            mrm.get_size_window((2, 2), (-1, 0))
+        with self.assertRaises(ValueError):
+            mrm.get_size_window((21, 2), (0, 0))
+
+    def test_line_breaks(self):
+        """
+        Tests that files with CRLF line breaks are read like the others
+        and that files whose rows differ in width are refused.
+        """
+        rows = self.radar_data.split()
+        self.path.write_bytes("\r\n".join(rows).encode() + b"\r\n")
+        self.assertEqual(list(MappedRadarMap(self.path).radar_data), rows)
+        for data in ["ab\ncde\nf\n", "ab\ncd\ne", "ab\r\ncd\nef", "ab\ncd\n\n"]:
+            self.path.write_bytes(data.encode())
+            with self.assertRaises(ValueError):
+                MappedRadarMap(self.path)
+
+    def test_run_search(self):
+        """
+        Tests that searching a mapped radar map finds
+        the same candidates as a RadarMap.
+        """
+        expected = DetectionAlgo(RadarMap(self.radar_data), get_invaders(), 0.6).run_search()
+        result = DetectionAlgo(MappedRadarMap(self.path), get_invaders(), 0.6).run_search()
+        self.assertEqual(sorted(result), sorted(expected))
+
+
+class TestPackedRadarMap(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        # wider than a word, so rows span several of them
+        self.radar_data = get_random_radar_data(150, 12)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_rows_and_enlarged_radar_data(self):
+        """
+        Tests that the packed rows and the virtual enlarged radar
+        data are the same as the ones of a RadarMap, in 8 times less
+        memory.
+        """
+        rm = RadarMap(self.radar_data)
+        prm = PackedRadarMap(self.radar_data)
+        self.assertEqual(list(prm.radar_data), rm.radar_data)
+        self.assertEqual(prm.radar_data.nbytes, 12 * 3 * 8)
+        for pattern in [["-" * 4] * 4, ["-" * 5] * 3]:
+            self.assertEqual(
+                list(prm.get_enlarged_radar_data(pattern)),
+                rm.get_enlarged_radar_data(pattern),
+            )
+
+    def test_get_size_window(self):
+        """
+        Tests that windows decoded from the packed rows, including
+        ones across words and near bounds, are the same as the ones
+        of a RadarMap.
+        """
+        rm = RadarMap(self.radar_data)
+        prm = PackedRadarMap(self.radar_data)
+        pattern = ["-" * 5] * 3
+        erd = rm.get_enlarged_radar_data(pattern)
+        perd = prm.get_enlarged_radar_data(pattern)
+        for x in range(0, 155, 7):
+            for y in range(0, 14, 3):
+                self.assertEqual(
+                    prm.get_size_window((70, 3), (x, y), perd),
+                    rm.get_size_window((70, 3), (x, y), erd),
+                )
+        with self.assertRaises(ValueError):
+            prm.get_size_window((151, 2), (0, 0))
+
+    def test_more_than_two_symbols(self):
+        """
+        Tests that radar data with a third symbol can't be packed.
+        """
+        with self.assertRaises(ValueError):
+            PackedRadarMap("--o\n-x-")
+
+    def test_save_and_load(self):
+        """
+        Tests that a saved packed frame is loaded back, by Loader too,
+        and searched like the text radar data.
+        """
+        path = Path(self.tmp_dir.name) / "radar_data.bin"
+        PackedRadarMap(self.radar_data).save(path)
+        self.assertTrue(PackedRadarMap.is_packed_file(path))
+        loaded = Loader(self.tmp_dir.name).load_radar_map(path)
+        self.assertIsInstance(loaded, PackedRadarMap)
+        self.assertEqual(list(loaded.radar_data), RadarMap(self.radar_data).radar_data)
+        self.assertEqual(
+            "".join(Loader(self.tmp_dir.name).iter_radar_rows()).split(),
+            RadarMap(self.radar_data).radar_data,
+        )
+        engines = ["levenshtein", "hamming"] + (["numpy"] if numpy is not None else [])
+        for engine in engines:
+            expected = DetectionAlgo(
+                RadarMap(self.radar_data), get_invaders(), 0.6, engine
+            ).run_search()
+            result = DetectionAlgo(loaded, get_invaders(), 0.6, engine).run_search()
+            self.assertEqual(sorted(result), sorted(expected))
+
+
 class TestGenericAlgos(unittest.TestCase):
 
     def test_levenshtein(self):
@@ -136,6 +431,73 @@ class TestGenericAlgos(unittest.TestCase):
         self.assertEqual(d, 2)
         self.assertAlmostEqual(r, 0.5714285714)
 
+    def test_levenshtein_bitparallel(self):
+        """
+        Tests that the bit-parallel Levenshtein returns the same
+        distance and ratio as levenshtein.
+        """
+        ga = GenericAlgos()
+        self.assertEqual(ga.levenshtein_bitparallel("abcd", "abx"), ga.levenshtein("abcd", "abx"))
+        rnd = random.Random(0)
+        for _ in range(500):
+            s1 = "".join(rnd.choice("o-") for _ in range(rnd.randint(1, 12)))
+            s2 = "".join(rnd.choice("o-") for _ in range(rnd.randint(1, 12)))
+            self.assertEqual(ga.levenshtein_bitparallel(s1, s2), ga.levenshtein(s1, s2))
+
+    def test_packed_ratio(self):
+        """
+        Tests that the ratio against a packed string is the ratio of
+        levenshtein, also when the other string is the shorter one.
+        """
+        ga = GenericAlgos()
+        rnd = random.Random(0)
+        for _ in range(500):
+            s1 = "".join(rnd.choice("o-") for _ in range(rnd.randint(0, 12)))
+            s2 = "".join(rnd.choice("o-") for _ in range(rnd.randint(1, 12)))
+            ratio = ga.packed_ratio(s1, pack_line(s2), s2)
+            self.assertEqual(ratio, ga.levenshtein_bitparallel(s1, s2)[1])
+            if s1:
+                self.assertEqual(ratio, ga.levenshtein(s1, s2)[1])
+
+    def test_bounded_ratio(self):
+        """
+        Tests that bounded_ratio agrees with levenshtein when the
+        distance is within the bound and returns None otherwise.
+        """
+        ga = GenericAlgos()
+        d, r = ga.levenshtein("oo-o-oo-", "-oo--ooo")
+        distance = round(16 * (1 - r))
+        self.assertEqual(ga.bounded_ratio("oo-o-oo-", "-oo--ooo", distance), (distance, r))
+        self.assertIsNone(ga.bounded_ratio("oo-o-oo-", "-oo--ooo", distance - 1))
+        self.assertEqual(ga.bounded_ratio("abcd", "abx", 10)[1], ga.levenshtein("abcd", "abx")[1])
+        self.assertIsNone(ga.bounded_ratio("abcdef", "ab", 3))
+
+    def test_compare_input_data_to_pattern_bounded(self):
+        """
+        Tests that the bounded comparison returns the full score
+        above the threshold and 0 when the threshold can't be reached.
+        """
+        ga = GenericAlgos()
+        pattern = ["-oo-", "oooo", "-oo-"]
+        input_data = ["-oo-", "oo-o", "-oo-"]
+        score = ga.compare_input_data_to_pattern(input_data, pattern)
+        ga.threshold = score - 0.01
+        self.assertEqual(ga.compare_input_data_to_pattern_bounded(input_data, pattern), score)
+        ga.threshold = score + 0.05
+        self.assertEqual(ga.compare_input_data_to_pattern_bounded(input_data, pattern), 0)
+
+    def test_cached_ratio(self):
+        """
+        Tests that cached_ratio returns the Levenshtein ratio
+        and stores it in the cache.
+        """
+        ga = GenericAlgos()
+        cache = {}
+        self.assertEqual(ga.cached_ratio("abcd", "abxd", cache), 0.75)
+        self.assertEqual(cache, {("abcd", "abxd"): 0.75})
+        cache[("abcd", "abxd")] = 0.5
+        self.assertEqual(ga.cached_ratio("abcd", "abxd", cache), 0.5)
+
     def test_run_leven(self):
         """
         Tests run_leven on a list of strings.
@@ -157,6 +519,44 @@ class TestGenericAlgos(unittest.TestCase):
         result = ga.compare_input_data_to_pattern(input_data, pattern)
         self.assertEqual(result, 1.0)
 
+    def test_compile_pattern(self):
+        """
+        Tests that a compiled pattern holds the rows, columns and
+        symbol counts of the pattern, read only, and survives pickling.
+        """
+        invader = get_odd_invader()
+        compiled = invader.compiled
+        self.assertEqual((compiled.width, compiled.height), (5, 3))
+        self.assertEqual(compiled.rows, ("-o-o-", "o-o-o", "-ooo-"))
+        self.assertEqual(compiled.columns, ("-o-", "o-o", "-oo", "o-o", "-o-"))
+        self.assertEqual(compiled.row_counts[1], {"o": 3, "-": 2})
+        self.assertEqual(compiled.column_counts[0], {"-": 2, "o": 1})
+        self.assertEqual(compiled.packed_rows[0].masks, {"-": 0b10101, "o": 0b01010})
+        self.assertIs(compile_pattern(compiled), compiled)
+        self.assertEqual(pickle.loads(pickle.dumps(compiled)), compiled)
+        # shared by every pattern with the same lines
+        with self.assertRaises(TypeError):
+            compiled.packed_rows[0].masks["x"] = 1
+        with self.assertRaises(TypeError):
+            pickle.loads(pickle.dumps(compiled)).row_counts[0].update(x=1)
+
+    def test_compare_compiled_pattern(self):
+        """
+        Tests that the comparisons score a compiled pattern
+        the same as the pattern's rows.
+        """
+        ga = GenericAlgos()
+        ga.threshold = 0.5
+        pattern = ["-oo-", "oooo", "-oo-"]
+        input_data = ["-oo-", "oo-o", "-oo-"]
+        compiled = compile_pattern(pattern)
+        for compare in (
+            ga.compare_input_data_to_pattern,
+            ga.compare_input_data_to_pattern_bounded,
+            ga.compare_input_data_to_pattern_bitparallel,
+        ):
+            self.assertEqual(compare(input_data, compiled), compare(input_data, pattern))
+
     def test_find_peaks_on_zero_threshold(self):
         """
         Tests find peaks with zero threshold.
@@ -175,6 +575,35 @@ class TestGenericAlgos(unittest.TestCase):
         self.assertEqual(result, [[0, 0, 0, 0, 6, 0, 0, 7, 0, 0]])
 
 
+class TestDetectionMetrics(unittest.TestCase):
+    def test_time(self):
+        """
+        Tests that timed blocks add up per stage and per invader.
+        """
+        metrics = DetectionMetrics()
+        with metrics.time("scan", "a"):
+            pass
+        with metrics.time("scan", "b"):
+            pass
+        self.assertEqual(set(metrics.invaders), {"a", "b"})
+        self.assertAlmostEqual(
+            metrics.stages["scan"],
+            metrics.invaders["a"]["scan"] + metrics.invaders["b"]["scan"],
+        )
+
+    def test_as_dict(self):
+        """
+        Tests that the metrics can be serialized.
+        """
+        metrics = DetectionMetrics()
+        metrics.count("windows_scored", 3)
+        metrics.count("windows_scored")
+        metrics.record_peak_memory()
+        result = metrics.as_dict()
+        self.assertEqual(result["counters"], {"windows_scored": 4})
+        self.assertGreaterEqual(result["peak_memory"], 0)
+
+
 class TestDetectionAlgo(unittest.TestCase):
 
     def test_with_no_overlaps(self):
@@ -218,3 +647,1021 @@ class TestDetectionAlgo(unittest.TestCase):
             if invader.name == "invader_2":
                 self.assertEqual(invader.real_x, 16)
                 self.assertEqual(invader.real_y, 1)
+
+    def test_incremental_scores_match_levenshtein_scores(self):
+        """
+        Tests that the incremental engine returns the same score
+        matrix as the reference levenshtein engine.
+        """
+        rm = RadarMap(get_mock_radar_data())
+        invaders = get_invaders() + [get_odd_invader()]
+        reference = DetectionAlgo(rm, invaders, 0.8)
+        incremental = DetectionAlgo(rm, invaders, 0.8, engine="incremental")
+        for invader in invaders:
+            expected = reference.scan_radar_data(invader.pattern)
+            result = incremental.scan_radar_data(invader.pattern)
+            assert_scores_equal(self, result, expected)
+
+    def test_bitparallel_scores_match_levenshtein_scores(self):
+        """
+        Tests that the bitparallel engine returns the same score
+        matrix as the reference levenshtein engine.
+        """
+        rm = RadarMap(get_mock_radar_data())
+        invaders = get_invaders() + [get_odd_invader()]
+        reference = DetectionAlgo(rm, invaders, 0.8)
+        bitparallel = DetectionAlgo(rm, invaders, 0.8, engine="bitparallel")
+        for invader in invaders:
+            expected = reference.scan_radar_data(invader.pattern)
+            result = bitparallel.scan_radar_data(invader.pattern)
+            assert_scores_equal(self, result, expected)
+
+    def test_scores_on_rows_of_different_widths(self):
+        """
+        Tests that the bitparallel and incremental engines return the
+        same scores as the reference engine when windows have rows
+        shorter than the pattern.
+        """
+        rnd = random.Random(1)
+        rm = RadarMap(
+            "\n".join(
+                "".join(rnd.choice("o-") for _ in range(rnd.randint(10, 30)))
+                for _ in range(20)
+            )
+        )
+        reference = DetectionAlgo(rm, get_invaders(), 0.8)
+        for engine in ("bitparallel", "incremental"):
+            algo = DetectionAlgo(rm, get_invaders(), 0.8, engine=engine)
+            for invader in get_invaders():
+                expected = reference.scan_radar_data(invader.pattern)
+                result = algo.scan_radar_data(invader.pattern)
+                assert_scores_equal(self, result, expected)
+
+    def test_bounded_engine_peaks_match_levenshtein_peaks(self):
+        """
+        Tests that the bounded engine only zeroes scores below the
+        threshold and finds the same candidates as the reference engine.
+        """
+        rm = RadarMap(get_mock_radar_data())
+        invaders = get_invaders() + [get_odd_invader()]
+        reference = DetectionAlgo(rm, invaders, 0.7)
+        bounded = DetectionAlgo(rm, invaders, 0.7, engine="bounded")
+        for invader in invaders:
+            expected = reference.scan_radar_data(invader.pattern)
+            result = bounded.scan_radar_data(invader.pattern)
+            for row, expected_row in zip(result, expected):
+                for score, expected_score in zip(row, expected_row):
+                    if score != expected_score:
+                        self.assertEqual(score, 0)
+                        self.assertLessEqual(expected_score, 0.7)
+        self.assertEqual(
+            sorted((m.name, m.x, m.y) for m in bounded.run_search()),
+            sorted((m.name, m.x, m.y) for m in reference.run_search()),
+        )
+
+    def test_distance_lower_bound(self):
+        """
+        Tests that the bound from the summed area table never
+        exceeds the total ratio distance of a window.
+        """
+        ga = GenericAlgos()
+        lines = get_random_radar_data(12, 10).split()
+        table = ga.summed_area_table(lines, "-")
+        self.assertEqual(table[10][12], sum(line.count("o") for line in lines))
+        for invader in get_invaders() + [get_odd_invader()]:
+            pattern = invader.compiled
+            for j in range(10 - pattern.height + 1):
+                for i in range(12 - pattern.width + 1):
+                    window = [line[i : i + pattern.width] for line in lines[j : j + pattern.height]]
+                    score = ga.compare_input_data_to_pattern(window, pattern)
+                    total = 4 * pattern.width * pattern.height * (1 - score)
+                    bound = ga.distance_lower_bound(table, (i, j), pattern, "-")
+                    self.assertLessEqual(bound, round(total))
+
+    def test_prefilter_prunes_windows_and_keeps_peaks(self):
+        """
+        Tests that the prefilter skips windows, only zeroes scores
+        below the threshold and finds the same candidates.
+        """
+        rm = RadarMap(get_random_radar_data(30, 20))
+        invaders = get_invaders() + [get_odd_invader()]
+        for engine in ("levenshtein", "bounded", "bitparallel"):
+            reference = DetectionAlgo(rm, invaders, 0.75, engine)
+            prefiltered = DetectionAlgo(rm, invaders, 0.75, engine, prefilter=True)
+            for invader in invaders:
+                expected = reference.scan_radar_data(invader.pattern)
+                result = prefiltered.scan_radar_data(invader.pattern)
+                for row, expected_row in zip(result, expected):
+                    for score, expected_score in zip(row, expected_row):
+                        if score != expected_score:
+                            self.assertEqual(score, 0)
+                            self.assertLessEqual(expected_score, 0.75)
+            self.assertEqual(prefiltered.run_search(), reference.run_search())
+            self.assertGreater(prefiltered.windows_pruned, 0)
+            self.assertEqual(reference.windows_pruned, 0)
+
+    def test_joint_scan_matches_per_invader_scan(self):
+        """
+        Tests that the joint scan returns the same scores and
+        candidates as scanning every invader on its own, with
+        invaders of different and of the same size.
+        """
+        rm = RadarMap(get_random_radar_data(25, 15))
+        invaders = get_invaders() + [get_odd_invader(), Invader("small", "o-o\n-o-")]
+        for engine in ("bitparallel", "incremental"):
+            for prefilter in (False, True):
+                reference = DetectionAlgo(rm, invaders, 0.7, engine, prefilter=prefilter)
+                joint = DetectionAlgo(
+                    rm, invaders, 0.7, engine, prefilter=prefilter, joint=True
+                )
+                self.assertEqual(
+                    joint.scan_joint(),
+                    [reference.scan_radar_data(invader.pattern) for invader in invaders],
+                )
+                self.assertEqual(joint.run_search(), reference.run_search())
+                self.assertEqual(joint.windows_pruned, reference.windows_pruned)
+
+    def test_tiled_scan_matches_single_process_scan(self):
+        """
+        Tests that scanning the radar data in tiles with a pool
+        of processes returns the same scores as a single process.
+        """
+        rm = RadarMap(get_mock_radar_data() * 3)
+        invaders = get_invaders() + [get_odd_invader()]
+        single = DetectionAlgo(rm, invaders, 0.8, engine="bitparallel")
+        tiled = DetectionAlgo(rm, invaders, 0.8, engine="bitparallel", workers=2)
+        for invader in invaders:
+            self.assertEqual(
+                tiled.scan_radar_data(invader.pattern),
+                single.scan_radar_data(invader.pattern),
+            )
+
+    def test_best_matching_data_suppresses_overlaps(self):
+        """
+        Tests that only the highest scoring of a group of
+        overlapping candidates is kept.
+        """
+        rm = get_mock_radar_map(5, 5, "-")
+        da = DetectionAlgo(rm, get_invaders(), 0.8)
+        matches = [
+            InvaderMatch("a", 0, 0, 0, 0, 4, 4, 0.85),
+            InvaderMatch("a", 2, 2, 0, 0, 4, 4, 0.95),
+            InvaderMatch("b", 4, 1, 1, 0, 4, 4, 0.9),
+            InvaderMatch("b", 20, 20, 17, 17, 4, 4, 0.81),
+        ]
+        result = da.get_best_matching_data(matches)
+        self.assertEqual(result, [matches[1], matches[3]])
+        result = da.get_best_matching_data(MatchArray(matches))
+        self.assertIsInstance(result, MatchArray)
+        self.assertEqual(list(result), [matches[1], matches[3]])
+
+    def test_best_matching_data_matches_exhaustive_search(self):
+        """
+        Tests the grid based overlap resolution against
+        checking every pair of candidates.
+        """
+        rm = get_mock_radar_map(5, 5, "-")
+        da = DetectionAlgo(rm, get_invaders(), 0.8)
+        rnd = random.Random(0)
+        matches = [
+            InvaderMatch(
+                "a", rnd.randint(0, 60), rnd.randint(0, 60), 0, 0,
+                rnd.randint(2, 8), rnd.randint(2, 8), rnd.random(),
+            )
+            for _ in range(200)
+        ]
+        expected = []
+        for match in sorted(matches, key=lambda m: m.score, reverse=True):
+            if not any(da.overlap(match, m) for m in expected):
+                expected.append(match)
+        self.assertEqual(da.get_best_matching_data(matches), expected)
+
+    def test_metrics_record_every_stage(self):
+        """
+        Tests that the metrics hold the time of every stage,
+        per invader, and the counters of the work done.
+        """
+        rm = RadarMap(get_mock_radar_data())
+        invaders = get_invaders()
+        metrics = DetectionMetrics()
+        da = DetectionAlgo(rm, invaders, 0.8, engine="bitparallel", metrics=metrics)
+        results = da.run_search()
+        for stage in ("get_enlarged_radar_data", "scan_radar_data", "find_peaks"):
+            self.assertIn(stage, metrics.stages)
+            for invader in invaders:
+                self.assertIn(stage, metrics.invaders[invader.name])
+        self.assertIn("get_best_matching_data", metrics.stages)
+        windows = sum(
+            len(row) for invader in invaders for row in da.scan_radar_data(invader.pattern)
+        )
+        self.assertEqual(metrics.counters["windows_scored"], windows)
+        self.assertEqual(
+            metrics.counters["levenshtein_calls"],
+            sum(
+                len(row) * (invader.width + invader.height)
+                for invader in invaders
+                for row in da.scan_radar_data(invader.pattern)
+            ),
+        )
+        self.assertGreaterEqual(metrics.counters["candidates"], len(results))
+        self.assertEqual(metrics.counters["matches"], len(results))
+
+    def test_tiled_search_uses_a_single_pool(self):
+        """
+        Tests that a tiled search scans the tiles of every invader
+        in a single pool of processes and finds the same candidates
+        as a single process.
+        """
+        rm = RadarMap(get_mock_radar_data() * 3)
+        invaders = get_invaders() + [get_odd_invader()]
+        expected = DetectionAlgo(rm, invaders, 0.8, engine="bitparallel").run_search()
+        pools = []
+        pool_class = concurrent.futures.ProcessPoolExecutor
+
+        def counting_pool(*args, **kwargs):
+            pools.append(args)
+            return pool_class(*args, **kwargs)
+
+        with unittest.mock.patch("concurrent.futures.ProcessPoolExecutor", counting_pool):
+            for joint in (False, True):
+                tiled = DetectionAlgo(rm, invaders, 0.8, "bitparallel", workers=2, joint=joint)
+                self.assertEqual(tiled.run_search(), expected)
+        self.assertEqual(len(pools), 2)
+
+    def test_value_error_on_no_workers(self):
+        """
+        Tests that a ValueError is raised when less
+        than one worker is requested.
+        """
+        rm = get_mock_radar_map(5, 5, "-")
+        with self.assertRaises(ValueError):
+            DetectionAlgo(rm, get_invaders(), 0.8, workers=0)
+
+    def test_value_error_on_unknown_peak_finder(self):
+        """
+        Tests that a ValueError is raised when an unknown
+        peak finder is requested.
+        """
+        rm = get_mock_radar_map(5, 5, "-")
+        with self.assertRaises(ValueError):
+            DetectionAlgo(rm, get_invaders(), 0.8, peaks="unknown")
+
+    def test_value_error_on_unknown_engine(self):
+        """
+        Tests that a ValueError is raised when an unknown
+        scoring engine is requested.
+        """
+        rm = get_mock_radar_map(5, 5, "-")
+        with self.assertRaises(ValueError):
+            DetectionAlgo(rm, get_invaders(), 0.8, engine="unknown")
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestNumpyAlgos(unittest.TestCase):
+    def test_numpy_scores_match_levenshtein_scores(self):
+        """
+        Tests that the numpy engine returns the same score
+        matrix as the reference levenshtein engine, including
+        an odd width pattern.
+        """
+        rm = RadarMap(get_mock_radar_data())
+        invaders = get_invaders() + [get_odd_invader()]
+        reference = DetectionAlgo(rm, invaders, 0.8)
+        vectorized = DetectionAlgo(rm, invaders, 0.8, engine="numpy")
+        for invader in invaders:
+            expected = reference.scan_radar_data(invader.pattern)
+            result = vectorized.scan_radar_data(invader.pattern)
+            assert_scores_equal(self, result, expected)
+
+    def test_numpy_scores_on_mapped_radar_map(self):
+        """
+        Tests that the numpy engine scores a mapped radar map
+        the same as a RadarMap.
+        """
+        radar_data = get_random_radar_data(20, 15)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "radar_data.txt"
+            path.write_text(radar_data + "\n")
+            mapped = DetectionAlgo(MappedRadarMap(path), get_invaders(), 0.8, engine="numpy")
+            reference = DetectionAlgo(RadarMap(radar_data), get_invaders(), 0.8, engine="numpy")
+            for invader in get_invaders():
+                self.assertEqual(
+                    mapped.scan_radar_data(invader.pattern),
+                    reference.scan_radar_data(invader.pattern),
+                )
+
+    def test_hamming_scores_match_cell_agreement(self):
+        """
+        Tests that the hamming engine scores every window with
+        the fraction of cells agreeing with the pattern.
+        """
+        rm = RadarMap(get_random_radar_data(23, 11))
+        invaders = get_invaders() + [get_odd_invader()]
+        da = DetectionAlgo(rm, invaders, 0.8, engine="hamming")
+        for invader in invaders:
+            enlarged_radar_data = rm.get_enlarged_radar_data(invader.pattern)
+            expected = [
+                [
+                    sum(
+                        (c == "-") == (p == "-")
+                        for line, p_line in zip(
+                            rm.get_size_window(
+                                (invader.width, invader.height), (i, j), enlarged_radar_data
+                            ),
+                            invader.pattern,
+                        )
+                        for c, p in zip(line, p_line)
+                    )
+                    / (invader.width * invader.height)
+                    for i in range(len(enlarged_radar_data[0]) - invader.width)
+                ]
+                for j in range(len(enlarged_radar_data) - invader.height)
+            ]
+            assert_scores_equal(self, da.scan_radar_data(invader.pattern), expected)
+
+    def test_hamming_run_search(self):
+        """
+        Tests that the hamming engine finds the invaders
+        of noiseless radar data.
+        """
+        radar_data, placed = generate_radar_data(40, 30, get_invaders(), 0, 0.1, seed=1)
+        result = DetectionAlgo(RadarMap(radar_data), get_invaders(), 0.99, "hamming").run_search()
+        self.assertEqual(
+            sorted((m.name, m.real_x, m.real_y) for m in result), sorted(placed)
+        )
+
+    def test_find_peaks_2d(self):
+        """
+        Tests the 2D non-maximum suppression against checking the
+        neighbourhood of every score, plateaus keeping their first cell.
+        """
+        from numpy_algos import NumpyAlgos
+
+        na = NumpyAlgos()
+        scores = numpy.array([[0.9, 0.9, 0.1, 0.5], [0.2, 0.3, 0.1, 0.95]])
+        rows, cols = na.find_peaks_2d(scores, (3, 3), 0.4)
+        self.assertEqual(list(zip(rows.tolist(), cols.tolist())), [(0, 0), (1, 3)])
+        rnd = random.Random(0)
+        for _ in range(100):
+            height, width = rnd.randint(1, 8), rnd.randint(1, 8)
+            size = (rnd.randint(1, 5), rnd.randint(1, 5))
+            scores = numpy.array(
+                [[rnd.randint(0, 3) for _ in range(width)] for _ in range(height)], dtype=float
+            )
+            expected = []
+            for j in range(height):
+                for i in range(width):
+                    neighbours = [
+                        (scores[y, x], (y, x))
+                        for y in range(max(0, j - size[1] // 2), min(height, j + size[1] // 2 + 1))
+                        for x in range(max(0, i - size[0] // 2), min(width, i + size[0] // 2 + 1))
+                    ]
+                    # highest score first, then first in row major order
+                    if scores[j, i] > 1 and min(neighbours, key=lambda n: (-n[0], n[1]))[1] == (j, i):
+                        expected.append((j, i))
+            rows, cols = na.find_peaks_2d(scores, size, 1)
+            self.assertEqual(list(zip(rows.tolist(), cols.tolist())), expected)
+
+    def test_nms_run_search(self):
+        """
+        Tests that the 2D non-maximum suppression finds the
+        invaders of noiseless radar data.
+        """
+        radar_data, placed = generate_radar_data(40, 30, get_invaders(), 0, 0.1, seed=1)
+        rm = RadarMap(radar_data)
+        result = DetectionAlgo(rm, get_invaders(), 0.9, "numpy", peaks="nms").run_search()
+        self.assertEqual(
+            sorted((m.name, m.real_x, m.real_y) for m in result), sorted(placed)
+        )
+
+    def test_numpy_run_search(self):
+        """
+        Tests that the numpy engine finds the same candidates
+        as the reference levenshtein engine.
+        """
+        rm = RadarMap(get_mock_radar_data())
+        expected = DetectionAlgo(rm, get_invaders(), 0.8).run_search()
+        result = DetectionAlgo(rm, get_invaders(), 0.8, engine="numpy").run_search()
+        self.assertEqual(
+            sorted((m.name, m.x, m.y) for m in result),
+            sorted((m.name, m.x, m.y) for m in expected),
+        )
+
+
+class TestPyramidDetectionAlgo(unittest.TestCase):
+    def test_downsample(self):
+        """
+        Tests majority pooling, including blocks cut by the edges.
+        """
+        lines = ["oo-o-", "o--o-", "-----"]
+        self.assertEqual(downsample(lines, 2), ["o--", "---"])
+        self.assertEqual(downsample(["ooo", "ooo", "ooo"], 2), ["o-", "--"])
+
+    def test_pyramid_finds_noiseless_invaders(self):
+        """
+        Tests that the coarse to fine search finds the same
+        matches as the exhaustive search on noiseless data.
+        """
+        invaders = Loader(Path(__file__).parent / "input_files").load_invaders()
+        radar_data, placed = generate_radar_data(60, 40, invaders, 0, 0.1, seed=1)
+        rm = RadarMap(radar_data)
+        expected = DetectionAlgo(rm, invaders, 0.9, "bitparallel").run_search()
+        pda = PyramidDetectionAlgo(rm, invaders, 0.9, "bitparallel", factor=2)
+        self.assertEqual(pda.run_search(), expected)
+        self.assertEqual(len(expected), len(placed))
+
+    def test_value_error_on_small_factor(self):
+        """
+        Tests that a ValueError is raised for a factor below 2.
+        """
+        rm = get_mock_radar_map(5, 5, "-")
+        with self.assertRaises(ValueError):
+            PyramidDetectionAlgo(rm, get_invaders(), 0.8, factor=1)
+
+
+class TestStreamingDetectionAlgo(unittest.TestCase):
+    def test_stream_matches_batch_search(self):
+        """
+        Tests that streaming the radar data row by row finds
+        the same candidates as searching the whole radar data.
+        """
+        invaders = get_invaders() + [get_odd_invader()]
+        for rd, threshold in [(get_mock_radar_data(), 0.8), (get_random_radar_data(30, 40), 0.6)]:
+            rm = RadarMap(rd)
+            expected = DetectionAlgo(rm, invaders, threshold, engine="bitparallel").run_search()
+            sda = StreamingDetectionAlgo(
+                iter(rd.splitlines()), invaders, threshold, engine="bitparallel"
+            )
+            self.assertEqual(sorted(sda.run_search()), sorted(expected))
+
+    def test_stream_yields_before_the_end_of_data(self):
+        """
+        Tests that candidates are yielded before all
+        the radar rows have been read.
+        """
+        rows_read = []
+
+        def rows():
+            for row in get_mock_radar_data().split() + ["-" * 27] * 20:
+                rows_read.append(row)
+                yield row
+
+        sda = StreamingDetectionAlgo(rows(), get_invaders(), 0.8, engine="bitparallel")
+        next(sda.search_stream())
+        self.assertLess(len(rows_read), 15)
+
+
+class TestBatchDetectionAlgo(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.frames = []
+        for seed in range(3):
+            path = Path(self.tmp_dir.name) / f"radar_data_{seed}.txt"
+            path.write_text(get_random_radar_data(30, 12, seed))
+            self.frames.append(path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_expected(self, path):
+        rm = RadarMap(path.read_text())
+        da = DetectionAlgo(rm, get_invaders(), 0.7, engine="bitparallel")
+        return [m._asdict() for m in da.run_search()]
+
+    def test_find_radar_frames(self):
+        """
+        Tests that frames are found in a directory or with a glob.
+        """
+        loader = Loader(self.tmp_dir.name)
+        self.assertEqual(loader.find_radar_frames(self.tmp_dir.name), self.frames)
+        pattern = str(Path(self.tmp_dir.name) / "*_1.txt")
+        self.assertEqual(loader.find_radar_frames(pattern), [self.frames[1]])
+
+    def test_batch_matches_single_frame_search(self):
+        """
+        Tests that every frame gets the same matches as when searched
+        on its own, in the order of the frames, with and without a pool.
+        """
+        for workers in (1, 2):
+            with BatchDetectionAlgo(get_invaders(), 0.7, "bitparallel", workers) as batch:
+                results = list(batch.search_frames(self.frames))
+            self.assertEqual([r["frame"] for r in results], [str(f) for f in self.frames])
+            for result, frame in zip(results, self.frames):
+                self.assertEqual(result["matches"], self.get_expected(frame))
+
+    def test_batch_reports_unreadable_frames(self):
+        """
+        Tests that a missing frame is reported without stopping the batch.
+        """
+        missing = Path(self.tmp_dir.name) / "missing.txt"
+        with BatchDetectionAlgo(get_invaders(), 0.7, "bitparallel") as batch:
+            results = list(batch.search_frames([missing, self.frames[0]]))
+        self.assertIn("error", results[0])
+        self.assertEqual(results[1]["matches"], self.get_expected(self.frames[0]))
+
+    def test_frames_are_padded_once(self):
+        """
+        Tests that the frames are only padded for the largest invader,
+        not again for each larger one, with and without incremental.
+        """
+        invaders = [Invader("small", "-o-\no-o"), *get_invaders(), Invader("wide", "o" * 8)]
+        for incremental in (False, True):
+            batch = BatchDetectionAlgo(invaders, 0.7, "bitparallel", incremental=incremental)
+            with batch, unittest.mock.patch.object(
+                RadarMap,
+                "get_padded_radar_data",
+                autospec=True,
+                side_effect=RadarMap.get_padded_radar_data,
+            ) as padding:
+                results = list(batch.search_frames(self.frames))
+            self.assertNotIn("error", results[0])
+            self.assertEqual({call.args[1:] for call in padding.call_args_list}, {(8, 4)})
+
+
+
+def get_changed_frames(width, height, steps, changes, seed=0):
+    """
+    Consecutive frames of random radar data, each with a few random
+    cells changed from the previous one.
+    """
+    rnd = random.Random(seed)
+    frame = [list(row) for row in get_random_radar_data(width, height, seed).split("\n")]
+    frames = ["\n".join("".join(row) for row in frame)]
+    for _ in range(steps):
+        for _ in range(rnd.randint(0, changes)):
+            frame[rnd.randrange(height)][rnd.randrange(width)] = rnd.choice("o-")
+        frames.append("\n".join("".join(row) for row in frame))
+    return frames
+
+
+class TestIncrementalDetectionAlgo(unittest.TestCase):
+    def assert_updates_match_full_search(self, invaders, engine, peaks="separable"):
+        frames = get_changed_frames(40, 20, 8, 12)
+        ida = IncrementalDetectionAlgo(RadarMap(frames[0]), invaders, 0.6, engine, peaks=peaks)
+        ida.run_search()
+        for frame in frames[1:]:
+            da = DetectionAlgo(RadarMap(frame), invaders, 0.6, engine, peaks=peaks)
+            self.assertEqual(list(ida.update(RadarMap(frame))), list(da.run_search()))
+
+    def test_updates_match_full_search(self):
+        """
+        Tests that updating frame after frame finds the same matches, in
+        the same order, as searching every frame whole, for invaders of
+        odd and even sizes.
+        """
+        invaders = get_invaders() + [get_odd_invader()]
+        self.assert_updates_match_full_search(invaders, "bitparallel")
+        self.assert_updates_match_full_search(invaders, "levenshtein")
+
+    @unittest.skipIf(numpy is None, "NumPy not installed")
+    def test_updates_match_full_search_nms(self):
+        """
+        Tests the same with the NumPy engines and the 2D peak finder.
+        """
+        invaders = get_invaders() + [get_odd_invader()]
+        self.assert_updates_match_full_search(invaders, "numpy", "nms")
+        self.assert_updates_match_full_search(invaders, "hamming")
+
+    def test_only_changed_windows_are_scored(self):
+        """
+        Tests that a single changed cell only scores the windows of every
+        invader covering it, and that an unchanged frame scores none.
+        """
+        radar_data = get_random_radar_data(40, 20)
+        ida = IncrementalDetectionAlgo(RadarMap(radar_data), get_invaders(), 0.6, "bitparallel")
+        ida.run_search()
+        ida.update(RadarMap(radar_data))
+        self.assertEqual(ida.windows_rescored, 0)
+        rows = radar_data.split("\n")
+        rows[10] = rows[10][:20] + ("o" if rows[10][20] == "-" else "-") + rows[10][21:]
+        ida.update(RadarMap("\n".join(rows)))
+        self.assertEqual(
+            ida.windows_rescored, sum(i.width * i.height for i in get_invaders())
+        )
+
+    def test_dirty_rectangles(self):
+        """
+        Tests that consecutive changed rows are merged into one rectangle.
+        """
+        ida = IncrementalDetectionAlgo(RadarMap(""), [], 0.6)
+        previous = ["-----", "-----", "-----", "-----"]
+        current = ["-o---", "---o-", "-----", "o----"]
+        self.assertEqual(
+            ida.get_dirty_rectangles(previous, current), [(1, 0, 3, 1), (0, 3, 0, 3)]
+        )
+
+    def test_frames_of_another_size_are_searched_whole(self):
+        """
+        Tests that a frame of another size than the previous one
+        is searched whole.
+        """
+        radar_map = RadarMap(get_random_radar_data(40, 20))
+        ida = IncrementalDetectionAlgo(radar_map, get_invaders(), 0.6)
+        ida.run_search()
+        radar_data = get_random_radar_data(30, 15, 1)
+        da = DetectionAlgo(RadarMap(radar_data), get_invaders(), 0.6)
+        self.assertEqual(ida.update(RadarMap(radar_data)), da.run_search())
+
+    def test_incremental_batch(self):
+        """
+        Tests that an incremental batch gets the matches of every frame
+        searched on its own, and needs a single worker.
+        """
+        frames = get_changed_frames(30, 12, 3, 10)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = []
+            for k, frame in enumerate(frames):
+                paths.append(Path(tmp_dir) / f"radar_data_{k}.txt")
+                paths[-1].write_text(frame)
+            with BatchDetectionAlgo(
+                get_invaders(), 0.7, "bitparallel", incremental=True
+            ) as batch:
+                results = list(batch.search_frames(paths))
+        for result, frame in zip(results, frames):
+            da = DetectionAlgo(RadarMap(frame), get_invaders(), 0.7, engine="bitparallel")
+            self.assertEqual(result["matches"], [m._asdict() for m in da.run_search()])
+        with self.assertRaises(ValueError):
+            BatchDetectionAlgo(get_invaders(), 0.7, workers=2, incremental=True)
+
+
+class TestScoreCache(unittest.TestCase):
+    def test_scores_round_trip(self):
+        """
+        Tests that scores come back unchanged from memory and, with
+        a directory, from disk in another cache instance.
+        """
+        scores = [[0.5, 0.25, 1 / 3], [0, 0.75, 1.0]]
+        cache = ScoreCache()
+        self.assertIsNone(cache.get("key"))
+        cache.put("key", scores)
+        self.assertEqual(cache.get("key"), scores)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ScoreCache(tmp_dir).put("key", scores)
+            self.assertEqual(ScoreCache(tmp_dir).get("key"), scores)
+            (Path(tmp_dir) / "key.scores").write_bytes(b"corrupted")
+            self.assertIsNone(ScoreCache(tmp_dir).get("key"))
+
+    def test_least_recently_used_are_evicted(self):
+        """
+        Tests that the least recently used scores are evicted
+        over the size cap, in memory and on disk.
+        """
+        scores = [[0.5] * 8]
+        cache = ScoreCache(max_bytes=2 * 8 * 8)
+        cache.put("a", scores)
+        cache.put("b", scores)
+        cache.get("a")
+        cache.put("c", scores)
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ScoreCache(tmp_dir, max_disk_bytes=1)
+            cache.put("a", scores)
+            cache.put("b", scores)
+            self.assertEqual([p.name for p in Path(tmp_dir).iterdir()], ["b.scores"])
+
+    def test_keys(self):
+        """
+        Tests that keys change with the radar data, the pattern and the
+        engine, and with the threshold only for the bounded engine.
+        """
+        invader = get_invaders()[0]
+        cache = ScoreCache()
+
+        def get_key(radar_data, engine="levenshtein", threshold=0.7):
+            da = DetectionAlgo(RadarMap(radar_data), [], threshold, engine, cache=cache)
+            return da.get_cache_key(invader)
+
+        radar_data = get_random_radar_data(20, 10)
+        key = get_key(radar_data)
+        self.assertEqual(get_key(radar_data, threshold=0.8), key)
+        self.assertNotEqual(get_key(get_random_radar_data(20, 10, 1)), key)
+        self.assertNotEqual(get_key(radar_data, "bitparallel"), key)
+        self.assertNotEqual(
+            get_key(radar_data, "bounded"), get_key(radar_data, "bounded", 0.8)
+        )
+        da = DetectionAlgo(RadarMap(radar_data), [], 0.7, cache=cache)
+        self.assertNotEqual(da.get_cache_key(get_invaders()[1]), key)
+
+    def test_cached_search_skips_scanning(self):
+        """
+        Tests that searching the same radar data again with another
+        threshold scores no window and finds the same matches as
+        without the cache, with and without the joint scan.
+        """
+        rm = RadarMap(get_random_radar_data(40, 20))
+        for joint in (False, True):
+            cache = ScoreCache()
+            da = DetectionAlgo(rm, get_invaders(), 0.8, "bitparallel", joint=joint, cache=cache)
+            da.run_search()
+            metrics = DetectionMetrics()
+            da = DetectionAlgo(
+                rm, get_invaders(), 0.6, "bitparallel", metrics=metrics, joint=joint, cache=cache
+            )
+            expected = DetectionAlgo(rm, get_invaders(), 0.6, "bitparallel").run_search()
+            self.assertEqual(da.run_search(), expected)
+            self.assertEqual(metrics.counters["windows_scored"], 0)
+            self.assertEqual(metrics.counters["score_cache_hits"], len(get_invaders()))
+
+
+class TestThresholdSweep(unittest.TestCase):
+    def test_sweep_matches_single_searches(self):
+        """
+        Tests that every threshold of a sweep gets the matches of a
+        search with that threshold alone, also for the bounded engine
+        and the prefilter whose scores depend on the threshold.
+        """
+        rm = RadarMap(get_random_radar_data(40, 20))
+        invaders = get_invaders() + [get_odd_invader()]
+        thresholds = [0.6, 0.65, 0.7, 0.75, 0.8]
+        for engine, prefilter, joint in (
+            ("bitparallel", False, False),
+            ("bounded", False, True),
+            ("levenshtein", True, False),
+        ):
+            da = DetectionAlgo(rm, invaders, 0.9, engine, prefilter=prefilter, joint=joint)
+            results = da.sweep_thresholds(thresholds)
+            self.assertEqual(da.threshold, 0.9)
+            for threshold, result in zip(thresholds, results):
+                matches = DetectionAlgo(rm, invaders, threshold, engine).run_search()
+                self.assertEqual(result["threshold"], threshold)
+                self.assertEqual(result["matches"], da.count_by_invader(matches))
+                self.assertEqual(sum(result["matches"].values()), len(matches))
+
+    def test_sweep_scans_once(self):
+        """
+        Tests that a sweep scores the windows once whatever
+        the number of thresholds.
+        """
+        rm = RadarMap(get_random_radar_data(30, 12))
+        metrics = DetectionMetrics()
+        da = DetectionAlgo(rm, get_invaders(), 0.7, "bitparallel", metrics=metrics)
+        da.sweep_thresholds([0.6, 0.7, 0.8, 0.9])
+        single = DetectionMetrics()
+        DetectionAlgo(rm, get_invaders(), 0.7, "bitparallel", metrics=single).run_search()
+        self.assertEqual(
+            metrics.counters["windows_scored"], single.counters["windows_scored"]
+        )
+        with self.assertRaises(ValueError):
+            da.sweep_thresholds([])
+
+    def test_precision_and_recall(self):
+        """
+        Tests the precision and recall against known invaders, each
+        claimed by a single match within the tolerance.
+        """
+        da = DetectionAlgo(RadarMap(get_mock_radar_data()), get_invaders(), 0.7)
+        matches = MatchArray(
+            [
+                InvaderMatch("invader_1", 4, 2, 1, 0, 6, 4, 0.9),
+                InvaderMatch("invader_1", 5, 2, 2, 0, 6, 4, 0.8),
+                InvaderMatch("invader_2", 20, 2, 17, 0, 6, 4, 0.8),
+            ]
+        )
+        ground_truth = [
+            {"name": "invader_1", "real_x": 2, "real_y": 1},
+            {"name": "invader_2", "real_x": 10, "real_y": 0},
+        ]
+        result = da.evaluate(matches, ground_truth)
+        self.assertEqual(
+            result,
+            {
+                "true_positives": 1,
+                "false_positives": 2,
+                "false_negatives": 1,
+                "precision": 1 / 3,
+                "recall": 0.5,
+            },
+        )
+        self.assertIsNone(da.evaluate(MatchArray(), [])["precision"])
+
+    def test_load_ground_truth(self):
+        """
+        Tests loading known invaders from a list or from a batch result.
+        """
+        ground_truth = [{"name": "invader_1", "real_x": 2, "real_y": 1}]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "truth.json"
+            loader = Loader(tmp_dir)
+            path.write_text(json.dumps(ground_truth))
+            self.assertEqual(loader.load_ground_truth(path), ground_truth)
+            path.write_text(json.dumps({"frame": "radar_data.txt", "matches": ground_truth}))
+            self.assertEqual(loader.load_ground_truth(path), ground_truth)
+            path.write_text(json.dumps([{"name": "invader_1"}]))
+            with self.assertRaises(ValueError):
+                loader.load_ground_truth(path)
+
+async def http_request(address, method, target, body=b"", content_length=None):
+    if content_length is None:
+        content_length = len(body)
+    if isinstance(address, str):
+        reader, writer = await asyncio.open_unix_connection(address)
+    else:
+        reader, writer = await asyncio.open_connection(*address[:2])
+    writer.write(
+        f"{method} {target} HTTP/1.1\r\nContent-Length: {content_length}\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name)
+        radar_data, _ = generate_radar_data(30, 20, get_invaders(), 0.05, 0.1, seed=2)
+        (self.path / "radar_data.txt").write_text(radar_data)
+        for k, invader in enumerate(get_invaders()):
+            (self.path / f"invader_{k}.txt").write_text(invader.str_pattern)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_main(self, *args):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main([self.tmp_dir.name, *args])
+        return output.getvalue()
+
+    def test_choices(self):
+        """
+        Tests that the engines and peak finders of the command line
+        are the ones of DetectionAlgo.
+        """
+        self.assertEqual(ENGINES, DetectionAlgo.engines)
+        self.assertEqual(PEAK_FINDERS, DetectionAlgo.peak_finders)
+
+    def test_threshold(self):
+        """
+        Tests that the search uses the threshold given on the
+        command line.
+        """
+        radar_map, invaders = Loader(self.tmp_dir.name).load_data()
+        for threshold in (0.6, 0.9):
+            expected = DetectionAlgo(radar_map, invaders, threshold, "bitparallel").run_search()
+            output = self.run_main("--threshold", str(threshold), "--engine", "bitparallel")
+            self.assertIn(f"Found {len(expected)} candidates:", output)
+
+    def test_catalogue(self):
+        """
+        Tests that invaders are loaded from a compiled catalogue
+        instead of the invader files, and that catalogues of another
+        version are refused.
+        """
+        catalogue = self.path / "catalogue.pickle"
+        self.run_main("--compile-catalogue", str(catalogue))
+        invaders = sorted(Loader(self.tmp_dir.name).load_invaders(), key=lambda i: i.name)
+        loaded = Loader(self.tmp_dir.name, catalogue=catalogue).load_invaders()
+        loaded = sorted(loaded, key=lambda i: i.name)
+        self.assertEqual(loaded, invaders)
+        self.assertEqual([i.compiled for i in loaded], [i.compiled for i in invaders])
+        (self.path / "invader_0.txt").unlink()
+        _, from_catalogue = Loader(self.tmp_dir.name, catalogue=catalogue).load_data()
+        self.assertEqual(len(from_catalogue), len(invaders))
+        catalogue.write_bytes(pickle.dumps({"version": 0, "invaders": invaders}))
+        with self.assertRaises(ValueError):
+            Loader(self.tmp_dir.name).load_catalogue(catalogue)
+        catalogue.write_text("not a catalogue")
+        with self.assertRaises(ValueError):
+            Loader(self.tmp_dir.name).load_catalogue(catalogue)
+
+    def test_ignored_options_are_rejected(self):
+        """
+        Tests that options the selected mode would ignore, and invalid
+        values, are refused with a usage error before anything is searched.
+        """
+        frames = str(self.path / "radar_data*.txt")
+        rejected = [
+            ("--batch", frames, "--threshold-sweep", "0.6:0.9:0.1"),
+            ("--stream", "--threshold-sweep", "0.6:0.9:0.1"),
+            ("--serve", "unix:socket", "--threshold-sweep", "0.6:0.9:0.1"),
+            ("--threshold", "0.7", "--stream", "--batch", frames),
+            ("--threshold", "0.7", "--incremental"),
+            ("--threshold", "0.7", "--ground-truth", "matches.json"),
+            ("--threshold-sweep", "0.6:0.9:0.1", "--pyramid", "2"),
+            ("--threshold", "0.7", "--pyramid", "2", "--joint"),
+            ("--threshold", "0.7", "--pyramid", "2", "--cache", self.tmp_dir.name),
+            ("--threshold", "0.7", "--stream", "--workers", "2"),
+            ("--threshold", "0.7", "--stream", "--mmap"),
+            ("--threshold", "0.7", "--serve", "unix:socket", "--mmap"),
+            ("--threshold", "0.7", "--workers", "0"),
+            ("--threshold", "0.7", "--pyramid", "1"),
+            ("--threshold", "0.7", "--batch", frames, "--incremental", "--workers", "2"),
+        ]
+        for option, *value in (
+            ("--profile", "-"),
+            ("--prefilter",),
+            ("--joint",),
+            ("--peaks", "nms"),
+            ("--cache", self.tmp_dir.name),
+            ("--pyramid", "2"),
+        ):
+            rejected.append(("--threshold", "0.7", "--stream", option, *value))
+            rejected.append(("--threshold", "0.7", "--batch", frames, option, *value))
+        for args in rejected:
+            with self.subTest(args=args), contextlib.redirect_stderr(io.StringIO()):
+                with self.assertRaises(SystemExit):
+                    self.run_main(*args)
+
+
+class TestDetectionService(unittest.IsolatedAsyncioTestCase):
+    def get_expected(self, radar_data):
+        da = DetectionAlgo(RadarMap(radar_data), get_invaders(), 0.7, engine="bitparallel")
+        return [m._asdict() for m in da.run_search()]
+
+    async def test_concurrent_requests_are_batched(self):
+        """
+        Tests that concurrent frames get the same matches as searched
+        on their own, and that the stats count them.
+        """
+        frames = [get_random_radar_data(30, 12, seed) for seed in range(6)]
+        async with DetectionService(
+            get_invaders(), 0.7, "bitparallel", workers=2, batch_delay=0.05
+        ) as service:
+            await service.start()
+            responses = await asyncio.gather(
+                *(http_request(service.address, "POST", "/detect", f.encode()) for f in frames)
+            )
+            for (status, result), frame in zip(responses, frames):
+                self.assertEqual(status, 200)
+                self.assertEqual(result["matches"], self.get_expected(frame))
+            status, stats = await http_request(service.address, "GET", "/stats")
+        self.assertEqual(status, 200)
+        self.assertEqual(stats["requests"], 6)
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertLessEqual(stats["latency"]["p50"], stats["latency"]["p99"])
+
+    async def test_unix_socket_and_errors(self):
+        """
+        Tests serving on a Unix socket, and the errors reported
+        for empty radar data, unknown paths and invalid Content-Length.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = str(Path(tmp_dir) / "service.sock")
+            async with DetectionService(get_invaders(), 0.7, "bitparallel") as service:
+                await service.start(path=path)
+                status, result = await http_request(path, "POST", "/detect", b"")
+                self.assertEqual(status, 400)
+                self.assertIn("error", result)
+                status, _ = await http_request(path, "GET", "/unknown")
+                self.assertEqual(status, 404)
+                for content_length in ("abc", "-1"):
+                    status, result = await http_request(
+                        path, "POST", "/detect", b"", content_length
+                    )
+                    self.assertEqual((status, result), (400, {"error": "Malformed request"}))
+                radar_data = get_mock_radar_data()
+                status, result = await http_request(path, "POST", "/detect", radar_data.encode())
+                self.assertEqual(result["matches"], self.get_expected(radar_data))
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_generate_radar_data(self):
+        """
+        Tests that the synthetic radar data has the requested size
+        and contains the placed invaders when there is no noise.
+        """
+        invaders = get_invaders()
+        radar_data, placed = generate_radar_data(40, 30, invaders, 0, 0.1, seed=1)
+        rm = RadarMap(radar_data)
+        self.assertEqual(len(rm.radar_data), 30)
+        self.assertEqual(len(rm.radar_data[0]), 40)
+        self.assertTrue(placed)
+        patterns = {invader.name: invader.pattern for invader in invaders}
+        for name, x, y in placed:
+            window = rm.get_size_window((6, 4), (x, y))
+            self.assertEqual(window, patterns[name])
+
+    def test_time_pipeline(self):
+        """
+        Tests that the pipeline timings cover every stage and
+        find the invaders placed in noiseless radar data.
+        """
+        radar_data, placed = generate_radar_data(40, 30, get_invaders(), 0, 0.1, seed=1)
+        result = time_pipeline(RadarMap(radar_data), get_invaders(), 0.9, "bitparallel")
+        self.assertEqual(
+            set(result["stages"]),
+            {"get_enlarged_radar_data", "scan_radar_data", "find_peaks", "get_best_matching_data"},
+        )
+        self.assertEqual(result["windows"], 2 * 40 * 30)
+        self.assertEqual(result["candidates"], len(placed))
+
+    def test_measure_import_time(self):
+        """
+        Tests that a one shot search doesn't import the modules
+        of the engines and modes it doesn't use.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            radar_data, _ = generate_radar_data(20, 10, get_invaders(), 0, 0.1, seed=1)
+            (Path(tmp_dir) / "radar_data.txt").write_text(radar_data)
+            (Path(tmp_dir) / "invader_1.txt").write_text(get_invaders()[0].str_pattern)
+            main_path = str(Path(__file__).parent / "main.py")
+            result = measure_import_time([main_path, tmp_dir, "--threshold", "0.9"])
+        self.assertGreater(result["import_time"], 0)
+        self.assertIn("detection_algo", result["modules"])
+        for module in ("asyncio", "concurrent.futures", "numpy", "batch_algo", "score_cache"):
+            self.assertNotIn(module, result["modules"])